@@ -3,42 +3,23 @@ Analytics Agent - Generates insights and statistics from data
 """
 
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from agents.db_agent import DatabaseAgent
+from agents.kpi_engine import KPIEngine
+from agents.rollups import RollupManager
 
 class AnalyticsAgent:
-    def __init__(self):
-        self.db_agent = DatabaseAgent()
+    def __init__(self, db_agent: Optional[DatabaseAgent] = None):
+        self.db_agent = db_agent or DatabaseAgent()
+        self.rollups = RollupManager(self.db_agent)
+        self.kpi_engine = KPIEngine(self.db_agent, self.rollups)
     
     def get_quick_stats(self) -> Dict[str, Any]:
         """Generate quick statistics for dashboard"""
         stats = {}
         
         try:
-            # Total accounts
-            result, _ = self.db_agent.execute_query("SELECT COUNT(*) FROM account")
-            stats['total_accounts'] = result[0][0]
-            
-            # Total active policies
-            result, _ = self.db_agent.execute_query("SELECT COUNT(*) FROM policies WHERE status='Active'")
-            stats['active_policies'] = result[0][0]
-            
-            # Total claims
-            result, _ = self.db_agent.execute_query("SELECT COUNT(*) FROM claims")
-            stats['total_claims'] = result[0][0]
-            
-            # Total approved claim amount
-            result, _ = self.db_agent.execute_query("SELECT SUM(approved_amount) FROM claims WHERE status='Approved'")
-            stats['total_approved_claims'] = result[0][0] if result[0][0] else 0
-            
-            # Total premium revenue
-            result, _ = self.db_agent.execute_query("SELECT SUM(premium_amount) FROM policies WHERE status='Active'")
-            stats['total_premium'] = result[0][0] if result[0][0] else 0
-            
-            # Pending claims
-            result, _ = self.db_agent.execute_query("SELECT COUNT(*) FROM claims WHERE status='Pending'")
-            stats['pending_claims'] = result[0][0]
-            
+            stats = self.kpi_engine.get_stats()
         except Exception as e:
             print(f"Error generating stats: {e}")
         
@@ -46,6 +27,16 @@ class AnalyticsAgent:
     
     def get_policy_distribution(self) -> pd.DataFrame:
         """Get distribution of policies by type"""
+        if self.rollups.available():
+            query = """
+            SELECT NULLIF(policy_type, '') as policy_type, policy_count as count,
+                   ROUND(total_premium, 2) as total_premium
+            FROM rollup_policies_by_type_status
+            WHERE status = 'Active'
+            ORDER BY count DESC
+            """
+            return self.db_agent.execute_columnar(query).to_pandas()
+        
         query = """
         SELECT policy_type, COUNT(*) as count, SUM(premium_amount) as total_premium
         FROM policies
@@ -53,11 +44,22 @@ class AnalyticsAgent:
         GROUP BY policy_type
         ORDER BY count DESC
         """
-        results, columns = self.db_agent.execute_query(query)
-        return pd.DataFrame(results, columns=columns)
+        return self.db_agent.execute_columnar(query).to_pandas()
     
     def get_top_agents(self, limit: int = 5) -> pd.DataFrame:
         """Get top performing agents"""
+        if self.rollups.available():
+            query = f"""
+            SELECT a.name, SUM(r.policy_count) as total_policies,
+                   ROUND(SUM(r.total_premium), 2) as total_premium
+            FROM agents a
+            JOIN rollup_policies_by_agent r ON a.agent_id = r.agent_id
+            GROUP BY a.name
+            ORDER BY total_premium DESC
+            LIMIT {limit}
+            """
+            return self.db_agent.execute_columnar(query).to_pandas()
+        
         query = f"""
         SELECT a.name, COUNT(p.policy_id) as total_policies, 
                SUM(p.premium_amount) as total_premium
@@ -67,11 +69,20 @@ class AnalyticsAgent:
         ORDER BY total_premium DESC
         LIMIT {limit}
         """
-        results, columns = self.db_agent.execute_query(query)
-        return pd.DataFrame(results, columns=columns)
+        return self.db_agent.execute_columnar(query).to_pandas()
     
     def get_claims_summary(self) -> pd.DataFrame:
         """Get claims summary by status"""
+        if self.rollups.available():
+            query = """
+            SELECT NULLIF(status, '') as status, claim_count as count,
+                   ROUND(total_requested, 2) as total_requested,
+                   CASE WHEN approved_count > 0 THEN ROUND(total_approved, 2) END as total_approved
+            FROM rollup_claims_by_status
+            ORDER BY status
+            """
+            return self.db_agent.execute_columnar(query).to_pandas()
+        
         query = """
         SELECT status, COUNT(*) as count, 
                SUM(claim_amount) as total_requested,
@@ -79,5 +90,66 @@ class AnalyticsAgent:
         FROM claims
         GROUP BY status
         """
-        results, columns = self.db_agent.execute_query(query)
-        return pd.DataFrame(results, columns=columns)
\ No newline at end of file
+        return self.db_agent.execute_columnar(query).to_pandas()
+    
+    def get_revenue_by_policy_type(self) -> pd.DataFrame:
+        """Get premium, average premium and coverage per active policy type"""
+        if self.rollups.available():
+            query = """
+            SELECT 
+                NULLIF(policy_type, '') as policy_type,
+                policy_count,
+                ROUND(total_premium, 2) as total_premium,
+                total_premium / policy_count as avg_premium,
+                ROUND(total_coverage, 2) as total_coverage
+            FROM rollup_policies_by_type_status
+            WHERE status = 'Active'
+            ORDER BY total_premium DESC
+            """
+            return self.db_agent.execute_columnar(query).to_pandas()
+        
+        query = """
+        SELECT 
+            p.policy_type,
+            COUNT(*) as policy_count,
+            SUM(p.premium_amount) as total_premium,
+            AVG(p.premium_amount) as avg_premium,
+            SUM(p.coverage_amount) as total_coverage
+        FROM policies p
+        WHERE p.status = 'Active'
+        GROUP BY p.policy_type
+        ORDER BY total_premium DESC
+        """
+        return self.db_agent.execute_columnar(query).to_pandas()
+    
+    def get_policies_by_state(self, limit: int = 10) -> pd.DataFrame:
+        """Get active policy counts and premium for the top states"""
+        query = f"""
+        SELECT 
+            c.state,
+            COUNT(p.policy_id) as total_policies,
+            SUM(p.premium_amount) as total_premium
+        FROM account c
+        JOIN policies p ON c.account_id = p.account_id
+        WHERE p.status = 'Active'
+        GROUP BY c.state
+        ORDER BY total_policies DESC
+        LIMIT {limit}
+        """
+        return self.db_agent.execute_columnar(query).to_pandas()
+    
+    def get_claims_risk(self) -> pd.DataFrame:
+        """Get claimed vs approved amounts and approval rate per policy type"""
+        query = """
+        SELECT 
+            p.policy_type,
+            COUNT(cl.claim_id) as total_claims,
+            SUM(cl.claim_amount) as total_claim_amount,
+            SUM(cl.approved_amount) as total_approved,
+            ROUND(100.0 * SUM(cl.approved_amount) / SUM(cl.claim_amount), 2) as approval_rate
+        FROM policies p
+        LEFT JOIN claims cl ON p.policy_id = cl.policy_id
+        WHERE cl.claim_id IS NOT NULL
+        GROUP BY p.policy_type
+        """
+        return self.db_agent.execute_columnar(query).to_pandas()
@@ -0,0 +1,106 @@
+"""
+Cancellation - Deadlines and cancel requests shared between a running query and its caller
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class QueryCancelled(Exception):
+    """Raised when a query is stopped by its cancellation token"""
+
+
+class QueryTimeout(QueryCancelled):
+    """Raised when a query runs past its deadline"""
+
+
+class CancellationToken:
+    """Thread-safe cancel flag with an optional deadline.
+
+    The caller keeps the token and may ``cancel()`` it from any thread; the
+    code running the query registers callbacks (``conn.interrupt``,
+    ``cursor.cancel``) with ``on_cancel`` and polls ``cancelled``, which also
+    turns true once the deadline has passed.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._next_handle = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancelled or past the deadline (cheap enough to poll)"""
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("timeout")
+        return self._event.is_set()
+
+    @property
+    def timed_out(self) -> bool:
+        return self.cancelled and self.reason == "timeout"
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None without one)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled"):
+        """Stop the query; registered callbacks run on the calling thread"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback: Callable[[], None]) -> int:
+        """Run ``callback`` when the token is cancelled; returns a handle for ``remove_callback``"""
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_handle
+                self._next_handle += 1
+                self._callbacks[handle] = callback
+                return handle
+        callback()
+        return -1
+
+    def remove_callback(self, handle: int):
+        with self._lock:
+            self._callbacks.pop(handle, None)
+            if not self._callbacks and self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def start_timer(self):
+        """Cancel at the deadline even if nobody polls (for drivers without a progress hook)"""
+        with self._lock:
+            if self.deadline is None or self._timer is not None or self._event.is_set():
+                return
+            self._timer = threading.Timer(self.remaining(), self.cancel, args=("timeout",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def error(self) -> QueryCancelled:
+        """The exception describing why the query stopped"""
+        if self.reason == "timeout":
+            return QueryTimeout(f"Query timed out after {self.timeout:g}s")
+        return QueryCancelled("Query was cancelled")
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise self.error()
@@ -0,0 +1,209 @@
+"""
+Columnar Results - Builds typed NumPy columns from query results without boxing rows twice
+"""
+
+from array import array
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from agents import metrics
+
+INT = "int"
+FLOAT = "float"
+OBJECT = "object"
+NULL = "null"
+
+
+def _typed_chunk(values: Sequence[Any]) -> Tuple[str, np.ndarray]:
+    """Convert one column slice to the narrowest NumPy array that holds it exactly"""
+    # array() type-checks every element in C and rejects anything that does
+    # not fit, which is both faster and stricter than np.array(dtype=...).
+    try:
+        return INT, np.frombuffer(array("q", values), dtype=np.int64)
+    except (TypeError, OverflowError):
+        pass
+    try:
+        return FLOAT, np.frombuffer(array("d", values), dtype=np.float64)
+    except TypeError:
+        pass
+    chunk = np.empty(len(values), dtype=object)
+    chunk[:] = values
+    return OBJECT, chunk
+
+
+class Column:
+    """One result column: a NumPy array plus a NULL mask (None when there are no NULLs)"""
+
+    __slots__ = ("name", "kind", "values", "mask")
+
+    def __init__(self, name: str, kind: str, values: np.ndarray, mask: Optional[np.ndarray] = None):
+        self.name = name
+        self.kind = kind
+        self.values = values
+        self.mask = mask
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the column, including boxed objects"""
+        size = self.values.nbytes
+        if self.kind == OBJECT:
+            # Values shared by several rows (see compact()) are counted once
+            size += sum({id(v): v.__sizeof__() for v in self.values if v is not None}.values())
+        if self.mask is not None:
+            size += self.mask.nbytes
+        return size
+
+    def compact(self):
+        """Make equal values in an object column share one Python object"""
+        if self.kind == OBJECT and len(self.values):
+            canonical = {}
+            self.values[:] = [canonical.setdefault(v, v) if isinstance(v, (str, bytes)) else v
+                              for v in self.values]
+
+    def to_pandas(self):
+        """Values as a NumPy array suitable for a DataFrame column (NULL -> NaN/None)"""
+        if self.mask is None:
+            return self.values
+        if self.kind in (INT, FLOAT):
+            values = self.values.astype(np.float64)
+            values[self.mask] = np.nan
+            return values
+        values = self.values.copy()
+        values[self.mask] = None
+        return values
+
+    def to_list(self) -> List[Any]:
+        """Values as plain Python objects with NULLs restored to None"""
+        values = self.values.tolist()
+        if self.mask is not None:
+            for i in np.flatnonzero(self.mask).tolist():
+                values[i] = None
+        return values
+
+
+class ColumnBuilder:
+    """Accumulates one column batch by batch as rows are fetched"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._chunks: List[Tuple[str, np.ndarray, Optional[np.ndarray]]] = []
+
+    def extend(self, values: Sequence[Any]):
+        """Append one batch worth of values for this column"""
+        if not values:
+            return
+        kind, chunk = _typed_chunk(values)
+        mask = None
+        if kind == OBJECT:
+            # Only columns that failed the typed fast path can contain NULLs
+            nulls = [v is None for v in values]
+            if all(nulls):
+                kind = NULL
+                mask = np.ones(len(values), dtype=bool)
+            elif any(nulls):
+                mask = np.array(nulls, dtype=bool)
+                filled = [0 if v is None else v for v in values]
+                typed_kind, typed_chunk = _typed_chunk(filled)
+                if typed_kind != OBJECT:
+                    kind, chunk = typed_kind, typed_chunk
+        self._chunks.append((kind, chunk, mask))
+
+    def build(self) -> Column:
+        """Concatenate the batches into a single typed column"""
+        if not self._chunks:
+            return Column(self.name, OBJECT, np.empty(0, dtype=object))
+
+        kinds = {kind for kind, _, _ in self._chunks} - {NULL}
+        if not kinds:
+            kind = OBJECT
+        elif kinds <= {INT}:
+            kind = INT
+        elif kinds <= {INT, FLOAT}:
+            kind = FLOAT
+        else:
+            kind = OBJECT
+
+        dtype = {INT: np.int64, FLOAT: np.float64, OBJECT: object}[kind]
+        parts = []
+        for chunk_kind, chunk, _ in self._chunks:
+            if chunk_kind == NULL:
+                parts.append(np.zeros(len(chunk), dtype=dtype) if kind != OBJECT else chunk)
+            else:
+                parts.append(chunk.astype(dtype, copy=False))
+        values = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        mask = None
+        if any(chunk_mask is not None for _, _, chunk_mask in self._chunks):
+            mask = np.concatenate([
+                chunk_mask if chunk_mask is not None else np.zeros(len(chunk), dtype=bool)
+                for _, chunk, chunk_mask in self._chunks
+            ])
+        return Column(self.name, kind, values, mask)
+
+
+class ColumnarResult:
+    """Query result held column by column instead of as a list of row tuples"""
+
+    def __init__(self, columns: List[Column]):
+        self.columns = columns
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    @property
+    def row_count(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns)
+
+    @classmethod
+    def from_batches(cls, column_names: List[str], batches: Iterable[List[Tuple]]) -> "ColumnarResult":
+        """Build typed columns while consuming row batches from a cursor"""
+        builders = [ColumnBuilder(name) for name in column_names]
+        for batch in batches:
+            if not batch:
+                continue
+            for builder, values in zip(builders, zip(*batch)):
+                builder.extend(values)
+        return cls([builder.build() for builder in builders])
+
+    @classmethod
+    def from_arrow(cls, table) -> "ColumnarResult":
+        """Wrap a pyarrow Table, e.g. from the Databricks connector's Arrow fetch"""
+        columns = []
+        for name, chunked in zip(table.column_names, table.columns):
+            mask = chunked.is_null().to_numpy(zero_copy_only=False) if chunked.null_count else None
+            values = chunked.to_numpy(zero_copy_only=False)
+            if values.dtype.kind in "iu":
+                kind, values = INT, values.astype(np.int64, copy=False)
+            elif values.dtype.kind == "f":
+                kind, values = FLOAT, values.astype(np.float64, copy=False)
+            else:
+                kind, values = OBJECT, values.astype(object, copy=False)
+            columns.append(Column(name, kind, values, mask))
+        return cls(columns)
+
+    def compact(self) -> "ColumnarResult":
+        """Deduplicate repeated strings (status, type, state...) before keeping the result around"""
+        for column in self.columns:
+            column.compact()
+        return self
+
+    def to_pandas(self) -> pd.DataFrame:
+        """NumPy-backed DataFrame built straight from the typed columns"""
+        # Build with positional keys so duplicate column names (common in
+        # joins) don't overwrite each other, then apply the real names.
+        with metrics.span("dataframe"):
+            df = pd.DataFrame({i: column.to_pandas() for i, column in enumerate(self.columns)})
+            df.columns = self.column_names
+        return df
+
+    def to_rows(self) -> List[Tuple]:
+        """Row tuples, for callers of the classic ``execute_query`` interface"""
+        return list(zip(*(column.to_list() for column in self.columns)))
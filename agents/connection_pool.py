@@ -0,0 +1,332 @@
+"""
+Connection Pool - Shares database connections across agents and Streamlit sessions
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from config import DB_CONFIG, POOL_CONFIG
+
+
+class ConnectionPool:
+    """Thread-safe connection pool.
+
+    SQLite connections are cheap but not shareable across threads, so every
+    thread keeps its own handle. Databricks sessions are expensive to open, so
+    idle sessions are kept in a LIFO list and handed to whichever thread asks
+    next. A SQLite checkout that outlives the call that made it (a result
+    stream opened on a worker thread and read on another) is taken with
+    ``detached=True``; those handles come from the same LIFO list and can be
+    released from any thread. In all cases ``max_size`` bounds how many
+    connections can be checked out at once, idle connections are evicted
+    after ``idle_timeout`` seconds and connections that sat unused longer
+    than ``health_check_interval`` are pinged before being reused.
+    """
+
+    def __init__(self, db_type: Optional[str] = None, max_size: Optional[int] = None,
+                 idle_timeout: Optional[float] = None,
+                 health_check_interval: Optional[float] = None,
+                 acquire_timeout: Optional[float] = None):
+        self.db_type = db_type or DB_CONFIG["type"]
+        self.max_size = max_size or POOL_CONFIG["max_size"]
+        self.idle_timeout = idle_timeout if idle_timeout is not None else POOL_CONFIG["idle_timeout"]
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else POOL_CONFIG["health_check_interval"])
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else POOL_CONFIG["acquire_timeout"]
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._local = threading.local()
+        # Every SQLite handle handed out, keyed by id(), so idle ones can be
+        # evicted from any thread.
+        self._sqlite_conns: Dict[int, Dict[str, Any]] = {}
+        # Idle Databricks sessions / detached SQLite handles:
+        # [{"conn", "last_used", "last_checked"}]
+        self._idle: List[Dict[str, Any]] = []
+        # id() of SQLite handles currently out on a detached checkout
+        self._detached = set()
+        self._last_eviction = time.monotonic()
+        self._closed = False
+        # Dedicated SQLite handle that never writes; see data_version()
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+
+    def _create_connection(self):
+        """Open a brand new connection for the configured backend"""
+        if self.db_type == "sqlite":
+            # check_same_thread is disabled so the pool can close idle handles
+            # from the eviction path and detached handles can change hands;
+            # a handle is still only used by one thread at a time.
+            return sqlite3.connect(DB_CONFIG["sqlite"]["database"], check_same_thread=False)
+        elif self.db_type == "databricks":
+            from databricks import sql
+            return sql.connect(
+                server_hostname=DB_CONFIG["databricks"]["server_hostname"],
+                http_path=DB_CONFIG["databricks"]["http_path"],
+                access_token=DB_CONFIG["databricks"]["access_token"]
+            )
+        raise ValueError(f"Unsupported database type: {self.db_type}")
+
+    def _is_healthy(self, conn) -> bool:
+        """Run a trivial query to make sure the connection is still usable"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, detached: bool = False):
+        """Check a connection out of the pool.
+
+        ``detached`` checkouts are never shared with nested calls on the same
+        thread and may be released from a different thread.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        self._maybe_evict()
+
+        if self.db_type == "sqlite" and not detached:
+            return self._acquire_sqlite()
+        conn = self._acquire_shared()
+        if self.db_type == "sqlite":
+            with self._lock:
+                self._detached.add(id(conn))
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, closing it if ``discard`` is set"""
+        if self.db_type == "sqlite":
+            with self._lock:
+                detached = id(conn) in self._detached
+                self._detached.discard(id(conn))
+            if not detached:
+                self._release_sqlite(conn, discard)
+                return
+        self._release_shared(conn, discard)
+
+    def _take_slot(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for a database connection "
+                f"(pool max_size={self.max_size})"
+            )
+
+    def _acquire_sqlite(self):
+        entry = getattr(self._local, "entry", None)
+        depth = getattr(self._local, "depth", 0)
+
+        # Nested checkouts on the same thread reuse the handle and the slot
+        # that the outer checkout already holds.
+        if depth == 0:
+            self._take_slot()
+
+        try:
+            now = time.monotonic()
+            with self._lock:
+                if entry is not None and id(entry["conn"]) not in self._sqlite_conns:
+                    # Evicted by another thread while this one was idle.
+                    entry = None
+                elif entry is not None:
+                    # Marked in the same critical section as the check, so
+                    # eviction can't close the handle before it is returned
+                    entry["in_use"] = True
+            if entry is not None and now - entry["last_checked"] > self.health_check_interval:
+                if self._is_healthy(entry["conn"]):
+                    entry["last_checked"] = now
+                else:
+                    self._forget_sqlite(entry)
+                    entry = None
+            if entry is None:
+                conn = self._create_connection()
+                entry = {"conn": conn, "last_used": now, "last_checked": now, "in_use": True}
+                with self._lock:
+                    self._sqlite_conns[id(conn)] = entry
+                    victim = self._pop_lru_idle_sqlite() if len(self._sqlite_conns) > self.max_size else None
+                if victim is not None:
+                    self._close_quietly(victim)
+                self._local.entry = entry
+        except Exception:
+            if depth == 0:
+                if entry is not None:
+                    entry["in_use"] = False
+                self._slots.release()
+            raise
+
+        self._local.depth = depth + 1
+        return entry["conn"]
+
+    def _release_sqlite(self, conn, discard: bool):
+        entry = getattr(self._local, "entry", None)
+        depth = getattr(self._local, "depth", 0)
+        if entry is None or entry["conn"] is not conn or depth == 0:
+            # The owning thread's slot and depth can't be settled from here
+            raise RuntimeError(
+                "SQLite connection released by a thread that did not check it out "
+                "(use acquire(detached=True) for handles that change threads)"
+            )
+
+        self._local.depth = depth - 1
+        entry["last_used"] = time.monotonic()
+        if discard:
+            self._forget_sqlite(entry)
+        elif conn.in_transaction:
+            conn.rollback()
+        if self._local.depth == 0:
+            entry["in_use"] = False
+            self._slots.release()
+
+    def _pop_lru_idle_sqlite(self):
+        """Drop the least recently used idle handle (caller holds the lock).
+
+        Handles left behind by finished threads would otherwise pile up
+        until the idle timeout, so the pool never keeps more than
+        ``max_size`` of them open.
+        """
+        idle = [(e["last_used"], key) for key, e in self._sqlite_conns.items() if not e.get("in_use")]
+        if not idle:
+            return None
+        _, key = min(idle)
+        return self._sqlite_conns.pop(key)["conn"]
+
+    def _forget_sqlite(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._sqlite_conns.pop(id(entry["conn"]), None)
+        if getattr(self._local, "entry", None) is entry:
+            self._local.entry = None
+        self._close_quietly(entry["conn"])
+
+    def _acquire_shared(self):
+        self._take_slot()
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._create_connection()
+
+                now = time.monotonic()
+                if now - entry["last_checked"] <= self.health_check_interval:
+                    return entry["conn"]
+                if self._is_healthy(entry["conn"]):
+                    return entry["conn"]
+                self._close_quietly(entry["conn"])
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release_shared(self, conn, discard: bool):
+        try:
+            if not discard and getattr(conn, "in_transaction", False):
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            if discard or self._closed:
+                self._close_quietly(conn)
+            else:
+                now = time.monotonic()
+                with self._lock:
+                    self._idle.append({"conn": conn, "last_used": now, "last_checked": now})
+        finally:
+            self._slots.release()
+
+    def _maybe_evict(self):
+        """Run idle eviction at most once per second from the acquire path"""
+        now = time.monotonic()
+        if now - self._last_eviction < 1.0:
+            return
+        self._last_eviction = now
+        self.evict_idle()
+
+    def evict_idle(self) -> int:
+        """Close connections that have been idle longer than ``idle_timeout``"""
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            if self.db_type == "sqlite":
+                for key, entry in list(self._sqlite_conns.items()):
+                    if not entry.get("in_use") and now - entry["last_used"] > self.idle_timeout:
+                        stale.append(entry["conn"])
+                        del self._sqlite_conns[key]
+            keep = []
+            for entry in self._idle:
+                if now - entry["last_used"] > self.idle_timeout:
+                    stale.append(entry["conn"])
+                else:
+                    keep.append(entry)
+            self._idle = keep
+
+        for conn in stale:
+            self._close_quietly(conn)
+        return len(stale)
+
+    def data_version(self) -> int:
+        """Return SQLite's ``PRAGMA data_version`` from a dedicated connection.
+
+        The pragma is per connection and only moves when *another* connection
+        commits, so it is read from a handle that is never used for writes.
+        That way any commit made through the pool, by another process, or by
+        the data loader shows up as a new value.
+        """
+        if self.db_type != "sqlite":
+            raise ValueError("data_version() is only available for SQLite")
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = sqlite3.connect(DB_CONFIG["sqlite"]["database"], check_same_thread=False)
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage for diagnostics"""
+        with self._lock:
+            if self.db_type == "sqlite":
+                in_use = sum(1 for e in self._sqlite_conns.values() if e.get("in_use")) + len(self._detached)
+                open_count = len(self._sqlite_conns) + len(self._detached) + len(self._idle)
+                idle = open_count - in_use
+            else:
+                idle = len(self._idle)
+                in_use = None
+                open_count = None
+        return {
+            "db_type": self.db_type,
+            "max_size": self.max_size,
+            "open": open_count,
+            "in_use": in_use,
+            "idle": idle,
+        }
+
+    def close_all(self):
+        """Close every connection owned by the pool"""
+        self._closed = True
+        with self._lock:
+            conns = [e["conn"] for e in self._sqlite_conns.values()] + [e["conn"] for e in self._idle]
+            self._sqlite_conns.clear()
+            self._idle = []
+        for conn in conns:
+            self._close_quietly(conn)
+        with self._monitor_lock:
+            if self._monitor is not None:
+                self._close_quietly(self._monitor)
+                self._monitor = None
+
+
+_shared_pool: Optional[ConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None or _shared_pool._closed:
+            _shared_pool = ConnectionPool()
+        return _shared_pool
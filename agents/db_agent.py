@@ -3,45 +3,399 @@ Database Agent - Handles all database operations
 """
 
 import sqlite3
+import time
 import pandas as pd
-from typing import List, Dict, Any, Tuple
-from config import DB_CONFIG
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Sequence
+from config import DB_CONFIG, QUERY_CONFIG, INDEX_CONFIG, CACHE_CONFIG
+from agents import metrics
+from agents.connection_pool import ConnectionPool, get_pool
+from agents.columnar import ColumnarResult
+from agents.index_advisor import IndexAdvisor, create_default_indexes
+from agents.cancellation import CancellationToken, QueryCancelled
+from agents.duckdb_engine import get_engine
+from agents.memory_snapshot import get_snapshot
+from agents.result_cache import ResultCache
+from agents.sql_utils import is_read_only
+
+# SQLite virtual machine steps between cancellation checks
+PROGRESS_INTERVAL = 10000
+
+class QueryStream:
+    """Iterates over a query's results in ``fetchmany`` batches.
+
+    The pooled connection is held until the stream is exhausted or closed, so
+    use it as a context manager. At most ``max_rows`` rows are produced;
+    ``truncated`` tells whether more were available and ``total_rows()`` counts
+    the full result when needed. The connection is a detached checkout, so a
+    stream opened on a worker thread can be read and closed on another, and
+    ``token`` can stop it at any point.
+    """
+    
+    def __init__(self, db_agent: "DatabaseAgent", query: str, batch_size: int, max_rows: Optional[int],
+                 token: Optional[CancellationToken] = None, params: Optional[Sequence[Any]] = None):
+        self.db_agent = db_agent
+        self.query = query
+        self.params = params
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.token = token
+        self.columns: List[str] = []
+        self.row_count = 0
+        self.truncated = False
+        self.exhausted = False
+        self._conn = None
+        self._release = None
+        self._cursor = None
+        self._unwatch = None
+        self._fetch_time = 0.0
+        self._open()
+    
+    def _open(self):
+        try:
+            self._conn, self._release = self.db_agent._checkout(self.query, detached=True, params=self.params)
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+        try:
+            self._cursor = self._conn.cursor()
+            self._unwatch = self.db_agent._watch(self._conn, self._cursor, self.token)
+            with metrics.span("db_execute"):
+                self.db_agent._execute(self._cursor, self.query, self.params)
+            self.columns = [description[0] for description in self._cursor.description] if self._cursor.description else []
+        except Exception as e:
+            engine_failed = self.db_agent._engine_failed(self._release, self.query, e, self.token)
+            self.close()
+            if engine_failed:
+                return self._open()
+            raise self.db_agent._query_error(e, self.token)
+    
+    def __iter__(self) -> Iterator[List[Tuple]]:
+        """Yield batches of row tuples"""
+        try:
+            while self._cursor is not None:
+                size = self.batch_size
+                if self.max_rows is not None:
+                    size = min(size, self.max_rows - self.row_count)
+                    if size <= 0:
+                        # Cap reached: peek one row to see whether we cut anything off
+                        self.truncated = self._cursor.fetchone() is not None
+                        self.exhausted = not self.truncated
+                        break
+                started = time.perf_counter()
+                batch = self._cursor.fetchmany(size)
+                self._fetch_time += time.perf_counter() - started
+                if not batch:
+                    self.exhausted = True
+                    break
+                self.row_count += len(batch)
+                yield batch
+        except Exception as e:
+            raise self.db_agent._query_error(e, self.token)
+        finally:
+            self.close()
+    
+    def dataframes(self) -> Iterator[pd.DataFrame]:
+        """Yield each batch as a NumPy-backed DataFrame chunk"""
+        for batch in self:
+            yield ColumnarResult.from_batches(self.columns, [batch]).to_pandas()
+    
+    def total_rows(self) -> int:
+        """Number of rows in the full result, ignoring ``max_rows``"""
+        if self.exhausted:
+            return self.row_count
+        query = self.query.strip().rstrip(";")
+        results, _ = self.db_agent.execute_query(f"SELECT COUNT(*) FROM ({query}) AS counted", token=self.token,
+                                                 params=self.params)
+        return results[0][0]
+    
+    def close(self):
+        """Release the cursor and hand the connection back to the pool"""
+        if self._unwatch is not None:
+            self._unwatch()
+            self._unwatch = None
+        if self._fetch_time:
+            # One span for all the batches rather than one per fetchmany()
+            metrics.record("db_fetch", self._fetch_time)
+            self._fetch_time = 0.0
+        if self._cursor is not None:
+            try:
+                self._cursor.close()
+            except Exception:
+                pass
+            self._cursor = None
+        if self._conn is not None:
+            self._release(self._conn, discard=self.db_agent._discard_after(self.token))
+            self._conn = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 class DatabaseAgent:
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None):
         self.db_type = DB_CONFIG["type"]
+        self.pool = pool or get_pool()
         self.connection = None
+        self.advisor = None
+        if self.db_type == "sqlite" and INDEX_CONFIG["advisor"]["enabled"]:
+            self.advisor = IndexAdvisor(self)
+        # In-memory copy for read-only queries (None unless SNAPSHOT_CONFIG enables it)
+        self.snapshot = get_snapshot(self.pool)
+        # DuckDB for aggregate-heavy reads (None unless DB_CONFIG["duckdb"] enables it)
+        self.engine = get_engine(self.pool)
+        self.result_cache = ResultCache(self) if CACHE_CONFIG["results"]["enabled"] else None
         
     def connect(self):
-        """Establish database connection based on config"""
-        if self.db_type == "sqlite":
-            self.connection = sqlite3.connect(DB_CONFIG["sqlite"]["database"])
-        elif self.db_type == "databricks":
-            from databricks import sql
-            self.connection = sql.connect(
-                server_hostname=DB_CONFIG["databricks"]["server_hostname"],
-                http_path=DB_CONFIG["databricks"]["http_path"],
-                access_token=DB_CONFIG["databricks"]["access_token"]
-            )
+        """Check a connection out of the shared pool.
+
+        Callers that use this directly must hand it back with ``release()``.
+        """
+        self.connection = self.pool.acquire()
         return self.connection
     
-    def execute_query(self, query: str) -> Tuple[List[Tuple], List[str]]:
-        """Execute SQL query and return results with column names"""
+    def release(self, conn=None, discard: bool = False):
+        """Return a connection obtained from ``connect()`` to the pool"""
+        conn = conn or self.connection
+        if conn is not None:
+            self.pool.release(conn, discard=discard)
+        if conn is self.connection:
+            self.connection = None
+    
+    def ensure_default_indexes(self) -> List[str]:
+        """Create the default covering indexes that don't exist yet (SQLite only)"""
+        if self.db_type != "sqlite":
+            return []
+        conn = self.pool.acquire()
         try:
-            conn = self.connect()
-            cursor = conn.cursor()
+            return create_default_indexes(conn)
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+        finally:
+            self.pool.release(conn)
+    
+    def _checkout(self, query: str, detached: bool = False, params: Optional[Sequence[Any]] = None):
+        """A connection for ``query`` and the function that gives it back.
+
+        Aggregate-heavy reads go to the DuckDB engine and other read-only
+        statements to the memory snapshot, each only while its copy matches
+        the database; everything else (and any read while a copy is being
+        rebuilt) uses the pool.
+        """
+        if self.engine is not None and self.engine.routes(query, params):
+            conn = self.engine.acquire()
+            if conn is not None:
+                return conn, self.engine.release
+        if self.snapshot is not None and is_read_only(query):
+            conn = self.snapshot.acquire()
+            if conn is not None:
+                return conn, self.snapshot.release
+        return self.pool.acquire(detached=detached), self.pool.release
+    
+    def _engine_failed(self, release, query: str, error: Exception, token: Optional[CancellationToken]) -> bool:
+        """True when DuckDB couldn't run ``query`` and it should be retried on SQLite"""
+        if self.engine is None or release != self.engine.release:
+            return False
+        if isinstance(error, QueryCancelled) or (token is not None and token.cancelled):
+            return False
+        self.engine.reject(query, error)
+        return True
+    
+    def _cached(self, query: str, params: Optional[Sequence[Any]] = None):
+        """``(cached ColumnarResult or None, ticket to store the result under)``"""
+        if self.result_cache is None:
+            return None, None
+        with metrics.span("result_cache"):
+            return self.result_cache.get(query, params)
+    
+    def _execute(self, cursor, query: str, params: Optional[Sequence[Any]]):
+        """Run ``query`` on ``cursor``, binding ``params`` to its ``?`` placeholders.
+
+        The connection keeps the compiled statement keyed on the SQL text,
+        so queries that differ only in their parameters are prepared once.
+        """
+        if params:
+            cursor.execute(query, list(params))
+        else:
             cursor.execute(query)
-            results = cursor.fetchall()
+    
+    def _token(self, timeout: Optional[float], token: Optional[CancellationToken]) -> Optional[CancellationToken]:
+        """The caller's token, or a new one for the timeout (QUERY_CONFIG default)"""
+        if token is not None:
+            return token
+        timeout = timeout if timeout is not None else QUERY_CONFIG["timeout"]
+        return CancellationToken(timeout) if timeout else None
+    
+    def _watch(self, conn, cursor, token: Optional[CancellationToken]):
+        """Let ``token`` stop the statement running on ``conn``; returns a function that undoes this"""
+        if token is None:
+            return lambda: None
+        if isinstance(conn, sqlite3.Connection):
+            # The progress handler enforces the deadline from inside SQLite;
+            # interrupt() makes an explicit cancel take effect immediately.
+            conn.set_progress_handler(lambda: 1 if token.cancelled else 0, PROGRESS_INTERVAL)
+            handle = token.on_cancel(conn.interrupt)
+            
+            def unwatch():
+                token.remove_callback(handle)
+                conn.set_progress_handler(None, 0)
+        else:
+            # DuckDB cursors stop with interrupt(), DB-API drivers with cancel()
+            handle = token.on_cancel(cursor.interrupt if hasattr(cursor, "interrupt") else cursor.cancel)
+            token.start_timer()
+            
+            def unwatch():
+                token.remove_callback(handle)
+        return unwatch
+    
+    def _query_error(self, error: Exception, token: Optional[CancellationToken]) -> Exception:
+        """Exception to raise for a failed statement"""
+        if isinstance(error, QueryCancelled):
+            return error
+        if token is not None and token.cancelled:
+            return token.error()
+        return Exception(f"Database error: {str(error)}")
+    
+    def execute_query(self, query: str, timeout: Optional[float] = None,
+                      token: Optional[CancellationToken] = None,
+                      params: Optional[Sequence[Any]] = None) -> Tuple[List[Tuple], List[str]]:
+        """Execute SQL query and return results with column names.
+
+        The query is stopped with ``QueryTimeout`` after ``timeout`` seconds
+        (QUERY_CONFIG default) or with ``QueryCancelled`` when ``token`` is
+        cancelled from another thread. ``params`` are bound to ``?``
+        placeholders in the query.
+        """
+        # The advisor plans queries itself and can't bind parameters
+        if self.advisor and not params:
+            self.advisor.observe(query)
+        cached, ticket = self._cached(query, params)
+        if cached is not None:
+            return cached.to_rows(), cached.column_names
+        token = self._token(timeout, token)
+        try:
+            conn, release = self._checkout(query, params=params)
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+        
+        unwatch = None
+        try:
+            cursor = conn.cursor()
+            unwatch = self._watch(conn, cursor, token)
+            with metrics.span("db_execute"):
+                self._execute(cursor, query, params)
+            with metrics.span("db_fetch"):
+                results = cursor.fetchall()
             column_names = [description[0] for description in cursor.description] if cursor.description else []
-            conn.close()
+            cursor.close()
+            if ticket is not None:
+                self.result_cache.put(ticket, ColumnarResult.from_batches(column_names, [results]))
             return results, column_names
+        except Exception as e:
+            if self._engine_failed(release, query, e, token):
+                return self.execute_query(query, timeout, token, params)
+            raise self._query_error(e, token)
+        finally:
+            if unwatch is not None:
+                unwatch()
+            release(conn, discard=self._discard_after(token))
+    
+    def execute_columnar(self, query: str, timeout: Optional[float] = None,
+                         token: Optional[CancellationToken] = None,
+                         params: Optional[Sequence[Any]] = None) -> ColumnarResult:
+        """Execute SQL query and return typed columns instead of row tuples.
+
+        Databricks results come straight from the connector's Arrow fetch;
+        SQLite rows are fetched in batches and packed into NumPy columns as
+        they arrive, so the full list of tuples is never materialized.
+        """
+        if self.advisor and not params:
+            self.advisor.observe(query)
+        cached, ticket = self._cached(query, params)
+        if cached is not None:
+            return cached
+        token = self._token(timeout, token)
+        try:
+            conn, release = self._checkout(query, params=params)
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
+        
+        unwatch = None
+        try:
+            cursor = conn.cursor()
+            unwatch = self._watch(conn, cursor, token)
+            with metrics.span("db_execute"):
+                self._execute(cursor, query, params)
+            column_names = [description[0] for description in cursor.description] if cursor.description else []
+            with metrics.span("db_fetch"):
+                if hasattr(cursor, "fetchall_arrow"):
+                    result = ColumnarResult.from_arrow(cursor.fetchall_arrow())
+                else:
+                    batch_size = QUERY_CONFIG["batch_size"]
+                    batches = iter(lambda: cursor.fetchmany(batch_size), [])
+                    result = ColumnarResult.from_batches(column_names, batches)
+            cursor.close()
+            if ticket is not None:
+                self.result_cache.put(ticket, result)
+            return result
+        except Exception as e:
+            if self._engine_failed(release, query, e, token):
+                return self.execute_columnar(query, timeout, token, params)
+            raise self._query_error(e, token)
+        finally:
+            if unwatch is not None:
+                unwatch()
+            release(conn, discard=self._discard_after(token))
     
+    def _discard_after(self, token: Optional[CancellationToken]) -> bool:
+        # SQLite handles are fine after interrupt(); a cancelled Databricks
+        # session is dropped rather than handed to the next caller mid-cancel.
+        return token is not None and token.cancelled and self.db_type != "sqlite"
+    
+    def stream_query(self, query: str, batch_size: Optional[int] = None,
+                     max_rows: Optional[int] = None, timeout: Optional[float] = None,
+                     token: Optional[CancellationToken] = None,
+                     params: Optional[Sequence[Any]] = None) -> QueryStream:
+        """Execute SQL query and stream results in batches instead of fetching everything.
+
+        ``max_rows`` defaults to the interactive cap in QUERY_CONFIG; pass 0
+        to read the whole result.
+        """
+        if self.advisor and not params:
+            self.advisor.observe(query)
+        return QueryStream(
+            self,
+            query,
+            batch_size or QUERY_CONFIG["batch_size"],
+            (max_rows if max_rows is not None else QUERY_CONFIG["max_rows"]) or None,
+            self._token(timeout, token),
+            params
+        )
+    
+    def get_data_version(self, tables: List[str]) -> Dict[str, Any]:
+        """Get a version token per table that changes whenever its data changes.
+
+        SQLite only tracks changes for the whole database file, so every table
+        gets the same ``data_version``. Databricks Delta tables report their
+        own version in the table history.
+        """
+        if self.db_type == "sqlite":
+            version = self.pool.data_version()
+            return {table: version for table in tables}
+        elif self.db_type == "databricks":
+            catalog = DB_CONFIG["databricks"]["catalog"]
+            schema = DB_CONFIG["databricks"]["schema"]
+            versions = {}
+            for table in tables:
+                results, _ = self.execute_query(f"DESCRIBE HISTORY {catalog}.{schema}.{table} LIMIT 1")
+                versions[table] = results[0][0] if results else None
+            return versions
+
     def get_tables(self) -> List[str]:
         """Get list of all tables in the database"""
         if self.db_type == "sqlite":
-            query = "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;"
+            # rollup_* tables are derived summaries (agents/rollups.py), not schema
+            query = "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'rollup_%' ORDER BY name;"
         elif self.db_type == "databricks":
             catalog = DB_CONFIG["databricks"]["catalog"]
             schema = DB_CONFIG["databricks"]["schema"]
@@ -54,13 +408,11 @@ class DatabaseAgent:
         """Get schema information for a specific table"""
         if self.db_type == "sqlite":
             query = f"PRAGMA table_info({table_name});"
-            results, columns = self.execute_query(query)
-            df = pd.DataFrame(results, columns=columns)
+            df = self.execute_columnar(query).to_pandas()
             return df[['name', 'type', 'notnull', 'pk']]
         elif self.db_type == "databricks":
             query = f"DESCRIBE TABLE {table_name}"
-            results, columns = self.execute_query(query)
-            return pd.DataFrame(results, columns=columns)
+            return self.execute_columnar(query).to_pandas()
     
     def get_row_count(self, table_name: str) -> int:
         """Get total row count for a table"""
@@ -71,8 +423,7 @@ class DatabaseAgent:
     def get_sample_data(self, table_name: str, limit: int = 5) -> pd.DataFrame:
         """Get sample data from a table"""
         query = f"SELECT * FROM {table_name} LIMIT {limit}"
-        results, columns = self.execute_query(query)
-        return pd.DataFrame(results, columns=columns)
+        return self.execute_columnar(query).to_pandas()
     
     def get_database_stats(self) -> Dict[str, Any]:
         """Get overall database statistics"""
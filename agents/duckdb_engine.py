@@ -0,0 +1,503 @@
+"""
+DuckDB Engine - Columnar copy of the SQLite database that serves aggregate-heavy reads
+"""
+
+import glob
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from agents.sql_utils import is_read_only, mask_literals, strip_comments, table_aliases
+from config import DB_CONFIG
+
+_AGGREGATE = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b", re.IGNORECASE)
+# SQLite's LIKE ignores ASCII case, DuckDB's doesn't: same SQL, different rows
+_LIKE = re.compile(r"\bLIKE\b", re.IGNORECASE)
+# Make DuckDB answer like SQLite: 5/2 = 2, NULLs sort as the smallest value
+_SESSION_SETTINGS = [
+    "SET integer_division = true",
+    "SET default_null_order = 'nulls_first_on_asc_last_on_desc'",
+]
+_NAMED_ITEM = re.compile(r"^(?:DISTINCT\s+)?(?:\*|\w+\.\*|(?:\w+\.)?\w+|.+\s+AS\s+\w+|.+\s+AS\s+\"[^\"]+\")$",
+                         re.IGNORECASE | re.DOTALL)
+# Most recent DuckDB compatibility verdicts kept per query text
+MAX_VERDICTS = 1000
+# Part of a copy's signature: bumping it keeps copies written by older code from being reused
+COPY_FORMAT = 2
+
+_generation_ids = itertools.count(1)
+
+
+def _duckdb_type(declared: str) -> Tuple[str, str]:
+    """``(DuckDB type, SQLite CAST target)`` for a column, by SQLite's type affinity rules"""
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return "BIGINT", "INTEGER"
+    if any(token in declared for token in ("REAL", "FLOA", "DOUB", "DEC", "NUM")):
+        return "DOUBLE", "REAL"
+    # Dates stay text: SQLite compares and groups them as strings
+    return "VARCHAR", "TEXT"
+
+
+def _source_signature(path: str) -> str:
+    """Changes whenever the SQLite file or its WAL is written"""
+    parts = [f"v{COPY_FORMAT}"]
+    for name in (path, path + "-wal"):
+        try:
+            stat = os.stat(name)
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append("-")
+    return "|".join(parts)
+
+
+def _same_column_names(text: str) -> bool:
+    """Whether DuckDB will name the outer SELECT's columns as SQLite does.
+
+    Both use the alias or the bare column name; for any other expression
+    SQLite echoes the SQL text (``COUNT(*)``) and DuckDB its own rendering
+    (``count_star()``), so those queries are left on SQLite.
+    """
+    depth = 0
+    start = None
+    items, item_start = [], None
+    for match in re.finditer(r"[(),]|\b(?:SELECT|FROM)\b", text, re.IGNORECASE):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token.upper() == "SELECT" and start is None:
+            start = item_start = match.end()
+        elif depth == 0 and start is not None and token == ",":
+            items.append(text[item_start:match.start()])
+            item_start = match.end()
+        elif depth == 0 and start is not None and token.upper() == "FROM":
+            items.append(text[item_start:match.start()])
+            break
+    return bool(items) and all(_NAMED_ITEM.match(item.strip()) for item in items)
+
+
+class _Reader:
+    """A DuckDB connection handed to DatabaseAgent in place of a SQLite one.
+
+    DuckDB settings are per connection and ``cursor()`` opens a new one,
+    so every cursor gets ``_SESSION_SETTINGS`` applied before it is used.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._cursors = []
+
+    def cursor(self):
+        cursor = self.conn.cursor()
+        self._cursors.append(cursor)
+        for statement in _SESSION_SETTINGS:
+            cursor.execute(statement)
+        return cursor
+
+    def close(self):
+        for cursor in self._cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.conn.close()
+
+
+class _Generation:
+    """One DuckDB database (a columnar copy or the attached SQLite file) and its open readers"""
+
+    def __init__(self, conn, version: Optional[int], tables: Dict[str, int], path: Optional[str] = None):
+        self.id = next(_generation_ids)
+        self.conn = conn
+        self.version = version
+        self.tables = tables
+        self.path = path
+        self.created = time.time()
+        self.in_use = 0
+        self.retired = False
+
+    def open_reader(self) -> _Reader:
+        return _Reader(self.conn.cursor())
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        if self.path:
+            for name in (self.path, self.path + ".wal"):
+                if os.path.exists(name):
+                    os.remove(name)
+
+
+class DuckDBEngine:
+    """Routes aggregate-heavy read queries to DuckDB and leaves the rest on SQLite.
+
+    In ``copy`` mode every user table is copied into a DuckDB file in a
+    background thread; like the memory snapshot, the copy only serves
+    while its ``data_version`` matches the live database, and a stale copy
+    sends queries back to SQLite while the next one is built (at most once
+    every ``min_refresh_interval`` seconds). A copy whose source file is
+    unchanged is reused across restarts. ``attach`` mode reads the SQLite
+    file itself through DuckDB's sqlite extension, so it is never stale
+    but scans row-store pages.
+
+    Copies are written once and then reopened read-only, so nothing a
+    routed query does can change what later queries read.
+
+    A query is routed when it is a single SELECT with an aggregate or
+    GROUP BY, no LIKE and a named (aliased) column for every expression,
+    only reads copied tables holding ``min_rows`` or more rows, and DuckDB
+    can plan it. Queries DuckDB turns down are remembered and stay on SQLite.
+    """
+
+    def __init__(self, pool):
+        import duckdb  # Optional dependency: only needed when this engine is enabled
+
+        self.duckdb = duckdb
+        self.pool = pool
+        self.settings = DB_CONFIG["duckdb"]
+        self.mode = self.settings["mode"]
+        self.source = DB_CONFIG["sqlite"]["database"]
+        self.min_rows = self.settings["min_rows"]
+        self.min_refresh_interval = self.settings["min_refresh_interval"]
+        self._current: Optional[_Generation] = None
+        self._owners: Dict[int, _Generation] = {}
+        self._verdicts: "OrderedDict[Tuple[str, bool], bool]" = OrderedDict()
+        self._refreshing = False
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._last_refresh = float("-inf")
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"refreshes": 0, "routed": 0, "stale": 0, "rejected": 0,
+                       "last_build_seconds": None, "skipped": None}
+        self._start_refresh()
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def routes(self, query: str, params: Optional[Sequence[Any]] = None) -> bool:
+        """Whether ``query`` should run on DuckDB rather than SQLite"""
+        generation = self._current
+        if generation is None or not is_read_only(query):
+            return False
+        text = mask_literals(strip_comments(query))
+        if not _AGGREGATE.search(text) or _LIKE.search(text) or not _same_column_names(text):
+            return False
+        tables = {name.lower() for name in table_aliases(query).values()}
+        if not tables or not tables.issubset(generation.tables):
+            return False
+        if sum(generation.tables[name] for name in tables) < self.min_rows:
+            return False
+        # DuckDB runs every statement in the text it is given, EXPLAIN included,
+        # so anything it parses as more than one statement stays on SQLite
+        try:
+            if len(self.duckdb.extract_statements(query)) != 1:
+                return False
+        except Exception:
+            return False
+        return self._supported(generation, query, params)
+
+    def _supported(self, generation: _Generation, query: str, params: Optional[Sequence[Any]]) -> bool:
+        """DuckDB binds and plans the query (verdicts are cached per query text)"""
+        key = (query, bool(params))
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                return verdict
+        cursor = None
+        try:
+            cursor = generation.open_reader().cursor()
+            cursor.execute("EXPLAIN " + query, list(params) if params else None)
+            verdict = True
+        except Exception:
+            verdict = False
+        finally:
+            if cursor is not None:
+                cursor.close()
+        self._remember(key, verdict)
+        return verdict
+
+    def _remember(self, key: Tuple[str, bool], verdict: bool):
+        with self._lock:
+            self._verdicts[key] = verdict
+            self._verdicts.move_to_end(key)
+            while len(self._verdicts) > MAX_VERDICTS:
+                self._verdicts.popitem(last=False)
+
+    def reject(self, query: str, error: Exception):
+        """Keep a query DuckDB failed to run on SQLite from now on"""
+        print(f"Error running query on DuckDB, using SQLite instead: {error}")
+        self._remember((query, False), False)
+        self._remember((query, True), False)
+        with self._lock:
+            self._stats["rejected"] += 1
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    def acquire(self):
+        """A DuckDB reader on a current copy, or None when the caller should use SQLite"""
+        with self._lock:
+            generation = self._current
+        if generation is None:
+            return None
+        if generation.version is not None:
+            try:
+                version = self.pool.data_version()
+            except Exception as e:
+                print(f"Error checking DuckDB copy version: {e}")
+                return None
+            if generation.version != version:
+                with self._lock:
+                    self._stats["stale"] += 1
+                self._start_refresh()
+                return None
+
+        with self._lock:
+            if generation.retired:
+                return None
+            generation.in_use += 1
+            self._stats["routed"] += 1
+        try:
+            reader = generation.open_reader()
+        except Exception as e:
+            print(f"Error opening DuckDB reader: {e}")
+            self._release_generation(generation)
+            return None
+        with self._lock:
+            self._owners[id(reader)] = generation
+        return reader
+
+    def release(self, conn, discard: bool = False):
+        """Close a reader obtained from ``acquire``"""
+        with self._lock:
+            generation = self._owners.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        if generation is not None:
+            self._release_generation(generation)
+
+    def _release_generation(self, generation: _Generation):
+        with self._lock:
+            generation.in_use -= 1
+            finished = generation.retired and generation.in_use == 0
+        if finished:
+            generation.close()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _start_refresh(self):
+        with self._lock:
+            if (self._closed or self._refreshing
+                    or time.monotonic() - self._last_refresh < self.min_refresh_interval):
+                return
+            self._refreshing = True
+            self._refresh_thread = threading.Thread(target=self._refresh, name="duckdb-copy", daemon=True)
+            self._refresh_thread.start()
+
+    def _connect(self, path: str, read_only: bool = False):
+        config = {"memory_limit": self.settings["memory_limit"]}
+        if self.settings["threads"]:
+            config["threads"] = self.settings["threads"]
+        return self.duckdb.connect(path, read_only=read_only, config=config)
+
+    def _refresh(self):
+        started = time.perf_counter()
+        generation = None
+        try:
+            if self.mode == "attach":
+                generation = self._attach()
+            else:
+                generation = self._reuse_copy() or self._build_copy()
+            with self._lock:
+                previous, self._current = self._current, generation
+                self._stats["refreshes"] += 1
+                self._stats["last_build_seconds"] = round(time.perf_counter() - started, 3)
+                self._stats["skipped"] = None
+                finished = False
+                if previous is not None:
+                    previous.retired = True
+                    finished = previous.in_use == 0
+            if previous is not None and finished:
+                previous.close()
+        except Exception as e:
+            print(f"Error building DuckDB copy: {e}")
+            with self._lock:
+                self._stats["skipped"] = str(e)
+            if generation is not None and generation is not self._current:
+                generation.close()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._last_refresh = time.monotonic()
+            # Set after a failed first build too, so waiters don't hang
+            self._ready.set()
+
+    def _user_tables(self, source: sqlite3.Connection) -> List[str]:
+        # rollup_* tables are SQLite-side summaries (agents/rollups.py)
+        return [row[0] for row in source.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'rollup_%'"
+        )]
+
+    def _attach(self) -> _Generation:
+        conn = self._connect(":memory:")
+        conn.execute("INSTALL sqlite")
+        conn.execute("LOAD sqlite")
+        path = os.path.abspath(self.source).replace("'", "''")
+        conn.execute(f"ATTACH '{path}' AS source (TYPE SQLITE, READ_ONLY)")
+        conn.execute("USE source")
+        source = sqlite3.connect(self.source)
+        try:
+            # Row estimates from the rowid high-water mark, not COUNT(*) scans
+            tables = {name.lower(): source.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{name}"').fetchone()[0]
+                      for name in self._user_tables(source)}
+        finally:
+            source.close()
+        return _Generation(conn, None, tables)
+
+    def _reuse_copy(self) -> Optional[_Generation]:
+        """The copy left by an earlier run, if the SQLite file hasn't changed since"""
+        if self._current is not None:
+            return None
+        signature = _source_signature(self.source)
+        stem = os.path.splitext(self.settings["database"])[0]
+        for path in sorted(glob.glob(f"{stem}.*.duckdb"), key=os.path.getmtime, reverse=True):
+            try:
+                conn = self._connect(path, read_only=True)
+                row = conn.execute("SELECT signature, tables FROM _copy_info").fetchone()
+            except Exception:
+                continue
+            if row is not None and row[0] == signature:
+                tables = dict(item.split("=") for item in row[1].split(",") if item)
+                return _Generation(conn, self.pool.data_version(), {k: int(v) for k, v in tables.items()}, path)
+            conn.close()
+        return None
+
+    def _build_copy(self) -> _Generation:
+        import pyarrow as pa
+
+        stem = os.path.splitext(self.settings["database"])[0]
+        directory = os.path.dirname(stem)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Older copies that no reader holds any more
+        in_use = {generation.path for generation in (self._current,) if generation is not None}
+        for old in glob.glob(f"{stem}.*.duckdb"):
+            if old not in in_use:
+                for name in (old, old + ".wal"):
+                    if os.path.exists(name):
+                        os.remove(name)
+
+        path = f"{stem}.{os.getpid()}_{int(time.time() * 1000)}.duckdb"
+        batch_size = self.settings["batch_size"]
+        arrow_types = {"BIGINT": pa.int64(), "DOUBLE": pa.float64(), "VARCHAR": pa.string()}
+        conn = self._connect(path)
+        source = sqlite3.connect(self.source)
+        try:
+            # Read the version first: a write that lands during the copy only
+            # makes the copy look older than it is
+            version = self.pool.data_version()
+            signature = _source_signature(self.source)
+            source.execute("BEGIN")  # One read transaction: every table from the same commit
+            tables = {}
+            for table in self._user_tables(source):
+                columns = [(row[1], *_duckdb_type(row[2])) for row in source.execute(f'PRAGMA table_info("{table}")')]
+                conn.execute(f'CREATE TABLE "{table}" ('
+                             + ", ".join(f'"{name}" {duck_type}' for name, duck_type, _ in columns) + ")")
+                cursor = source.execute(
+                    "SELECT " + ", ".join(f'CAST("{name}" AS {cast})' for name, _, cast in columns) + f' FROM "{table}"'
+                )
+                rows = 0
+                for batch in iter(lambda: cursor.fetchmany(batch_size), []):
+                    arrow = pa.table({
+                        name: pa.array([row[i] for row in batch], type=arrow_types[duck_type])
+                        for i, (name, duck_type, _) in enumerate(columns)
+                    })
+                    conn.register("_copy_batch", arrow)
+                    conn.execute(f'INSERT INTO "{table}" SELECT * FROM _copy_batch')
+                    conn.unregister("_copy_batch")
+                    rows += len(batch)
+                tables[table.lower()] = rows
+            source.rollback()
+            conn.execute("CREATE TABLE _copy_info (signature VARCHAR, tables VARCHAR)")
+            conn.execute("INSERT INTO _copy_info VALUES (?, ?)",
+                         [signature, ",".join(f"{name}={rows}" for name, rows in tables.items())])
+            conn.execute("CHECKPOINT")
+            conn.close()
+            conn = self._connect(path, read_only=True)
+        except Exception:
+            conn.close()
+            for name in (path, path + ".wal"):
+                if os.path.exists(name):
+                    os.remove(name)
+            raise
+        finally:
+            source.close()
+        return _Generation(conn, version, tables, path)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first build has finished; True when a copy (or attachment) is usable"""
+        return self._ready.wait(timeout) and self._current is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            generation = self._current
+            stats = dict(self._stats)
+        stats.update({
+            "mode": self.mode,
+            "ready": generation is not None,
+            "tables": len(generation.tables) if generation else 0,
+            "age_seconds": round(time.time() - generation.created, 1) if generation else None,
+        })
+        return stats
+
+    def close(self):
+        """Stop serving; waits for a copy being built so it isn't installed (or cut off) afterwards"""
+        with self._lock:
+            self._closed = True
+            thread = self._refresh_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            generation, self._current = self._current, None
+            finished = False
+            if generation is not None:
+                generation.retired = True
+                finished = generation.in_use == 0
+        if generation is not None and finished:
+            generation.close()
+
+
+_shared_engine: Optional[DuckDBEngine] = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_engine(pool) -> Optional[DuckDBEngine]:
+    """The process-wide DuckDB engine when DB_CONFIG enables it (SQLite only)"""
+    global _shared_engine
+    if not DB_CONFIG["duckdb"]["enabled"] or pool.db_type != "sqlite":
+        return None
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            try:
+                _shared_engine = DuckDBEngine(pool)
+            except ImportError:
+                print("Error starting DuckDB engine: duckdb is not installed (see requirements.txt)")
+                return None
+        return _shared_engine
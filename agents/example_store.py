@@ -0,0 +1,195 @@
+"""
+Example Store - Validated question/SQL pairs and a TF-IDF index that picks few-shot examples
+"""
+
+import bisect
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from agents.schema_index import tokenize
+from agents.translation_cache import normalize_question
+from config import EXAMPLE_CONFIG
+
+# Used until the store has anything closer to the question
+SEED_EXAMPLES = [
+    ("How many accounts are there?",
+     "SELECT COUNT(*) as total_accounts FROM account"),
+    ("Show all active policies with account names",
+     "SELECT c.name, p.policy_type, p.premium_amount, p.coverage_amount FROM account c JOIN policies p ON c.account_id = p.account_id WHERE p.status = 'Active'"),
+    ("Which agent has sold the most policies?",
+     "SELECT a.name, COUNT(p.policy_id) as total_policies FROM agents a JOIN policies p ON a.agent_id = p.agent_id GROUP BY a.name ORDER BY total_policies DESC LIMIT 1"),
+    ("Show accounts with total claim amounts",
+     "SELECT c.name, SUM(cl.claim_amount) as total_claims FROM account c JOIN claims cl ON c.account_id = cl.account_id GROUP BY c.name"),
+]
+
+
+class ExampleIndex:
+    """In-memory TF-IDF index over example questions.
+
+    Each example's terms get a static weight ``(1 + log tf) / sqrt(terms)``
+    and a query scores ``sum(idf(t) * weight)`` over its terms, so adding an
+    example never reweights the others. Postings are kept sorted by weight
+    and a query reads at most ``max_postings`` of each, which bounds the
+    work for common terms no matter how large the store grows.
+    """
+
+    def __init__(self, max_postings: int = 1000):
+        self.max_postings = max_postings
+        self.examples: Dict[int, Tuple[str, str]] = {}
+        self._terms: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, List[Tuple[float, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def _weights(self, example_id: int, question: str, sql_query: str) -> Dict[str, float]:
+        counts = Counter(tokenize(question))
+        if not counts:
+            return {}
+        norm = math.sqrt(len(counts))
+        weights = {term: (1 + math.log(tf)) / norm for term, tf in counts.items()}
+        self.examples[example_id] = (question, sql_query)
+        self._terms[example_id] = weights
+        return weights
+
+    def add(self, example_id: int, question: str, sql_query: str):
+        if example_id in self.examples:
+            self.remove(example_id)
+        for term, weight in self._weights(example_id, question, sql_query).items():
+            bisect.insort(self._postings.setdefault(term, []), (-weight, example_id))
+
+    def build(self, rows: Iterable[Tuple[int, str, str]]):
+        """Index many ``(id, question, sql)`` rows at once (one sort per term)"""
+        for example_id, question, sql_query in rows:
+            for term, weight in self._weights(example_id, question, sql_query).items():
+                self._postings.setdefault(term, []).append((-weight, example_id))
+        for postings in self._postings.values():
+            postings.sort()
+
+    def remove(self, example_id: int):
+        self.examples.pop(example_id, None)
+        for term, weight in self._terms.pop(example_id, {}).items():
+            postings = self._postings[term]
+            position = bisect.bisect_left(postings, (-weight, example_id))
+            if position < len(postings) and postings[position][1] == example_id:
+                del postings[position]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, question: str, k: int, min_score: float = 0.0) -> List[Tuple[float, str, str]]:
+        """Up to ``k`` ``(score, question, sql)`` nearest to the question, best first"""
+        n_docs = len(self.examples)
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for term in set(tokenize(question)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + n_docs / len(postings))
+            for negative_weight, example_id in postings[:self.max_postings]:
+                scores[example_id] = get(example_id, 0.0) - idf * negative_weight
+        if not scores:
+            return []
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, *self.examples[example_id]) for example_id, score in best if score >= min_score]
+
+
+class ExampleStore:
+    """Question/SQL pairs that ran successfully, persisted in SQLite.
+
+    ``add`` is called after a generated query runs without error, so the
+    examples offered to the model grow with real usage; one entry is kept
+    per normalized question (the latest SQL wins) and the least recently
+    added are dropped beyond ``max_examples``. ``nearest`` answers from the
+    in-memory index and falls back to the seed examples when nothing in
+    the store shares a term with the question.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_examples: Optional[int] = None):
+        self.path = path or EXAMPLE_CONFIG["path"]
+        self.max_examples = max_examples or EXAMPLE_CONFIG["max_examples"]
+        self.top_k = EXAMPLE_CONFIG["top_k"]
+        self.min_score = EXAMPLE_CONFIG["min_score"]
+        self.index = ExampleIndex(EXAMPLE_CONFIG["max_postings_per_term"])
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS examples (
+                example_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question_key TEXT UNIQUE,
+                question TEXT,
+                sql_query TEXT,
+                created_at REAL
+            )
+        """)
+        self._conn.commit()
+        self.index.build(self._conn.execute("SELECT example_id, question, sql_query FROM examples"))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, question: str, sql_query: str):
+        """Remember a question whose SQL ran successfully"""
+        key = normalize_question(question)
+        with self._lock:
+            row = self._conn.execute("SELECT example_id, sql_query FROM examples WHERE question_key = ?", (key,)).fetchone()
+            if row is not None and row[1] == sql_query:
+                return
+            if row is not None:
+                self._conn.execute("DELETE FROM examples WHERE example_id = ?", (row[0],))
+                self.index.remove(row[0])
+            cursor = self._conn.execute(
+                "INSERT INTO examples (question_key, question, sql_query, created_at) VALUES (?, ?, ?, ?)",
+                (key, question, sql_query, time.time())
+            )
+            self.index.add(cursor.lastrowid, question, sql_query)
+            overflow = self._conn.execute(
+                "SELECT example_id FROM examples ORDER BY example_id DESC LIMIT -1 OFFSET ?", (self.max_examples,)
+            ).fetchall()
+            for (example_id,) in overflow:
+                self.index.remove(example_id)
+            if overflow:
+                self._conn.executemany("DELETE FROM examples WHERE example_id = ?", overflow)
+            self._conn.commit()
+
+    def remove(self, question: str):
+        """Drop a question's example, e.g. when its SQL stopped working"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT example_id FROM examples WHERE question_key = ?", (normalize_question(question),)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM examples WHERE example_id = ?", (row[0],))
+                self._conn.commit()
+                self.index.remove(row[0])
+
+    def nearest(self, question: str, k: Optional[int] = None) -> List[Tuple[str, str]]:
+        """The ``k`` most similar ``(question, sql)`` examples.
+
+        When none is similar enough the prompt gets every seed example, as
+        it did before examples were selected.
+        """
+        k = k or self.top_k
+        with self._lock:
+            found = self.index.search(question, k, self.min_score)
+        return [(q, sql) for _, q, sql in found] or list(SEED_EXAMPLES)
+
+
+def format_examples(examples: List[Tuple[str, str]]) -> str:
+    """The EXAMPLE QUERIES block of the SQL prompt"""
+    if not examples:
+        return ""
+    lines = ["EXAMPLE QUERIES:", ""]
+    for question, sql_query in examples:
+        lines.extend([f'Question: "{question}"', f"SQL: {sql_query}", ""])
+    return "\n".join(lines) + "\n"
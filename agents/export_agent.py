@@ -0,0 +1,324 @@
+"""
+Export Agent - Streams query results from the cursor to CSV, Parquet or Excel files
+"""
+
+import csv
+import gzip
+import os
+import time
+import uuid
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from agents import metrics
+from agents.cancellation import CancellationToken
+from config import EXPORT_CONFIG
+
+# Format -> (file extension, label)
+FORMATS = {
+    "csv": (".csv", "CSV"),
+    "parquet": (".parquet", "Parquet"),
+    "xlsx": (".xlsx", "Excel"),
+}
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "gzip": "application/gzip",
+}
+
+
+def file_name(base: str, output_format: str, compress: bool = False) -> str:
+    """``base`` with the format's extension (``.gz`` added for compressed CSV)"""
+    extension = FORMATS[output_format][0]
+    if compress and output_format == "csv":
+        extension += ".gz"
+    return base + extension
+
+
+def mime_type(path: str) -> str:
+    if path.endswith(".gz"):
+        return MIME_TYPES["gzip"]
+    for output_format, (extension, _) in FORMATS.items():
+        if path.endswith(extension):
+            return MIME_TYPES[output_format]
+    return "application/octet-stream"
+
+
+class _CSVWriter:
+    def __init__(self, path: str, columns: List[str], compress: bool):
+        if compress:
+            self._file = gzip.open(path, "wt", newline="", encoding="utf-8",
+                                   compresslevel=EXPORT_CONFIG["gzip_level"])
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(columns)
+
+    def write(self, batch: List[Tuple]):
+        self._csv.writerows(batch)
+
+    def close(self):
+        self._file.close()
+
+    discard = close
+
+
+class _ParquetWriter:
+    """Buffers rows up to one row group, so memory is bounded by ``row_group_size``.
+
+    SQLite columns aren't bound to one type, so the schema inferred from
+    the first row group can turn out too narrow: an integer column may
+    hold a fraction further down, or a column that was all NULL gets its
+    first values. When a row group needs a wider type (int64 to float64,
+    NULL to the values' type, anything else mixed to string) the groups
+    already written are copied into a new file under the widened schema,
+    one row group at a time.
+    """
+
+    def __init__(self, path: str, columns: List[str], compress: bool):
+        self.path = path
+        self.columns = columns
+        self.row_group_size = EXPORT_CONFIG["parquet_row_group_size"]
+        self.compression = "gzip" if compress else EXPORT_CONFIG["parquet_compression"]
+        self._rows: List[Tuple] = []
+        self._writer = None
+        self._schema = None
+        self._unset = set()   # Columns with no non-NULL value written yet
+
+    def write(self, batch: List[Tuple]):
+        self._rows.extend(batch)
+        while len(self._rows) >= self.row_group_size:
+            self._flush(self._rows[:self.row_group_size])
+            del self._rows[:self.row_group_size]
+
+    @staticmethod
+    def _array(values: List[Any]):
+        import pyarrow as pa
+
+        try:
+            return pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types within the group (e.g. numbers and text in one column)
+            return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+    @staticmethod
+    def _wider(current, new):
+        import pyarrow as pa
+
+        if new == current or pa.types.is_null(new):
+            return current
+        if pa.types.is_integer(current) and pa.types.is_floating(new):
+            return pa.float64()
+        if pa.types.is_floating(current) and pa.types.is_integer(new):
+            return current
+        return pa.string()
+
+    def _flush(self, rows: List[Tuple]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: self._array([row[i] for row in rows]) for i, name in enumerate(self.columns)})
+        if self._writer is None:
+            self._unset = {field.name for field in table.schema if pa.types.is_null(field.type)}
+            self._schema = pa.schema([
+                pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression=self.compression)
+        else:
+            schema = pa.schema([
+                pa.field(field.name, new.type if field.name in self._unset and not pa.types.is_null(new.type)
+                         else self._wider(field.type, new.type))
+                for field, new in zip(self._schema, table.schema)
+            ])
+            if not schema.equals(self._schema):
+                self._rewrite(schema)
+        self._unset -= {field.name for field in table.schema if not pa.types.is_null(field.type)}
+        self._writer.write_table(table.cast(self._schema), row_group_size=len(rows))
+
+    def _rewrite(self, schema):
+        """Copy the row groups written so far into a new file with ``schema``"""
+        import pyarrow.parquet as pq
+
+        self._writer.close()
+        previous = f"{self.path}.narrow"
+        os.replace(self.path, previous)
+        try:
+            self._writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+            written = pq.ParquetFile(previous)
+            for group in range(written.num_row_groups):
+                self._writer.write_table(written.read_row_group(group).cast(schema))
+        finally:
+            os.remove(previous)
+        self._schema = schema
+
+    def close(self):
+        if self._rows or self._writer is None:
+            self._flush(self._rows)
+            self._rows = []
+        self._writer.close()
+
+    def discard(self):
+        self._rows = []
+        if self._writer is not None:
+            self._writer.close()
+
+
+class _ExcelWriter:
+    """openpyxl write-only workbook: rows go to a temporary file, not a cell tree in memory.
+
+    A new worksheet is started every ``xlsx_sheet_rows`` rows, since Excel
+    can't open a sheet longer than 1,048,576 rows. The file is already
+    zip-compressed, so ``compress`` has no effect. By far the slowest
+    format: openpyxl serializes cells in pure Python unless lxml is installed.
+    """
+
+    def __init__(self, path: str, columns: List[str], compress: bool):
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+        self.path = path
+        self.columns = columns
+        self.sheet_rows = EXPORT_CONFIG["xlsx_sheet_rows"]
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self._workbook = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_count = 0
+        self._sheet_rows_written = 0
+
+    def _new_sheet(self):
+        self._sheet_count += 1
+        title = "Results" if self._sheet_count == 1 else f"Results {self._sheet_count}"
+        self._sheet = self._workbook.create_sheet(title)
+        self._sheet.append(self.columns)
+        self._sheet_rows_written = 0
+
+    def _value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self._illegal.sub("", value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex()
+        return value
+
+    def write(self, batch: List[Tuple]):
+        for row in batch:
+            if self._sheet is None or self._sheet_rows_written >= self.sheet_rows:
+                self._new_sheet()
+            self._sheet.append([self._value(value) for value in row])
+            self._sheet_rows_written += 1
+
+    def close(self):
+        if self._sheet is None:
+            self._new_sheet()
+        self._workbook.save(self.path)
+
+    def discard(self):
+        # Nothing is on disk under our name until save()
+        self._workbook = None
+
+
+_WRITERS = {"csv": _CSVWriter, "parquet": _ParquetWriter, "xlsx": _ExcelWriter}
+
+
+class ResultWriter:
+    """Writes one result batch by batch; the file only appears under its name once complete"""
+
+    def __init__(self, path: str, output_format: str, columns: List[str], compress: bool = False):
+        if output_format not in _WRITERS:
+            raise ValueError(f"Unknown export format: {output_format}")
+        self.path = path
+        self.format = output_format
+        self.columns = columns
+        self.temporary = f"{path}.partial"
+        self._writer = _WRITERS[output_format](self.temporary, columns, compress)
+
+    def write(self, batch: List[Tuple]):
+        self._writer.write(batch)
+
+    def close(self):
+        """Finish the file and move it into place"""
+        self._writer.close()
+        os.replace(self.temporary, self.path)
+
+    def abort(self):
+        """Drop a partly written file"""
+        try:
+            self._writer.discard()
+        except Exception:
+            pass
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+
+class ExportResult:
+    """Where an export was written and how much it holds"""
+
+    def __init__(self, path: str, output_format: str, rows: int, seconds: float):
+        self.path = path
+        self.format = output_format
+        self.rows = rows
+        self.seconds = seconds
+        self.bytes = os.path.getsize(path)
+
+
+class ExportAgent:
+    """Runs a query and streams its rows into a file.
+
+    Rows go from ``fetchmany`` batches straight to the writer, so memory is
+    bounded by the batch size (one row group for Parquet) however large the
+    result is. The export ignores the interactive row cap; ``progress`` is
+    called with ``(rows written, total rows or None)`` as it goes.
+    """
+
+    def __init__(self, db_agent, export_dir: Optional[str] = None):
+        self.db_agent = db_agent
+        self.export_dir = export_dir or EXPORT_CONFIG["dir"]
+
+    def new_path(self, output_format: str, compress: bool = False) -> str:
+        """A fresh file in the export directory (old exports are cleared out first)"""
+        os.makedirs(self.export_dir, exist_ok=True)
+        self.purge_old()
+        base = f"query_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        return os.path.join(self.export_dir, file_name(base, output_format, compress))
+
+    def purge_old(self, max_age: Optional[float] = None):
+        """Delete exports older than ``max_age`` seconds"""
+        cutoff = time.time() - (max_age if max_age is not None else EXPORT_CONFIG["max_age"])
+        for name in os.listdir(self.export_dir):
+            path = os.path.join(self.export_dir, name)
+            try:
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError as e:
+                print(f"Error removing old export {path}: {e}")
+
+    def export(self, query: str, output_format: str = "csv", path: Optional[str] = None,
+               compress: bool = False, params: Optional[Sequence[Any]] = None,
+               token: Optional[CancellationToken] = None,
+               progress: Optional[Callable[[int, Optional[int]], None]] = None,
+               count_rows: Optional[bool] = None) -> ExportResult:
+        """Write the full result of ``query`` to ``path`` (a new file in the export directory by default)"""
+        path = path or self.new_path(output_format, compress)
+        count_rows = EXPORT_CONFIG["count_rows"] if count_rows is None else count_rows
+        started = time.perf_counter()
+        with metrics.span("export"):
+            with self.db_agent.stream_query(query, batch_size=EXPORT_CONFIG["batch_size"], max_rows=0,
+                                            timeout=EXPORT_CONFIG["timeout"] or 0, token=token,
+                                            params=params) as stream:
+                # COUNT(*) costs one more pass, but lets progress show a percentage
+                total = stream.total_rows() if progress is not None and count_rows else None
+                writer = ResultWriter(path, output_format, stream.columns, compress)
+                reported = time.monotonic()
+                try:
+                    for batch in stream:
+                        writer.write(batch)
+                        if progress is not None and time.monotonic() - reported >= EXPORT_CONFIG["progress_interval"]:
+                            progress(stream.row_count, total)
+                            reported = time.monotonic()
+                    writer.close()
+                except BaseException:
+                    writer.abort()
+                    raise
+        if progress is not None:
+            progress(stream.row_count, total if total is not None else stream.row_count)
+        return ExportResult(path, output_format, stream.row_count, time.perf_counter() - started)
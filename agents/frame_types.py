@@ -0,0 +1,143 @@
+"""
+Frame Types - Compact DataFrame dtypes for query results, guided by the schema catalog
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from agents import metrics
+from agents.columnar import FLOAT, INT, OBJECT, Column, ColumnarResult
+from config import FRAME_CONFIG
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$")
+_INT32 = np.iinfo(np.int32)
+
+
+def _memory(values) -> int:
+    """Bytes a DataFrame column holding ``values`` uses, boxed strings included"""
+    return int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+
+
+class FrameTyper:
+    """Builds DataFrames with compact column dtypes instead of object columns.
+
+    A result column is matched by name to the catalog's columns for its
+    declared type; computed columns (aliases, aggregates) go by their
+    values alone. Integers are narrowed to int32 when they fit (never
+    narrower, so arithmetic on the frame doesn't overflow) and become
+    nullable ``Int32``/``Int64`` instead of float when they have NULLs.
+    With ``float32_decimals`` set, floats drop to float32 when every value
+    is unchanged at that many places; money-like and aggregate columns
+    (``float64_columns``) stay float64 because their sums would drift.
+    DATE/TIME columns and ISO-formatted strings become datetime64,
+    low-cardinality text becomes categorical and the remaining text is
+    stored as Arrow strings.
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+        self.category_columns = {name.lower() for name in FRAME_CONFIG["category_columns"]}
+        self.max_categories = FRAME_CONFIG["max_categories"]
+        self.max_category_ratio = FRAME_CONFIG["max_category_ratio"]
+        self.float32_decimals = FRAME_CONFIG["float32_decimals"]
+        self.float64_columns = [name.lower() for name in FRAME_CONFIG["float64_columns"]]
+        self.arrow_strings = FRAME_CONFIG["arrow_strings"]
+        self._declared: Dict[str, Optional[str]] = {}
+        self._fingerprint = None
+
+    def declared_types(self) -> Dict[str, Optional[str]]:
+        """``{column name: declared type}`` over every table (None when tables disagree)"""
+        if self.catalog is None:
+            return {}
+        tables = self.catalog.get_tables()
+        if self._fingerprint != self.catalog.fingerprint or not self._declared:
+            declared: Dict[str, Optional[str]] = {}
+            for table in tables.values():
+                for column in table["columns"]:
+                    name, column_type = column["name"].lower(), (column["type"] or "").upper()
+                    declared[name] = column_type if declared.get(name, column_type) == column_type else None
+            self._declared = declared
+            self._fingerprint = self.catalog.fingerprint
+        return self._declared
+
+    def to_frame(self, result: ColumnarResult, report: Optional[bool] = None) -> Tuple[pd.DataFrame, Optional[Dict[str, Any]]]:
+        """The result as a typed DataFrame, plus a memory report (None when ``report`` is off)"""
+        report = FRAME_CONFIG["report_memory"] if report is None else report
+        declared = self.declared_types()
+        with metrics.span("dataframe"):
+            typed = {}
+            columns = []
+            for i, column in enumerate(result.columns):
+                values = self._convert(column, declared.get(column.name.lower()), result.row_count)
+                typed[i] = values
+                if report:
+                    before = _memory(column.to_pandas())
+                    after = _memory(values)
+                    columns.append({"name": column.name, "before": before, "after": after,
+                                    "dtype": str(getattr(values, "dtype", "object"))})
+            # Positional keys keep duplicate column names (see ColumnarResult.to_pandas)
+            df = pd.DataFrame(typed)
+            df.columns = result.column_names
+        if not report:
+            return df, None
+        return df, {
+            "rows": result.row_count,
+            "before_bytes": sum(column["before"] for column in columns),
+            "after_bytes": sum(column["after"] for column in columns),
+            "columns": columns,
+        }
+
+    def from_rows(self, rows: Sequence[Tuple], column_names: List[str]) -> Tuple[pd.DataFrame, Optional[Dict[str, Any]]]:
+        """``to_frame`` for the row tuples ``execute_query`` returns"""
+        return self.to_frame(ColumnarResult.from_batches(column_names, [rows]))
+
+    def _convert(self, column: Column, declared: Optional[str], row_count: int):
+        if column.kind == INT:
+            return self._integers(column)
+        if column.kind == FLOAT:
+            return self._floats(column.name, column)
+        values = column.to_pandas()
+        # infer_dtype checks every element in C, skipping NULLs
+        if column.kind == OBJECT and row_count and pd.api.types.infer_dtype(values, skipna=True) == "string":
+            return self._text(column.name, values, column.mask, declared)
+        return values
+
+    def _integers(self, column: Column):
+        values = column.values
+        if len(values) and _INT32.min <= values.min() and values.max() <= _INT32.max:
+            values = values.astype(np.int32)
+        if column.mask is None:
+            return values
+        return pd.arrays.IntegerArray(values, column.mask.copy())
+
+    def _floats(self, name: str, column: Column):
+        values = column.to_pandas()
+        if self.float32_decimals is None or any(part in name.lower() for part in self.float64_columns):
+            return values
+        narrow = values.astype(np.float32)
+        # Equal at display precision, with NaN (NULL) matching NaN
+        if np.array_equal(np.round(narrow.astype(np.float64), self.float32_decimals),
+                          np.round(values, self.float32_decimals), equal_nan=True):
+            return narrow
+        return values
+
+    def _text(self, name: str, values: np.ndarray, mask: Optional[np.ndarray], declared: Optional[str]):
+        nulls = int(mask.sum()) if mask is not None else 0
+        sample = values[int(np.argmin(mask))] if mask is not None else values[0]
+        declared = declared or ""
+        if "DATE" in declared or "TIME" in declared or (not declared and _ISO_DATE.match(sample)):
+            dates = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", errors="coerce")
+            # Anything that didn't parse means this isn't really a date column
+            if dates.isna().sum() == nulls:
+                return dates.to_numpy()
+
+        # One hashing pass gives both the distinct count and the category codes
+        codes, categories = pd.factorize(values, sort=True)
+        if name.lower() in self.category_columns or (
+                len(categories) <= self.max_categories
+                and len(categories) <= len(values) * self.max_category_ratio):
+            return pd.Categorical.from_codes(codes, categories)
+        if self.arrow_strings:
+            return pd.array(values, dtype="string[pyarrow]")
+        return values
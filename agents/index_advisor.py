@@ -0,0 +1,337 @@
+"""
+Index Advisor - Default covering indexes plus EXPLAIN-driven index recommendations
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from agents.cancellation import CancellationToken, QueryCancelled
+from agents.sql_utils import predicate_columns, table_aliases
+from config import INDEX_CONFIG
+
+# (index name, table, columns). Leading columns serve the joins and status
+# filters used by the dashboard and analytics pages; trailing columns make
+# the index covering so the aggregate never touches the table itself.
+DEFAULT_INDEXES = [
+    ("idx_policies_account", "policies", ["account_id"]),
+    ("idx_policies_agent", "policies", ["agent_id", "premium_amount"]),
+    ("idx_policies_status_type", "policies", ["status", "policy_type", "premium_amount", "coverage_amount"]),
+    ("idx_policies_status_account", "policies", ["status", "account_id", "premium_amount"]),
+    ("idx_claims_policy", "claims", ["policy_id", "claim_amount", "approved_amount"]),
+    ("idx_claims_status", "claims", ["status", "claim_amount", "approved_amount"]),
+    ("idx_claims_account", "claims", ["account_id"]),
+    ("idx_payments_policy", "payments", ["policy_id"]),
+    ("idx_payments_account", "payments", ["account_id"]),
+]
+
+_AUTOMATIC_INDEX = re.compile(
+    r"^SEARCH (?:TABLE )?(\w+)(?: AS (\w+))? USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \((.*)\)"
+)
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$")
+_MAX_TRACKED_QUERIES = 10000
+
+
+def create_default_indexes(conn) -> List[str]:
+    """Create any missing default index on a SQLite connection; returns the names created"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created = []
+    for name, table, columns in DEFAULT_INDEXES:
+        if table in tables and name not in existing:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({", ".join(columns)})')
+            created.append(name)
+    if created:
+        conn.execute("ANALYZE")
+    conn.commit()
+    return created
+
+
+def index_name(table: str, columns: List[str]) -> str:
+    return f"idx_{table}_{'_'.join(columns)}"
+
+
+class IndexAdvisor:
+    """Watches the plans of executed queries and recommends indexes for their scans.
+
+    Each distinct query is explained once. Two plan shapes produce a
+    recommendation: a full ``SCAN`` of a large table that the query filters
+    on, and an ``AUTOMATIC INDEX`` (SQLite building a throwaway index on
+    every run because a join column isn't indexed). Recommendations can be
+    applied by hand with ``create_index`` or automatically once seen often
+    enough; either way the sample query is timed before and after, each
+    timing stopped after ``timing_timeout`` seconds.
+
+    Table columns and analyzed plans are cached until ``PRAGMA
+    schema_version`` moves (new tables or indexes); row counts until
+    ``data_version`` does, and plans are analyzed again when a table
+    crosses ``min_table_rows``. Both are checked at most every
+    ``version_check_interval`` seconds.
+    """
+
+    def __init__(self, db_agent):
+        settings = INDEX_CONFIG["advisor"]
+        self.db_agent = db_agent
+        self.auto_create = settings["auto_create"]
+        self.min_occurrences = settings["min_occurrences"]
+        self.min_table_rows = settings["min_table_rows"]
+        self.min_speedup = settings["min_speedup"]
+        self.timing_runs = settings["timing_runs"]
+        self.timing_timeout = settings["timing_timeout"]
+        self.version_check_interval = settings["version_check_interval"]
+
+        self._query_candidates: Dict[str, List[Tuple[str, Tuple[str, ...], str]]] = {}
+        self._recommendations: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+        self._columns: Dict[str, List[str]] = {}
+        self._row_counts: Dict[str, int] = {}
+        self._building = set()
+        self._schema_version = None
+        self._data_version = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Observation
+    # ------------------------------------------------------------------
+
+    def observe(self, query: str):
+        """Record the scans in a query's plan; never raises"""
+        if not re.match(r"\s*(SELECT|WITH)\b", query, re.IGNORECASE):
+            return
+        key = hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()
+        try:
+            self._check_versions()
+            with self._lock:
+                candidates = self._query_candidates.get(key)
+            if candidates is None:
+                candidates = self._analyze(query)
+                with self._lock:
+                    if len(self._query_candidates) >= _MAX_TRACKED_QUERIES:
+                        self._query_candidates.pop(next(iter(self._query_candidates)))
+                    self._query_candidates[key] = candidates
+
+            ready = []
+            with self._lock:
+                for table, columns, reason in candidates:
+                    rec = self._recommendations.get((table, columns))
+                    if rec is None:
+                        rec = {
+                            "table": table,
+                            "columns": list(columns),
+                            "name": index_name(table, list(columns)),
+                            "statement": f'CREATE INDEX {index_name(table, list(columns))} ON "{table}" ({", ".join(columns)})',
+                            "reason": reason,
+                            "occurrences": 0,
+                            "sample_query": query,
+                            "status": "recommended",
+                            "before": None,
+                            "after": None,
+                            "speedup": None,
+                            "timed_out": False,
+                        }
+                        self._recommendations[(table, columns)] = rec
+                    rec["occurrences"] += 1
+                    if (self.auto_create and rec["status"] == "recommended"
+                            and rec["occurrences"] >= self.min_occurrences
+                            and (table, columns) not in self._building):
+                        self._building.add((table, columns))
+                        ready.append((table, columns))
+            for table, columns in ready:
+                threading.Thread(
+                    target=self._auto_create, args=(table, columns), name="index-advisor", daemon=True
+                ).start()
+        except Exception as e:
+            print(f"Index advisor error: {e}")
+
+    def _analyze(self, query: str) -> List[Tuple[str, Tuple[str, ...], str]]:
+        """Index candidates ``(table, columns, reason)`` for one query"""
+        plan = [row[3] for row in self._run("EXPLAIN QUERY PLAN " + query)]
+        aliases = table_aliases(query)
+        predicates = predicate_columns(query)
+        candidates = []
+
+        for detail in plan:
+            automatic = _AUTOMATIC_INDEX.match(detail)
+            scan = _FULL_SCAN.match(detail)
+            if automatic:
+                table = aliases.get(automatic.group(2) or automatic.group(1), automatic.group(1))
+                columns = re.findall(r"(\w+)\s*[=<>]", automatic.group(3))
+                reason = "automatic index built on every run"
+            elif scan:
+                table = aliases.get(scan.group(2) or scan.group(1), scan.group(1))
+                columns = self._filter_columns(table, scan.group(2) or scan.group(1), aliases, predicates)
+                reason = "full table scan with a filter"
+            else:
+                continue
+
+            if not columns or table.startswith("sqlite_") or table not in self._table_columns_map():
+                continue
+            if self._table_rows(table) < self.min_table_rows or self._is_indexed(table, columns):
+                continue
+            candidates.append((table, tuple(columns), reason))
+        return candidates
+
+    def _filter_columns(self, table: str, reference: str, aliases: Dict[str, str],
+                        predicates: List[Tuple[Optional[str], str, str]]) -> List[str]:
+        """Equality columns first, then one range column, as the index should order them"""
+        table_columns = set(self._table_columns(table))
+        single_table = len(set(aliases.values())) <= 1
+        equality, ranges = [], []
+        for qualifier, column, kind in predicates:
+            if qualifier is not None:
+                if aliases.get(qualifier, qualifier) != table:
+                    continue
+            elif not single_table or column not in table_columns:
+                continue
+            if column not in table_columns:
+                continue
+            target = equality if kind == "eq" else ranges
+            if column not in equality and column not in ranges:
+                target.append(column)
+        return (equality + ranges[:1])[:3]
+
+    # ------------------------------------------------------------------
+    # Recommendations
+    # ------------------------------------------------------------------
+
+    def recommendations(self) -> List[Dict[str, Any]]:
+        """Every recommendation seen so far, most frequent first"""
+        with self._lock:
+            recs = [dict(rec) for rec in self._recommendations.values()]
+        return sorted(recs, key=lambda rec: -rec["occurrences"])
+
+    def create_index(self, table: str, columns: List[str], keep_if_slower: bool = True) -> Dict[str, Any]:
+        """Create a recommended index, timing its sample query before and after"""
+        key = (table, tuple(columns))
+        with self._lock:
+            rec = self._recommendations.get(key)
+        if rec is None:
+            raise ValueError(f"No recommendation for {table}({', '.join(columns)})")
+
+        before, _ = self._time_query(rec["sample_query"])
+        self._run(rec["statement"].replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1), write=True)
+        self._run(f"ANALYZE {rec['name']}", write=True)
+        after, finished = self._time_query(rec["sample_query"])
+
+        # A before timing cut off at the deadline only understates the speedup
+        speedup = before / after if finished and after else None
+        status = "created"
+        if not keep_if_slower and (speedup is None or speedup < self.min_speedup):
+            self._run(f"DROP INDEX IF EXISTS {rec['name']}", write=True)
+            status = "rejected"
+
+        with self._lock:
+            rec.update(before=round(before, 6), after=round(after, 6),
+                       speedup=round(speedup, 2) if speedup else None, status=status,
+                       timed_out=not finished)
+            return dict(rec)
+
+    def _auto_create(self, table: str, columns: Tuple[str, ...]):
+        try:
+            rec = self.create_index(table, list(columns), keep_if_slower=False)
+            print(f"Index advisor: {rec['name']} {rec['status']} "
+                  f"({rec['before'] * 1000:.1f} ms -> {rec['after'] * 1000:.1f} ms)")
+        except Exception as e:
+            print(f"Index advisor error: {e}")
+        finally:
+            with self._lock:
+                self._building.discard((table, columns))
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _run(self, query: str, write: bool = False, token: Optional[CancellationToken] = None) -> List[Tuple]:
+        # Straight to the pool so the advisor's own queries aren't observed
+        conn = self.db_agent.pool.acquire()
+        unwatch = None
+        try:
+            cursor = conn.cursor()
+            unwatch = self.db_agent._watch(conn, cursor, token)
+            rows = cursor.execute(query).fetchall()
+            if write:
+                conn.commit()
+            return rows
+        except Exception:
+            if token is not None and token.cancelled:
+                raise token.error()
+            raise
+        finally:
+            if unwatch is not None:
+                unwatch()
+            self.db_agent.pool.release(conn)
+
+    def _time_query(self, query: str) -> Tuple[float, bool]:
+        """Best of ``timing_runs`` runs and whether any run finished.
+
+        All runs share one ``timing_timeout`` deadline; when the first run
+        is stopped by it the deadline is returned, a lower bound.
+        """
+        token = CancellationToken(self.timing_timeout)
+        best = None
+        for _ in range(self.timing_runs):
+            started = time.perf_counter()
+            try:
+                self._run(query, token=token)
+            except QueryCancelled:
+                break
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        if best is None:
+            return self.timing_timeout, False
+        return best, True
+
+    def _check_versions(self):
+        """Drop cached columns, plans and row counts the database has moved on from"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.version_check_interval:
+                return
+            self._checked_at = now
+        schema_version = self._run("PRAGMA schema_version")[0][0]
+        data_version = self.db_agent.pool.data_version()
+
+        recount = {}
+        if data_version != self._data_version:
+            with self._lock:
+                tables = list(self._row_counts)
+            recount = {table: self._run(f'SELECT MAX(rowid) FROM "{table}"')[0][0] or 0 for table in tables}
+        with self._lock:
+            if schema_version != self._schema_version:
+                self._columns = {}
+                self._row_counts = {}
+                self._query_candidates = {}
+                self._schema_version = schema_version
+            elif recount:
+                # A table that grew past (or shrank below) min_table_rows changes what its scans are worth
+                crossed = any((self._row_counts.get(table, 0) >= self.min_table_rows) != (rows >= self.min_table_rows)
+                              for table, rows in recount.items())
+                if crossed:
+                    self._query_candidates = {}
+                self._row_counts.update(recount)
+            self._data_version = data_version
+
+    def _table_columns_map(self) -> Dict[str, List[str]]:
+        if not self._columns:
+            columns = {}
+            for (table,) in self._run("SELECT name FROM sqlite_master WHERE type = 'table'"):
+                columns[table] = [row[1] for row in self._run(f"PRAGMA table_info(\"{table}\")")]
+            self._columns = columns
+        return self._columns
+
+    def _table_columns(self, table: str) -> List[str]:
+        return self._table_columns_map().get(table, [])
+
+    def _table_rows(self, table: str) -> int:
+        if table not in self._row_counts:
+            self._row_counts[table] = self._run(f'SELECT MAX(rowid) FROM "{table}"')[0][0] or 0
+        return self._row_counts[table]
+
+    def _is_indexed(self, table: str, columns: List[str]) -> bool:
+        """True if an existing index already leads with these columns"""
+        for index in self._run(f"PRAGMA index_list(\"{table}\")"):
+            indexed = [row[2] for row in self._run(f"PRAGMA index_info(\"{index[1]}\")")]
+            if indexed[:len(columns)] == list(columns):
+                return True
+        return False
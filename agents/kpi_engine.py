@@ -0,0 +1,106 @@
+"""
+KPI Engine - Computes dashboard metrics in a single scan per table and caches them
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+from agents.db_agent import DatabaseAgent
+from config import CACHE_CONFIG
+
+# One conditional-aggregation query per table. Every KPI shown on the
+# dashboard is a column here, so each table is scanned exactly once.
+KPI_QUERIES = {
+    "account": """
+        SELECT COUNT(*) AS total_accounts
+        FROM account
+    """,
+    "policies": """
+        SELECT SUM(CASE WHEN status = 'Active' THEN 1 ELSE 0 END) AS active_policies,
+               SUM(CASE WHEN status = 'Active' THEN premium_amount END) AS total_premium
+        FROM policies
+    """,
+    "claims": """
+        SELECT COUNT(*) AS total_claims,
+               SUM(CASE WHEN status = 'Approved' THEN approved_amount END) AS total_approved_claims,
+               SUM(CASE WHEN status = 'Pending' THEN 1 ELSE 0 END) AS pending_claims
+        FROM claims
+    """,
+}
+
+# The same KPIs read from the trigger-maintained rollups (agents/rollups.py);
+# each query touches a handful of summary rows instead of a whole table.
+ROLLUP_KPI_QUERIES = {
+    "account": """
+        SELECT SUM(account_count) AS total_accounts
+        FROM rollup_account_totals
+    """,
+    "policies": """
+        SELECT SUM(policy_count) AS active_policies,
+               SUM(total_premium) AS total_premium
+        FROM rollup_policies_by_type_status
+        WHERE status = 'Active'
+    """,
+    "claims": """
+        SELECT SUM(claim_count) AS total_claims,
+               SUM(CASE WHEN status = 'Approved' THEN total_approved END) AS total_approved_claims,
+               SUM(CASE WHEN status = 'Pending' THEN claim_count ELSE 0 END) AS pending_claims
+        FROM rollup_claims_by_status
+    """,
+}
+
+
+class KPIEngine:
+    """Computes dashboard KPIs and keeps a snapshot per table.
+
+    A table's snapshot is reused until the data version reported by
+    ``DatabaseAgent.get_data_version`` moves, so repeated dashboard loads
+    cost one cheap version check instead of a scan of every table. When
+    ``rollups`` (a ``RollupManager``) reports the summary tables installed,
+    rescans read those instead of the base tables.
+    """
+
+    def __init__(self, db_agent: Optional[DatabaseAgent] = None, rollups=None):
+        self.db_agent = db_agent or DatabaseAgent()
+        self.rollups = rollups
+        self.version_check_interval = CACHE_CONFIG["kpi"]["version_check_interval"]
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, Any] = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _scan_table(self, table: str) -> Dict[str, Any]:
+        """Compute every KPI that comes from one table"""
+        queries = ROLLUP_KPI_QUERIES if self.rollups is not None and self.rollups.available() else KPI_QUERIES
+        results, columns = self.db_agent.execute_query(queries[table])
+        row = results[0] if results else [None] * len(columns)
+        # SUM over no matching rows is NULL; the dashboard wants 0
+        return {name: value if value is not None else 0 for name, value in zip(columns, row)}
+
+    def _current_versions(self) -> Dict[str, Any]:
+        """Return table versions, re-reading them at most every check interval"""
+        now = time.monotonic()
+        if self._versions and now - self._last_check < self.version_check_interval:
+            return self._versions
+        self._versions = self.db_agent.get_data_version(list(KPI_QUERIES))
+        self._last_check = now
+        return self._versions
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return dashboard KPIs, rescanning only tables whose data changed"""
+        with self._lock:
+            versions = self._current_versions()
+            stats = {}
+            for table in KPI_QUERIES:
+                snapshot = self._snapshots.get(table)
+                if snapshot is None or snapshot["version"] != versions.get(table):
+                    snapshot = {"version": versions.get(table), "values": self._scan_table(table)}
+                    self._snapshots[table] = snapshot
+                stats.update(snapshot["values"])
+            return stats
+
+    def invalidate(self):
+        """Drop all snapshots so the next call rescans every table"""
+        with self._lock:
+            self._snapshots.clear()
+            self._versions = {}
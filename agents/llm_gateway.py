@@ -0,0 +1,319 @@
+"""
+LLM Gateway - Shared asyncio front door for model calls
+
+Every SQL generation goes through one process-wide gateway so concurrent
+Streamlit sessions share a concurrency limit instead of each blocking on
+its own request. The gateway adds per-call deadlines, jittered retries,
+single-flight coalescing of identical prompts and optional hedged requests.
+Backends are pluggable; ``HTTPStubBackend`` together with
+``python -m agents.llm_gateway --serve-stub`` stands in for Gemini during
+load tests.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional
+from config import GEMINI_CONFIG, LLM_CONFIG
+
+
+class LLMResponse:
+    """Text returned by a backend plus call metadata"""
+
+    def __init__(self, text: str, usage: Optional[Dict[str, Any]] = None):
+        self.text = text
+        self.usage = usage or {}
+        self.latency = 0.0
+        self.attempts = 0
+        self.hedged = False
+        self.coalesced = False
+
+
+def _retryable(error: BaseException) -> bool:
+    """Timeouts, dropped connections, rate limits (429) and server errors (5xx) are worth another attempt"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, urllib.error.URLError) and isinstance(error.reason, (TimeoutError, ConnectionError)):
+        return True
+    # urllib's HTTPError has .code; the google-genai API errors have .code as well
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+
+class LLMBackend:
+    """Interface for model backends"""
+
+    name = "base"
+
+    async def generate(self, prompt: str) -> LLMResponse:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-genai async client"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+        from google import genai
+        self.client = genai.Client(api_key=api_key or GEMINI_CONFIG["api_key"])
+        self.model = model or GEMINI_CONFIG["model"]
+
+    async def generate(self, prompt: str) -> LLMResponse:
+        response = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
+        usage = {}
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is not None:
+            for field in ("prompt_token_count", "candidates_token_count", "total_token_count"):
+                value = getattr(metadata, field, None)
+                if value is not None:
+                    usage[field] = value
+        return LLMResponse(response.text or "", usage)
+
+
+class HTTPStubBackend(LLMBackend):
+    """Posts prompts to a local HTTP stub (see ``--serve-stub``) for load tests"""
+
+    name = "stub"
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None):
+        self.url = url or LLM_CONFIG["stub_url"]
+        # The request runs on a worker thread that the gateway's deadline can't cancel
+        self.timeout = timeout or LLM_CONFIG["attempt_timeout"]
+
+    def _post(self, prompt: str) -> Dict[str, Any]:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"prompt": prompt}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    async def generate(self, prompt: str) -> LLMResponse:
+        payload = await asyncio.to_thread(self._post, prompt)
+        return LLMResponse(payload.get("text", ""), payload.get("usage"))
+
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """Build the backend named in LLM_CONFIG"""
+    name = name or LLM_CONFIG["backend"]
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "stub":
+        return HTTPStubBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+class LLMGateway:
+    """Bounded, deduplicating, deadline-aware executor for model calls.
+
+    The gateway owns an event loop on a daemon thread. ``generate`` can be
+    called from any thread and blocks until the coroutine finishes there;
+    async callers can await ``agenerate`` on the gateway loop directly.
+    """
+
+    def __init__(self, backend: Optional[LLMBackend] = None, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None, attempt_timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, hedge_after: Optional[float] = None):
+        self.backend = backend or create_backend()
+        self.max_concurrency = max_concurrency or LLM_CONFIG["max_concurrency"]
+        self.timeout = timeout or LLM_CONFIG["timeout"]
+        self.attempt_timeout = attempt_timeout or LLM_CONFIG["attempt_timeout"]
+        self.max_retries = max_retries if max_retries is not None else LLM_CONFIG["max_retries"]
+        self.backoff_base = LLM_CONFIG["backoff_base"]
+        self.backoff_max = LLM_CONFIG["backoff_max"]
+        self.hedge_after = hedge_after if hedge_after is not None else LLM_CONFIG["hedge_after"]
+
+        self.stats = {"calls": 0, "backend_calls": 0, "coalesced": 0, "retries": 0,
+                      "hedges": 0, "timeouts": 0, "errors": 0}
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Loop management
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+
+            def run():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name="llm-gateway", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        """Blocking call usable from any thread (e.g. a Streamlit script thread)"""
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self.agenerate(prompt, timeout), self._loop)
+        return future.result()
+
+    def close(self):
+        """Stop the gateway loop"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    # ------------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------------
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        """Generate on the gateway loop, sharing the result with identical in-flight prompts"""
+        self.stats["calls"] += 1
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.stats["coalesced"] += 1
+            result = await asyncio.shield(shared)
+            response = LLMResponse(result.text, result.usage)
+            response.latency, response.attempts, response.coalesced = result.latency, 0, True
+            return response
+
+        task = asyncio.ensure_future(self._call_with_retries(prompt, timeout or self.timeout))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _call_with_retries(self, prompt: str, timeout: float) -> LLMResponse:
+        started = time.monotonic()
+        deadline = started + timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                response = await asyncio.wait_for(
+                    self._hedged_call(prompt), timeout=min(self.attempt_timeout, remaining)
+                )
+                response.latency = time.monotonic() - started
+                response.attempts = attempt
+                return response
+            except Exception as e:
+                is_timeout = isinstance(e, asyncio.TimeoutError)
+                self.stats["timeouts" if is_timeout else "errors"] += 1
+                remaining = deadline - time.monotonic()
+                if attempt > self.max_retries or remaining <= 0 or not _retryable(e):
+                    if is_timeout:
+                        raise TimeoutError(f"LLM call exceeded its {timeout:.0f}s deadline") from e
+                    raise
+                # Full jitter keeps synchronized clients from retrying in lockstep
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(backoff, remaining))
+
+    async def _limited_call(self, prompt: str) -> LLMResponse:
+        async with self._semaphore:
+            self.stats["backend_calls"] += 1
+            return await self.backend.generate(prompt)
+
+    async def _hedged_call(self, prompt: str) -> LLMResponse:
+        """Run one attempt, firing a duplicate if the first is slow and a slot is free.
+
+        Requests still running when this returns or is cancelled (by the
+        attempt deadline) are cancelled, so they give up their slot.
+        """
+        primary = asyncio.ensure_future(self._limited_call(prompt))
+        tasks = [primary]
+        try:
+            if not self.hedge_after:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+            if done or self._semaphore.locked():
+                return await primary
+
+            self.stats["hedges"] += 1
+            backup = asyncio.ensure_future(self._limited_call(prompt))
+            tasks.append(backup)
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    if finished.exception() is None:
+                        response = finished.result()
+                        response.hedged = finished is backup
+                        return response
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+_shared_gateway: Optional[LLMGateway] = None
+_shared_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Return the process-wide gateway, creating it on first use"""
+    global _shared_gateway
+    with _shared_gateway_lock:
+        if _shared_gateway is None:
+            _shared_gateway = LLMGateway()
+        return _shared_gateway
+
+
+def serve_stub(port: int, latency: float, sql: str):
+    """Minimal HTTP server that answers every prompt with fixed SQL after a delay"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            prompt = json.loads(body or b"{}").get("prompt", "")
+            time.sleep(random.uniform(0.5, 1.5) * latency)
+            payload = json.dumps({
+                "text": sql,
+                "usage": {"prompt_token_count": len(prompt) // 4, "candidates_token_count": len(sql) // 4},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    print(f"LLM stub listening on http://127.0.0.1:{port}/generate (latency ~{latency}s)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM gateway utilities")
+    parser.add_argument("--serve-stub", action="store_true", help="Run a local stub in place of Gemini")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean simulated model latency in seconds")
+    parser.add_argument("--sql", default="SELECT COUNT(*) AS total_accounts FROM account")
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        serve_stub(args.port, args.latency, args.sql)
+    else:
+        parser.print_help()
@@ -0,0 +1,226 @@
+"""
+Memory Snapshot - In-memory copy of the SQLite database that serves read-only queries
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from config import DB_CONFIG, SNAPSHOT_CONFIG
+
+_generation_ids = itertools.count(1)
+
+
+class _Generation:
+    """One in-memory copy of the database and the reader handles opened on it"""
+
+    def __init__(self, version: int, size: int):
+        self.id = next(_generation_ids)
+        self.uri = f"file:snapshot_{os.getpid()}_{self.id}?mode=memory&cache=shared"
+        self.version = version
+        self.size = size
+        self.created = time.time()
+        # The database lives as long as one connection to it is open
+        self.keeper = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self.idle: List[sqlite3.Connection] = []
+        self.in_use = 0
+        self.retired = False
+
+    def open_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def close(self):
+        for conn in self.idle + [self.keeper]:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self.idle = []
+
+
+class MemorySnapshot:
+    """Serves read-only queries from an in-memory copy of the SQLite file.
+
+    The copy is taken with the SQLite backup API into a shared-cache memory
+    database, so every reader thread sees the same pages and none of them
+    touch the file that writers lock. ``acquire`` compares the snapshot's
+    ``data_version`` with the live database on every call; once they differ
+    it returns None (the caller reads from disk, so results are never stale)
+    and a background thread builds the next copy, at most once every
+    ``min_refresh_interval`` seconds. The old copy is freed when its last
+    reader is released.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.max_bytes = SNAPSHOT_CONFIG["max_bytes"]
+        self.min_refresh_interval = SNAPSHOT_CONFIG["min_refresh_interval"]
+        self.max_idle = pool.max_size
+        self._current: Optional[_Generation] = None
+        self._owners: Dict[int, _Generation] = {}
+        self._refreshing = False
+        self._last_refresh = float("-inf")
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"refreshes": 0, "served": 0, "fallbacks": 0, "last_build_seconds": None, "skipped": None}
+        self._start_refresh()
+
+    def acquire(self) -> Optional[sqlite3.Connection]:
+        """A reader on the current snapshot, or None when the caller should use the database file"""
+        try:
+            version = self.pool.data_version()
+        except Exception as e:
+            print(f"Error checking snapshot version: {e}")
+            return None
+        with self._lock:
+            generation = self._current
+            if generation is None or generation.version != version:
+                self._stats["fallbacks"] += 1
+                stale = True
+            else:
+                generation.in_use += 1
+                self._stats["served"] += 1
+                stale = False
+        if stale:
+            self._start_refresh()
+            return None
+
+        try:
+            with self._lock:
+                conn = generation.idle.pop() if generation.idle else None
+            if conn is None:
+                conn = generation.open_reader()
+        except Exception as e:
+            print(f"Error opening snapshot reader: {e}")
+            self._release_generation(generation)
+            return None
+        with self._lock:
+            self._owners[id(conn)] = generation
+        return conn
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False):
+        """Return a reader obtained from ``acquire``"""
+        with self._lock:
+            generation = self._owners.pop(id(conn), None)
+        if generation is None:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            keep = not discard and not generation.retired and len(generation.idle) < self.max_idle
+            if keep:
+                generation.idle.append(conn)
+        if not keep:
+            conn.close()
+        self._release_generation(generation)
+
+    def _release_generation(self, generation: _Generation):
+        with self._lock:
+            generation.in_use -= 1
+            finished = generation.retired and generation.in_use == 0
+        if finished:
+            generation.close()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._last_refresh < self.min_refresh_interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="memory-snapshot", daemon=True).start()
+
+    def _refresh(self):
+        started = time.perf_counter()
+        generation = None
+        try:
+            source = sqlite3.connect(DB_CONFIG["sqlite"]["database"])
+            try:
+                size = source.execute("PRAGMA page_count").fetchone()[0] * source.execute("PRAGMA page_size").fetchone()[0]
+                if self.max_bytes and size > self.max_bytes:
+                    with self._lock:
+                        self._stats["skipped"] = f"database is {size / 2**20:,.0f} MB, over the {self.max_bytes / 2**20:,.0f} MB limit"
+                    return
+                # Read the version first: a write that lands during the copy
+                # only makes the snapshot look older than it is
+                version = self.pool.data_version()
+                generation = _Generation(version, size)
+                source.backup(generation.keeper)
+            finally:
+                source.close()
+
+            with self._lock:
+                previous, self._current = self._current, generation
+                self._stats["refreshes"] += 1
+                self._stats["last_build_seconds"] = round(time.perf_counter() - started, 3)
+                self._stats["skipped"] = None
+                if previous is not None:
+                    previous.retired = True
+                    finished = previous.in_use == 0
+            if previous is not None and finished:
+                previous.close()
+        except Exception as e:
+            print(f"Error building memory snapshot: {e}")
+            if generation is not None and generation is not self._current:
+                generation.close()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._last_refresh = time.monotonic()
+            # Set after a skipped or failed first build too, so waiters don't hang
+            self._ready.set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first build has finished; True when a snapshot is usable"""
+        return self._ready.wait(timeout) and self._current is not None
+
+    def refresh(self):
+        """Rebuild the snapshot now, on the calling thread"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        self._refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            generation = self._current
+            stats = dict(self._stats)
+        stats.update({
+            "ready": generation is not None,
+            "version": generation.version if generation else None,
+            "size_mb": round(generation.size / 2**20, 1) if generation else None,
+            "age_seconds": round(time.time() - generation.created, 1) if generation else None,
+        })
+        return stats
+
+    def close(self):
+        with self._lock:
+            generation, self._current = self._current, None
+            if generation is not None:
+                generation.retired = True
+                finished = generation.in_use == 0
+        if generation is not None and finished:
+            generation.close()
+
+
+_shared_snapshot: Optional[MemorySnapshot] = None
+_shared_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(pool) -> Optional[MemorySnapshot]:
+    """The process-wide snapshot when SNAPSHOT_CONFIG enables it (SQLite only)"""
+    global _shared_snapshot
+    if not SNAPSHOT_CONFIG["enabled"] or pool.db_type != "sqlite":
+        return None
+    with _shared_snapshot_lock:
+        if _shared_snapshot is None:
+            _shared_snapshot = MemorySnapshot(pool)
+        return _shared_snapshot
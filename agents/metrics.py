@@ -0,0 +1,275 @@
+"""
+Metrics - Timing spans for the query pipeline, exported as Prometheus histograms and JSON logs
+
+Usage:
+    with metrics.trace("query", question=question) as query_trace:
+        with metrics.span("llm"):
+            ...
+    query_trace.breakdown()    # {"schema_prompt": 0.004, "llm": 1.2, "db_execute": 0.03, ...}
+
+Spans recorded outside a trace still feed the histograms (under
+page="background"). Set METRICS_PORT to serve /metrics over HTTP.
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import METRICS_CONFIG
+
+STAGE_METRIC = "query_pipeline_stage_seconds"
+REQUEST_METRIC = "query_pipeline_request_seconds"
+BACKGROUND = "background"
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("query_trace", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """``(le, count)`` pairs, ending with ``+Inf``"""
+        rows, running = [], 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            running += count
+            rows.append(("+Inf" if bound == float("inf") else f"{bound:g}", running))
+        return rows
+
+
+class Trace:
+    """Every span recorded while handling one request (a question, a page load)"""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.total: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.attributes = dict(attributes or {})
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, started: float, duration: float):
+        with self._lock:
+            self.spans.append({"stage": stage, "start": started - self.started, "duration": duration})
+
+    def set(self, **attributes):
+        """Attach values to the trace's log record (row counts, cache hits, ...)"""
+        self.attributes.update(attributes)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds per stage, summed over repeated spans, in first-seen order"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["duration"]
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ts": round(self.timestamp, 3),
+            "trace": self.name,
+            "trace_id": self.id,
+            "total_ms": round((self.total or 0.0) * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.breakdown().items()},
+            "spans": [
+                {"stage": s["stage"], "start_ms": round(s["start"] * 1000, 3), "duration_ms": round(s["duration"] * 1000, 3)}
+                for s in self.spans
+            ],
+            "attributes": self.attributes,
+        }
+
+
+class MetricsRegistry:
+    """Process-wide histograms plus the exporters (text file, HTTP endpoint, JSON log)"""
+
+    def __init__(self):
+        self.enabled = METRICS_CONFIG["enabled"]
+        self.buckets = METRICS_CONFIG["buckets"]
+        self.prometheus_path = METRICS_CONFIG["prometheus_path"]
+        self.log_path = METRICS_CONFIG["log_path"]
+        self.export_interval = METRICS_CONFIG["export_interval"]
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._last_export = 0.0
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._server = None
+
+    def observe(self, metric: str, value: float, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def finish_trace(self, finished: Trace):
+        """Record the request total, log the trace and refresh the text export"""
+        self.observe(REQUEST_METRIC, finished.total, page=finished.name)
+        if self.log_path:
+            self._append_log(finished.to_dict())
+        if self.prometheus_path and time.monotonic() - self._last_export >= self.export_interval:
+            self._last_export = time.monotonic()
+            self.write_prometheus()
+
+    def _append_log(self, record: Dict[str, Any]):
+        try:
+            line = json.dumps(record, default=str)
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            print(f"Error writing metrics log: {e}")
+
+    def prometheus_text(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        help_text = {
+            STAGE_METRIC: "Seconds spent in each stage of the query pipeline",
+            REQUEST_METRIC: "Seconds per traced request (question or page load)",
+        }
+        with self._lock:
+            items = sorted(self._histograms.items())
+            lines = []
+            seen = set()
+            for (metric, labels), histogram in items:
+                if metric not in seen:
+                    seen.add(metric)
+                    lines.append(f"# HELP {metric} {help_text.get(metric, metric)}")
+                    lines.append(f"# TYPE {metric} histogram")
+                label_text = ",".join(f'{name}="{value}"' for name, value in labels)
+                prefix = label_text + "," if label_text else ""
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f"{metric}_sum{{{label_text}}} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{{{label_text}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Optional[str] = None):
+        """Write the text export atomically (for node_exporter's textfile collector)"""
+        path = path or self.prometheus_path
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(temporary, path)
+        except Exception as e:
+            print(f"Error writing metrics file: {e}")
+
+    def serve(self, port: int):
+        """Expose /metrics on ``port`` from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """The process-wide registry; starts the HTTP endpoint on first use when configured"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+            if _registry.enabled and METRICS_CONFIG["http_port"]:
+                try:
+                    _registry.serve(METRICS_CONFIG["http_port"])
+                except OSError as e:
+                    # Another Streamlit process on this host already serves it
+                    print(f"Error starting metrics endpoint: {e}")
+        return _registry
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def start_trace(name: str, **attributes) -> Trace:
+    """Make a new trace current (replacing any left open); end it with ``finish_trace``"""
+    active = Trace(name, attributes)
+    _current_trace.set(active)
+    return active
+
+
+def finish_trace(active: Trace):
+    """Close a trace: it stops collecting spans and is exported and logged"""
+    if _current_trace.get() is active:
+        _current_trace.set(None)
+    if active.total is not None:
+        return
+    active.total = time.perf_counter() - active.started
+    registry = get_registry()
+    if registry.enabled:
+        registry.finish_trace(active)
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Trace]:
+    """Group the spans of one request; the trace is logged when the block exits"""
+    active = start_trace(name, **attributes)
+    try:
+        yield active
+    finally:
+        finish_trace(active)
+
+
+def record(stage: str, seconds: float, started: Optional[float] = None):
+    """Add a measured duration, e.g. time accumulated over several fetches"""
+    registry = get_registry()
+    if not registry.enabled:
+        return
+    active = _current_trace.get()
+    registry.observe(STAGE_METRIC, seconds, page=active.name if active else BACKGROUND, stage=stage)
+    if active is not None:
+        active.add(stage, started if started is not None else time.perf_counter() - seconds, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, started)
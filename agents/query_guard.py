@@ -0,0 +1,276 @@
+"""
+Query Guard - Checks generated SQL for safety and cost before it runs
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from agents.db_agent import DatabaseAgent
+from agents.sql_utils import apply_limit, is_read_only, mask_literals, predicate_columns, strip_comments, table_aliases
+from config import GUARD_CONFIG
+
+ALLOW = "allow"
+CONFIRM = "confirm"
+REJECT = "reject"
+
+# Fraction of rows assumed to pass each constant filter SQLite can't use an index for
+FILTER_SELECTIVITY = 0.1
+# Fraction of an index assumed to match a range constraint (SQLite uses the same guess)
+RANGE_SELECTIVITY = 0.25
+UNKNOWN_TABLE_ROWS = 1000
+
+_LOOP = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (.*))?$")
+_BLOCKING = re.compile(
+    r"\b(COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b|\bORDER\s+BY\b|\bDISTINCT\b",
+    re.IGNORECASE,
+)
+
+
+class GuardResult:
+    """Outcome of a guard check: the SQL to run and whether it may run"""
+
+    def __init__(self, original_sql: str):
+        self.original_sql = original_sql
+        self.sql = original_sql
+        self.decision = ALLOW
+        self.cost: Optional[float] = None
+        self.estimated_rows: Optional[float] = None
+        self.limit: Optional[int] = None
+        self.previous_limit: Optional[int] = None
+        self.reasons: List[str] = []
+
+    @property
+    def allowed(self) -> bool:
+        return self.decision == ALLOW
+
+    @property
+    def needs_confirmation(self) -> bool:
+        return self.decision == CONFIRM
+
+    @property
+    def rejected(self) -> bool:
+        return self.decision == REJECT
+
+    @property
+    def limit_changed(self) -> bool:
+        return self.limit is not None and self.previous_limit != self.limit
+
+    def summary(self) -> str:
+        parts = []
+        if self.cost is not None:
+            parts.append(f"estimated cost ~{self.cost:,.0f} rows")
+        if self.limit_changed:
+            parts.append(f"LIMIT {self.limit:,} applied")
+        return ", ".join(parts + self.reasons)
+
+
+class QueryGuard:
+    """Pre-execution gate for LLM-generated SQL.
+
+    Only a single read-only statement is accepted. The outer query always
+    gets a LIMIT (added, or tightened if larger than ``row_limit``). Cost is
+    the estimated number of rows the plan visits: on SQLite it is derived
+    from ``EXPLAIN QUERY PLAN`` with catalog row estimates and
+    ``sqlite_stat1`` index statistics; on Databricks from ``EXPLAIN COST``.
+    Queries over ``cost_budget`` need confirmation (or are rejected,
+    depending on ``over_budget``); anything over ``max_cost`` is rejected.
+    """
+
+    def __init__(self, db_agent: Optional[DatabaseAgent] = None, catalog=None):
+        self.db_agent = db_agent or DatabaseAgent()
+        self.catalog = catalog
+        self.enabled = GUARD_CONFIG["enabled"]
+        self.row_limit = GUARD_CONFIG["row_limit"]
+        self.cost_budget = GUARD_CONFIG["cost_budget"]
+        self.over_budget = GUARD_CONFIG["over_budget"]
+        self.max_cost = GUARD_CONFIG["max_cost"]
+
+    def check(self, sql: str) -> GuardResult:
+        """Validate, bound and cost a query; raises on SQL the database can't plan"""
+        result = GuardResult(sql)
+        if not is_read_only(sql):
+            result.decision = REJECT
+            result.reasons.append("only a single SELECT statement can be run")
+            return result
+        if not self.enabled:
+            return result
+
+        if self.row_limit:
+            result.sql, result.previous_limit = apply_limit(sql, self.row_limit)
+            result.limit = min(self.row_limit, result.previous_limit or self.row_limit)
+
+        if self.db_agent.db_type == "sqlite":
+            cost, rows, reasons = self._sqlite_cost(result.sql, result.limit)
+        else:
+            cost, rows, reasons = self._databricks_cost(result.sql)
+        result.cost, result.estimated_rows = cost, rows
+        result.reasons.extend(reasons)
+
+        if cost is None:
+            return result
+        if cost > self.max_cost:
+            result.decision = REJECT
+            result.reasons.append(f"over the hard limit of {self.max_cost:,} rows")
+        elif cost > self.cost_budget:
+            result.decision = REJECT if self.over_budget == "reject" else CONFIRM
+            result.reasons.append(f"over the budget of {self.cost_budget:,} rows")
+        return result
+
+    # ------------------------------------------------------------------
+    # SQLite cost model
+    # ------------------------------------------------------------------
+
+    def _sqlite_cost(self, sql: str, limit: Optional[int]) -> Tuple[float, float, List[str]]:
+        plan, _ = self.db_agent.execute_query("EXPLAIN QUERY PLAN " + sql)
+        children: Dict[int, List[Tuple[int, str]]] = {}
+        for node_id, parent, _, detail in plan:
+            children.setdefault(parent, []).append((node_id, detail))
+
+        context = {
+            "aliases": table_aliases(sql),
+            "filters": predicate_columns(sql, literal_only=True),
+            "derived": {},
+            "stats": self._index_stats(),
+            "reasons": [],
+        }
+        cost, rows = self._evaluate(0, children, context)
+
+        # Plans that stream rows stop at the LIMIT; sorts and aggregates can't
+        streaming = not _BLOCKING.search(mask_literals(strip_comments(sql))) and not any(
+            detail.startswith("USE TEMP B-TREE") for _, _, _, detail in plan
+        )
+        if limit and streaming and rows > limit:
+            cost = cost * limit / rows
+        if limit:
+            rows = min(rows, limit)
+        return cost, rows, context["reasons"]
+
+    def _evaluate(self, parent: int, children: Dict[int, List[Tuple[int, str]]],
+                  context: Dict[str, Any]) -> Tuple[float, float]:
+        """(rows visited, rows produced) for the plan nodes under ``parent``"""
+        cost, rows = 0.0, 1.0
+        loops = 0
+        member_rows = 0.0
+        for node_id, detail in children.get(parent, []):
+            if detail.startswith(("MATERIALIZE", "CO-ROUTINE")):
+                sub_cost, sub_rows = self._evaluate(node_id, children, context)
+                cost += sub_cost
+                context["derived"][detail.split()[-1]] = sub_rows
+            elif detail.startswith("CORRELATED"):
+                # Runs once per outer row produced so far
+                sub_cost, _ = self._evaluate(node_id, children, context)
+                cost += sub_cost * rows
+            elif detail.startswith(("SCAN", "SEARCH")):
+                visited, produced, build = self._loop_estimate(detail, context)
+                cost += build + rows * visited
+                if loops and detail.startswith("SCAN") and produced > 1:
+                    context["reasons"].append(f"nested full scan ({detail}) - possible cartesian join")
+                rows *= produced
+                loops += 1
+            elif detail.startswith("USE TEMP B-TREE"):
+                cost += rows * max(1.0, math.log2(max(rows, 2)))
+            elif detail.startswith(("LEFT-MOST SUBQUERY", "UNION", "EXCEPT", "INTERSECT")):
+                sub_cost, sub_rows = self._evaluate(node_id, children, context)
+                cost += sub_cost
+                member_rows += sub_rows
+            else:
+                # LIST/SCALAR SUBQUERY, COMPOUND QUERY, ... run once
+                sub_cost, sub_rows = self._evaluate(node_id, children, context)
+                cost += sub_cost
+                if detail.startswith("COMPOUND"):
+                    member_rows += sub_rows
+        if not loops and member_rows:
+            rows = member_rows
+        return cost, rows
+
+    def _loop_estimate(self, detail: str, context: Dict[str, Any]) -> Tuple[float, float, float]:
+        """(rows visited per outer row, rows produced per outer row, one-off build cost)"""
+        match = _LOOP.match(detail)
+        if not match:
+            return 1.0, 1.0, 0.0
+        kind, name, alias, using = match.group(1), match.group(2), match.group(3), match.group(4) or ""
+        reference = alias or name
+        table = context["aliases"].get(reference, name)
+        if reference in context["derived"]:
+            table_rows = context["derived"][reference]
+        else:
+            table_rows = self._table_rows(table)
+
+        if kind == "SCAN":
+            filters = [f for f in context["filters"]
+                       if (f[0] and context["aliases"].get(f[0], f[0]) == table) or
+                       (f[0] is None and len(set(context["aliases"].values())) <= 1)]
+            produced = max(1.0, table_rows * FILTER_SELECTIVITY ** len(filters))
+            return table_rows, produced, 0.0
+
+        constraints = re.search(r"\(([^()]*)\)\s*$", using)
+        constraints = constraints.group(1) if constraints else ""
+        equalities = len(re.findall(r"=\?", constraints))
+        ranges = len(re.findall(r"[<>]\?", constraints))
+
+        if "PRIMARY KEY" in using and equalities:
+            return 1.0, 1.0, 0.0
+        build = 0.0
+        index = re.search(r"INDEX (\w+)", using)
+        stat = context["stats"].get(index.group(1)) if index and "AUTOMATIC" not in using else None
+        if stat and equalities and len(stat) > equalities:
+            matched = float(stat[equalities])
+        elif equalities:
+            matched = table_rows * FILTER_SELECTIVITY ** equalities
+        else:
+            matched = table_rows
+        if "AUTOMATIC" in using:
+            # SQLite builds this index on every execution
+            build = table_rows
+            context["reasons"].append(f"automatic index built on {table}")
+        if ranges:
+            matched *= RANGE_SELECTIVITY
+        matched = max(1.0, matched)
+        return matched, matched, build
+
+    def _table_rows(self, table: str) -> float:
+        if self.catalog is not None:
+            info = self.catalog.get_tables().get(table)
+            if info and info.get("row_estimate") is not None:
+                return float(info["row_estimate"])
+        try:
+            results, _ = self.db_agent.execute_query(f'SELECT MAX(rowid) FROM "{table}"')
+            return float(results[0][0] or 0) or 1.0
+        except Exception:
+            return float(UNKNOWN_TABLE_ROWS)
+
+    def _index_stats(self) -> Dict[str, List[int]]:
+        """``sqlite_stat1`` as ``{index: [rows, avg rows per 1st col, per 1st+2nd col, ...]}``"""
+        exists, _ = self.db_agent.execute_query(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )
+        if not exists:
+            return {}
+        results, _ = self.db_agent.execute_query("SELECT idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL")
+        stats = {}
+        for index, stat in results:
+            numbers = [int(part) for part in str(stat).split() if part.isdigit()]
+            if numbers:
+                stats[index] = numbers
+        return stats
+
+    # ------------------------------------------------------------------
+    # Databricks
+    # ------------------------------------------------------------------
+
+    def _databricks_cost(self, sql: str) -> Tuple[Optional[float], Optional[float], List[str]]:
+        """Row estimate from the optimizer's ``EXPLAIN COST`` statistics"""
+        try:
+            results, _ = self.db_agent.execute_query("EXPLAIN COST " + sql)
+        except Exception as e:
+            print(f"Error estimating query cost: {e}")
+            return None, None, ["cost unknown"]
+        plan = "\n".join(str(row[0]) for row in results)
+        row_counts = [float(value) for value in re.findall(r"rowCount=([\d.]+(?:E\d+)?)", plan)]
+        if row_counts:
+            # The first statistics line belongs to the root (the result)
+            return max(row_counts), row_counts[0], []
+        sizes = [float(value) for value in re.findall(r"sizeInBytes=([\d.]+)\s*(?:B|$)", plan)]
+        if sizes:
+            return max(sizes) / 100, None, ["cost from data size only"]
+        return None, None, ["cost unknown"]
@@ -0,0 +1,162 @@
+"""
+Query Orchestrator - Runs a page's independent queries concurrently and reports the slowest
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+from config import PARALLEL_CONFIG
+
+# The AnalyticsAgent methods each page needs; none depends on another's result
+PAGE_QUERIES = {
+    "dashboard": {
+        "stats": "get_quick_stats",
+        "policy_distribution": "get_policy_distribution",
+        "top_agents": "get_top_agents",
+        "claims_summary": "get_claims_summary",
+    },
+    "analytics": {
+        "revenue_by_policy_type": "get_revenue_by_policy_type",
+        "policies_by_state": "get_policies_by_state",
+        "claims_risk": "get_claims_risk",
+    },
+}
+
+
+class TaskResult:
+    """Outcome and timing of one query in a page load"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value: Any = None
+        self.error: Optional[Exception] = None
+        self.started = 0.0   # Seconds after the page load began
+        self.elapsed = 0.0
+
+    @property
+    def finished(self) -> float:
+        return self.started + self.elapsed
+
+
+class PageLoad:
+    """Results of every query on a page plus where the wall-clock time went"""
+
+    def __init__(self, page: str, tasks: Dict[str, TaskResult], wall_time: float, concurrency: int):
+        self.page = page
+        self.tasks = tasks
+        self.wall_time = wall_time
+        self.concurrency = concurrency
+
+    def get(self, name: str) -> Any:
+        """A query's result; re-raises its error as a serial call would have"""
+        task = self.tasks[name]
+        if task.error is not None:
+            raise task.error
+        return task.value
+
+    @property
+    def critical_path(self) -> Optional[TaskResult]:
+        """The query that finished last, i.e. the one the page waited for"""
+        return max(self.tasks.values(), key=lambda task: task.finished, default=None)
+
+    @property
+    def serial_time(self) -> float:
+        """How long the same queries take back to back"""
+        return sum(task.elapsed for task in self.tasks.values())
+
+    def report(self) -> str:
+        slowest = self.critical_path
+        if slowest is None:
+            return f"{self.page}: no queries"
+        return (f"{len(self.tasks)} queries in {self.wall_time * 1000:.0f} ms "
+                f"(serial {self.serial_time * 1000:.0f} ms, concurrency {self.concurrency}); "
+                f"bottleneck: {slowest.name} {slowest.elapsed * 1000:.0f} ms")
+
+    def to_dict(self) -> Dict[str, Any]:
+        slowest = self.critical_path
+        return {
+            "page": self.page,
+            "wall_time": round(self.wall_time, 6),
+            "serial_time": round(self.serial_time, 6),
+            "concurrency": self.concurrency,
+            "critical_path": slowest.name if slowest else None,
+            "tasks": {
+                name: {
+                    "started": round(task.started, 6),
+                    "elapsed": round(task.elapsed, 6),
+                    "error": str(task.error) if task.error else None,
+                }
+                for name, task in self.tasks.items()
+            },
+        }
+
+
+class QueryOrchestrator:
+    """Fans independent queries out over a shared thread pool.
+
+    Each run submits at most ``concurrency`` queries at a time (the page's
+    limit from ``PARALLEL_CONFIG``) and waits for all of them, so a page
+    costs roughly its slowest query instead of the sum. The database
+    agents are thread-safe: every worker thread gets its own pooled
+    connection. With parallelism disabled the queries run in order on the
+    calling thread.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.enabled = PARALLEL_CONFIG["enabled"]
+        self.max_workers = max_workers or PARALLEL_CONFIG["max_workers"]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="page-query")
+            return self._executor
+
+    def run(self, tasks: Dict[str, Callable[[], Any]], concurrency: Optional[int] = None,
+            page: str = "") -> PageLoad:
+        """Run every task and return once all have finished (failed tasks keep their error)"""
+        limit = concurrency or PARALLEL_CONFIG["page_concurrency"].get(page, PARALLEL_CONFIG["default_concurrency"])
+        limit = max(1, min(limit, self.max_workers)) if self.enabled else 1
+        results = {name: TaskResult(name) for name in tasks}
+        load_started = time.perf_counter()
+
+        def execute(name: str):
+            task = results[name]
+            task.started = time.perf_counter() - load_started
+            try:
+                task.value = tasks[name]()
+            except Exception as e:
+                print(f"Error running {name}: {e}")
+                task.error = e
+            finally:
+                task.elapsed = time.perf_counter() - load_started - task.started
+
+        if limit == 1 or len(tasks) == 1:
+            for name in tasks:
+                execute(name)
+        else:
+            executor = self._get_executor()
+            pending = list(tasks)
+            running = set()
+            while pending or running:
+                while pending and len(running) < limit:
+                    # Each worker runs in a copy of this context so its spans join the page's trace
+                    running.add(executor.submit(contextvars.copy_context().run, execute, pending.pop(0)))
+                _, running = wait(running, return_when=FIRST_COMPLETED)
+
+        return PageLoad(page, results, time.perf_counter() - load_started, limit)
+
+    def load_page(self, analytics_agent, page: str) -> PageLoad:
+        """Run every query a page needs (see ``PAGE_QUERIES``)"""
+        tasks = {name: getattr(analytics_agent, method) for name, method in PAGE_QUERIES[page].items()}
+        return self.run(tasks, page=page)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
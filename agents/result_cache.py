@@ -0,0 +1,163 @@
+"""
+Result Cache - Keeps recent query results in memory until the data they read changes
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+from agents.columnar import ColumnarResult
+from agents.sql_utils import is_read_only, mask_literals, normalize_sql, strip_comments, table_aliases
+from config import CACHE_CONFIG
+
+# Results that depend on more than the stored data are never cached
+_NONDETERMINISTIC = re.compile(
+    r"\b(RANDOM|RANDOMBLOB|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|NOW|UUID|RAND)\b",
+    re.IGNORECASE,
+)
+# SQLite's date('now') hides inside a string literal, so it is matched before masking
+_NOW_LITERAL = re.compile(r"'\s*now\s*'", re.IGNORECASE)
+
+
+class CacheTicket:
+    """What a lookup learned about a query: its key and the data versions it was read at"""
+
+    __slots__ = ("key", "versions")
+
+    def __init__(self, key: str, versions: Dict[str, Any]):
+        self.key = key
+        self.versions = versions
+
+
+class ResultCache:
+    """LRU cache of ``ColumnarResult`` objects bounded by bytes.
+
+    Keys are the SHA-1 of the normalized SQL text. Each entry remembers
+    the data version of every table the query reads (``DatabaseAgent.
+    get_data_version``: the file's ``data_version`` on SQLite, the Delta
+    table version on Databricks) and is dropped as soon as one of them
+    moves. Versions are read before the query runs, so a write that lands
+    mid-query can only make an entry look older than it is. Results are
+    kept as typed NumPy columns, which is several times smaller than a
+    list of row tuples, and repeated strings share one object.
+    """
+
+    def __init__(self, db_agent, max_bytes: Optional[int] = None, max_entry_bytes: Optional[int] = None):
+        config = CACHE_CONFIG["results"]
+        self.db_agent = db_agent
+        self.max_bytes = max_bytes or config["max_bytes"]
+        self.max_entry_bytes = max_entry_bytes or config["max_entry_bytes"]
+        self.version_check_interval = config["version_check_interval"]
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], ColumnarResult, int]]" = OrderedDict()
+        self._bytes = 0
+        self._table_versions: Dict[str, Tuple[Any, float]] = {}
+        self._sqlite_version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, query: str, params: Optional[Sequence[Any]] = None) -> Tuple[Optional[ColumnarResult], Optional[CacheTicket]]:
+        """``(cached result or None, ticket for put)``; the ticket is None for uncacheable SQL"""
+        if (not is_read_only(query) or _NONDETERMINISTIC.search(mask_literals(query))
+                or _NOW_LITERAL.search(strip_comments(query))):
+            return None, None
+        tables = sorted(set(table_aliases(query).values()))
+        if not tables:
+            return None, None
+        try:
+            versions = self._versions(tables)
+        except Exception as e:
+            print(f"Error reading data versions for the result cache: {e}")
+            return None, None
+
+        text = normalize_sql(query) + (f"\n{list(params)!r}" if params else "")
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], None
+            if entry is not None:
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+        return None, CacheTicket(key, versions)
+
+    def put(self, ticket: Optional[CacheTicket], result: ColumnarResult):
+        """Store the result of a query that missed; ignored without a ticket or when too large"""
+        if ticket is None:
+            return
+        size = result.compact().nbytes
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if ticket.key in self._entries:
+                self._remove(ticket.key)
+            self._entries[ticket.key] = (ticket.versions, result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        """Drop one entry (caller holds the lock)"""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _versions(self, tables) -> Dict[str, Any]:
+        if self.db_agent.db_type == "sqlite":
+            # One cheap pragma covers the whole file; read it every time
+            versions = self.db_agent.get_data_version(tables)
+            version = versions[tables[0]]
+            if version != self._sqlite_version:
+                self._purge_older(version)
+                self._sqlite_version = version
+            return versions
+
+        # Elsewhere a version costs a round trip, so reuse it for a while
+        now = time.monotonic()
+        with self._lock:
+            known = {table: self._table_versions.get(table) for table in tables}
+        stale = [table for table, cached in known.items()
+                 if cached is None or now - cached[1] >= self.version_check_interval]
+        if stale:
+            fresh = self.db_agent.get_data_version(stale)
+            with self._lock:
+                for table in stale:
+                    self._table_versions[table] = (fresh.get(table), now)
+                    known[table] = self._table_versions[table]
+        return {table: cached[0] for table, cached in known.items()}
+
+    def _purge_older(self, version: Any):
+        """Free every entry read at another SQLite version (they can never hit again)"""
+        with self._lock:
+            stale = [key for key, (entry_versions, _, _) in self._entries.items()
+                     if next(iter(entry_versions.values()), None) != version]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,364 @@
+"""
+Rollups - Summary tables for the dashboard charts, kept current by triggers
+
+Usage:
+    python -m agents.rollups install     # create the rollup tables and triggers, then fill them
+    python -m agents.rollups rebuild     # recompute every rollup from the base tables
+    python -m agents.rollups verify      # compare the rollups with a fresh aggregate
+    python -m agents.rollups drop        # remove the rollup tables and triggers
+"""
+
+import argparse
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+from config import DB_CONFIG, ROLLUP_CONFIG
+
+# Each rollup groups one source table by ``keys`` and keeps ``measures``:
+# ("count", None) counts rows, ("sum", column) totals a column and
+# ("count_nonnull", column) counts the rows where it is set, so a group
+# whose values are all NULL can still be reported as NULL.
+ROLLUPS = {
+    "rollup_policies_by_type_status": {
+        "source": "policies",
+        "keys": ["policy_type", "status"],
+        "measures": [
+            ("policy_count", "count", None),
+            ("total_premium", "sum", "premium_amount"),
+            ("total_coverage", "sum", "coverage_amount"),
+        ],
+    },
+    "rollup_policies_by_agent": {
+        "source": "policies",
+        "keys": ["agent_id"],
+        "measures": [
+            ("policy_count", "count", None),
+            ("total_premium", "sum", "premium_amount"),
+        ],
+    },
+    "rollup_claims_by_status": {
+        "source": "claims",
+        "keys": ["status"],
+        "measures": [
+            ("claim_count", "count", None),
+            ("total_requested", "sum", "claim_amount"),
+            ("total_approved", "sum", "approved_amount"),
+            ("approved_count", "count_nonnull", "approved_amount"),
+        ],
+    },
+    "rollup_account_totals": {
+        "source": "account",
+        "keys": [],
+        "measures": [
+            ("account_count", "count", None),
+        ],
+    },
+}
+
+ROLLUP_PREFIX = "rollup_"
+# Group keys are stored with NULL as '' because NULLs never conflict in a
+# primary key; readers map '' back with NULLIF.
+NULL_KEY = "''"
+# Stands in for the key of the single-row rollups
+TOTAL_KEY = "scope"
+
+
+def _keys(definition: Dict[str, Any]) -> List[str]:
+    return definition["keys"] or [TOTAL_KEY]
+
+
+def _key_value(definition: Dict[str, Any], key: str, row: str) -> str:
+    if not definition["keys"]:
+        return "'all'"
+    return f"IFNULL({row}.{key}, {NULL_KEY})"
+
+
+def _delta(kind: str, column: Optional[str], row: str) -> str:
+    """What one source row adds to a measure"""
+    if kind == "count":
+        return "1"
+    if kind == "sum":
+        return f"IFNULL({row}.{column}, 0)"
+    return f"({row}.{column} IS NOT NULL)"
+
+
+def _aggregate(kind: str, column: Optional[str]) -> str:
+    """The same measure computed over a whole group"""
+    if kind == "count":
+        return "COUNT(*)"
+    if kind == "sum":
+        return f"TOTAL(s.{column})"
+    return f"COUNT(s.{column})"
+
+
+def _table_sql(name: str, definition: Dict[str, Any]) -> str:
+    columns = [f"{key} NOT NULL" for key in _keys(definition)]
+    for measure, kind, _ in definition["measures"]:
+        columns.append(f"{measure} {'REAL' if kind == 'sum' else 'INTEGER'} NOT NULL DEFAULT 0")
+    return (f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(columns)}, "
+            f"PRIMARY KEY ({', '.join(_keys(definition))}))")
+
+
+def _add_row(name: str, definition: Dict[str, Any], row: str) -> str:
+    """Upsert that adds the ``row`` (NEW) into its group"""
+    keys = _keys(definition)
+    measures = [measure for measure, _, _ in definition["measures"]]
+    values = [_key_value(definition, key, row) for key in keys]
+    values += [_delta(kind, column, row) for _, kind, column in definition["measures"]]
+    updates = ", ".join(f"{measure} = {measure} + excluded.{measure}" for measure in measures)
+    return (f"INSERT INTO {name} ({', '.join(keys + measures)}) VALUES ({', '.join(values)}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates};")
+
+
+def _remove_row(name: str, definition: Dict[str, Any], row: str) -> str:
+    """Subtract the ``row`` (OLD) from its group and drop the group once empty"""
+    match = " AND ".join(f"{key} = {_key_value(definition, key, row)}" for key in _keys(definition))
+    updates = ", ".join(f"{measure} = {measure} - {_delta(kind, column, row)}"
+                        for measure, kind, column in definition["measures"])
+    count = next(measure for measure, kind, _ in definition["measures"] if kind == "count")
+    return (f"UPDATE {name} SET {updates} WHERE {match};\n"
+            f"    DELETE FROM {name} WHERE {match} AND {count} <= 0;")
+
+
+def _trigger_sql(source: str) -> List[Tuple[str, str]]:
+    """(trigger name, CREATE TRIGGER statement) for every change to ``source``"""
+    rollups = [(name, definition) for name, definition in ROLLUPS.items() if definition["source"] == source]
+    if not rollups:
+        return []
+    columns = sorted({column for _, definition in rollups for column in definition["keys"]} |
+                     {column for _, definition in rollups for _, _, column in definition["measures"] if column})
+    inserts = "\n    ".join(_add_row(name, definition, "NEW") for name, definition in rollups)
+    deletes = "\n    ".join(_remove_row(name, definition, "OLD") for name, definition in rollups)
+
+    triggers = [
+        (f"{ROLLUP_PREFIX}{source}_insert",
+         f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_PREFIX}{source}_insert AFTER INSERT ON {source}\n"
+         f"BEGIN\n    {inserts}\nEND"),
+        (f"{ROLLUP_PREFIX}{source}_delete",
+         f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_PREFIX}{source}_delete AFTER DELETE ON {source}\n"
+         f"BEGIN\n    {deletes}\nEND"),
+    ]
+    if columns:
+        # Only updates that touch a grouped or summed column move anything
+        triggers.append(
+            (f"{ROLLUP_PREFIX}{source}_update",
+             f"CREATE TRIGGER IF NOT EXISTS {ROLLUP_PREFIX}{source}_update "
+             f"AFTER UPDATE OF {', '.join(columns)} ON {source}\n"
+             f"BEGIN\n    {deletes}\n    {inserts}\nEND")
+        )
+    return triggers
+
+
+def _sources() -> List[str]:
+    return sorted({definition["source"] for definition in ROLLUPS.values()})
+
+
+def _existing(conn, kind: str) -> List[str]:
+    return [row[0] for row in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = ? AND name LIKE '{ROLLUP_PREFIX}%'", (kind,)
+    )]
+
+
+def _aggregate_sql(definition: Dict[str, Any]) -> str:
+    """The rollup's rows computed from scratch; empty groups are left out as the triggers do"""
+    keys = _keys(definition)
+    selected = [_key_value(definition, key, "s") for key in keys]
+    selected += [_aggregate(kind, column) for _, kind, column in definition["measures"]]
+    group = f" GROUP BY {', '.join(str(i + 1) for i in range(len(keys)))}" if definition["keys"] else ""
+    return f"SELECT {', '.join(selected)} FROM {definition['source']} s{group} HAVING COUNT(*) > 0"
+
+
+def _fill(conn, name: str, definition: Dict[str, Any]):
+    measures = [measure for measure, _, _ in definition["measures"]]
+    conn.execute(f"DELETE FROM {name}")
+    conn.execute(f"INSERT INTO {name} ({', '.join(_keys(definition) + measures)}) {_aggregate_sql(definition)}")
+
+
+def _missing_sources(conn) -> List[str]:
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [source for source in _sources() if source not in tables]
+
+
+def install_rollups(conn) -> List[str]:
+    """Create the rollup tables and triggers on a SQLite connection and fill them.
+
+    Runs in one transaction, so writers never see triggers without data.
+    Returns the names of the rollups that were created.
+    """
+    missing = _missing_sources(conn)
+    if missing:
+        raise ValueError(f"Cannot build rollups, missing tables: {', '.join(missing)}")
+    existing = set(_existing(conn, "table"))
+    created = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name, definition in ROLLUPS.items():
+            conn.execute(_table_sql(name, definition))
+            if name not in existing:
+                _fill(conn, name, definition)
+                created.append(name)
+        for source in _sources():
+            for _, statement in _trigger_sql(source):
+                conn.execute(statement)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return created
+
+
+def rebuild_rollups(conn) -> Dict[str, int]:
+    """Recompute every rollup from its base table; returns the rows per rollup.
+
+    Use after bulk changes made with the triggers dropped, or to recover
+    from a rollup that no longer matches its source.
+    """
+    counts = {}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name, definition in ROLLUPS.items():
+            conn.execute(_table_sql(name, definition))
+            _fill(conn, name, definition)
+            counts[name] = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        for source in _sources():
+            for _, statement in _trigger_sql(source):
+                conn.execute(statement)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return counts
+
+
+def drop_rollups(conn) -> List[str]:
+    """Remove every rollup trigger and table; returns the tables dropped"""
+    dropped = _existing(conn, "table")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for trigger in _existing(conn, "trigger"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for table in dropped:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dropped
+
+
+def verify_rollups(conn, tolerance: float = 0.01) -> List[str]:
+    """Differences between the stored rollups and a fresh aggregate (empty when in sync)"""
+    problems = []
+    for name, definition in ROLLUPS.items():
+        keys = _keys(definition)
+        measures = [measure for measure, _, _ in definition["measures"]]
+        fresh = {row[:len(keys)]: row[len(keys):] for row in conn.execute(_aggregate_sql(definition))}
+        try:
+            stored = {row[:len(keys)]: row[len(keys):] for row in conn.execute(
+                f"SELECT {', '.join(keys + measures)} FROM {name}"
+            )}
+        except sqlite3.OperationalError:
+            problems.append(f"{name}: missing")
+            continue
+
+        for key in sorted(set(fresh) | set(stored), key=str):
+            expected, actual = fresh.get(key), stored.get(key)
+            if expected is None or actual is None:
+                problems.append(f"{name} {key}: {'extra' if expected is None else 'missing'} group")
+                continue
+            for measure, want, got in zip(measures, expected, actual):
+                if abs((want or 0) - (got or 0)) > tolerance:
+                    problems.append(f"{name} {key}: {measure} is {got}, expected {want}")
+    return problems
+
+
+class RollupManager:
+    """Keeps the rollup tables available to the analytics queries.
+
+    Rollups are SQLite-only: they rely on triggers to stay current. On any
+    other backend (or with ``ROLLUP_CONFIG["enabled"]`` off) ``available``
+    is False and callers fall back to aggregating the base tables.
+    """
+
+    def __init__(self, db_agent):
+        self.db_agent = db_agent
+        self.enabled = ROLLUP_CONFIG["enabled"] and db_agent.db_type == "sqlite"
+        self._schema_version = None
+        self._available = False
+
+    def available(self) -> bool:
+        """True when every rollup table and trigger exists (re-checked on schema changes)"""
+        if not self.enabled:
+            return False
+        try:
+            results, _ = self.db_agent.execute_query("PRAGMA schema_version")
+            version = results[0][0]
+            if version != self._schema_version:
+                results, _ = self.db_agent.execute_query(
+                    f"SELECT type, name FROM sqlite_master WHERE name LIKE '{ROLLUP_PREFIX}%'"
+                )
+                present = {(kind, name) for kind, name in results}
+                expected = {("table", name) for name in ROLLUPS}
+                expected |= {("trigger", trigger) for source in _sources() for trigger, _ in _trigger_sql(source)}
+                self._available = expected <= present
+                self._schema_version = version
+        except Exception as e:
+            print(f"Error checking rollups: {e}")
+            return False
+        return self._available
+
+    def ensure_installed(self) -> List[str]:
+        """Install any missing rollup (the first time this builds them from scratch)"""
+        if not self.enabled or self.available():
+            return []
+        created = self._with_connection(install_rollups)
+        self._schema_version = None
+        return created
+
+    def rebuild(self) -> Dict[str, int]:
+        counts = self._with_connection(rebuild_rollups)
+        self._schema_version = None
+        return counts
+
+    def verify(self) -> List[str]:
+        return self._with_connection(verify_rollups)
+
+    def _with_connection(self, action):
+        conn = self.db_agent.pool.acquire()
+        try:
+            return action(conn)
+        finally:
+            self.db_agent.pool.release(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the dashboard rollup tables (SQLite)")
+    parser.add_argument("command", choices=["install", "rebuild", "verify", "drop"])
+    parser.add_argument("--db", default=DB_CONFIG["sqlite"]["database"], help="SQLite database file")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        if args.command == "install":
+            created = install_rollups(connection)
+            print(f"✓ Installed rollups ({len(created)} built, {len(ROLLUPS) - len(created)} already present)")
+        elif args.command == "rebuild":
+            for name, rows in rebuild_rollups(connection).items():
+                print(f"✓ Rebuilt {name}: {rows:,} groups")
+        elif args.command == "verify":
+            problems = verify_rollups(connection)
+            for problem in problems:
+                print(f"  {problem}")
+            if problems:
+                print(f"❌ {len(problems)} difference(s); run 'python -m agents.rollups rebuild'")
+                sys.exit(1)
+            print("✓ Rollups match the base tables")
+        elif args.command == "drop":
+            dropped = drop_rollups(connection)
+            print(f"✓ Dropped {len(dropped)} rollup tables")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
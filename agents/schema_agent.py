@@ -3,51 +3,113 @@ Schema Agent - Generates and manages database schema information
 """
 
 from agents.db_agent import DatabaseAgent
-from typing import Dict, List
+from agents.schema_catalog import SchemaCatalog
+from agents.schema_index import SchemaIndex
+from agents.token_accounting import estimate_tokens
+from config import SCHEMA_CONFIG
+from typing import Any, Dict, List, Optional, Tuple
+
+# Known insurance schema links, used when the database declares no foreign keys
+# (e.g. Databricks without informational constraints)
+FALLBACK_RELATIONSHIPS = [
+    {"ref_table": "account", "table": "policies", "column": "account_id"},
+    {"ref_table": "agents", "table": "policies", "column": "agent_id"},
+    {"ref_table": "policies", "table": "claims", "column": "policy_id"},
+    {"ref_table": "account", "table": "claims", "column": "account_id"},
+    {"ref_table": "policies", "table": "payments", "column": "policy_id"},
+    {"ref_table": "account", "table": "payments", "column": "account_id"},
+]
 
 class SchemaAgent:
-    def __init__(self):
-        self.db_agent = DatabaseAgent()
+    def __init__(self, db_agent: Optional[DatabaseAgent] = None):
+        self.db_agent = db_agent or DatabaseAgent()
+        self.catalog = SchemaCatalog(self.db_agent)
+        self._index = None
+        self._index_tables = None
     
-    def generate_schema_context(self) -> str:
-        """Generate comprehensive schema context for AI"""
-        tables = self.db_agent.get_tables()
+    def generate_schema_context(self, tables: Optional[List[str]] = None) -> str:
+        """Generate comprehensive schema context for AI, optionally for a subset of tables"""
+        catalog_tables = self.catalog.get_tables()
         schema_context = "DATABASE SCHEMA INFORMATION:\n\n"
         
-        for table in tables:
-            schema_df = self.db_agent.get_table_schema(table)
-            row_count = self.db_agent.get_row_count(table)
+        for table, info in catalog_tables.items():
+            if tables is not None and table not in tables:
+                continue
+            row_estimate = info.get("row_estimate")
+            size = f" (~{row_estimate} rows)" if row_estimate is not None else ""
             
-            schema_context += f"Table: {table.upper()} ({row_count} rows)\n"
+            schema_context += f"Table: {table.upper()}{size}\n"
             schema_context += "Columns:\n"
             
-            for _, row in schema_df.iterrows():
-                if 'name' in schema_df.columns:
-                    col_name = row['name']
-                    col_type = row.get('type', 'unknown')
-                    is_pk = row.get('pk', 0)
-                    pk_indicator = " (PRIMARY KEY)" if is_pk else ""
-                    schema_context += f"  - {col_name}: {col_type}{pk_indicator}\n"
+            for column in info["columns"]:
+                pk_indicator = " (PRIMARY KEY)" if column["pk"] else ""
+                schema_context += f"  - {column['name']}: {column['type']}{pk_indicator}\n"
             
             schema_context += "\n"
         
         return schema_context
     
-    def get_table_relationships(self) -> str:
-        """Identify and describe table relationships"""
-        # For SQLite, we need to parse foreign keys manually
-        # This is a simplified version
-        relationships = """
-TABLE RELATIONSHIPS:
+    def _relationships(self) -> List[Dict[str, str]]:
+        catalog_tables = self.catalog.get_tables()
+        foreign_keys = self.catalog.get_relationships()
+        if foreign_keys:
+            return foreign_keys
+        return [fk for fk in FALLBACK_RELATIONSHIPS
+                if fk["table"] in catalog_tables and fk["ref_table"] in catalog_tables]
+    
+    def get_table_relationships(self, tables: Optional[List[str]] = None) -> str:
+        """Identify and describe table relationships, optionally among a subset of tables"""
+        lines = [
+            f"{fk['ref_table']} ← {fk['table']} ({fk['column']})"
+            for fk in self._relationships()
+            if tables is None or (fk["table"] in tables and fk["ref_table"] in tables)
+        ]
+        if not lines:
+            return ""
+        return "\nTABLE RELATIONSHIPS:\n\n" + "\n".join(lines) + "\n"
+    
+    def get_schema_index(self) -> SchemaIndex:
+        """Relevance index over the current catalog, rebuilt when the catalog changes"""
+        catalog_tables = self.catalog.get_tables()
+        if self._index is None or self._index_tables is not catalog_tables:
+            tables = {name: dict(info) for name, info in catalog_tables.items()}
+            if not self.catalog.get_relationships():
+                for fk in self._relationships():
+                    tables[fk["table"]]["foreign_keys"] = tables[fk["table"]]["foreign_keys"] + [
+                        {"column": fk["column"], "ref_table": fk["ref_table"], "ref_column": fk["column"]}
+                    ]
+            self._index = SchemaIndex(tables, SCHEMA_CONFIG["pruning"]["aliases"])
+            self._index_tables = catalog_tables
+        return self._index
+    
+    def get_schema_prompt_for(self, question: str) -> Tuple[str, Dict[str, Any]]:
+        """Schema prompt trimmed to the tables relevant to a question.
 
-account ← policies (account_id)
-agents ← policies (agent_id)
-policies ← claims (policy_id)
-account ← claims (account_id)
-policies ← payments (policy_id)
-account ← payments (account_id)
-"""
-        return relationships
+        Returns the prompt and a report with the selected tables and how many
+        prompt tokens were saved compared to the full schema. Falls back to
+        the full schema when pruning is disabled or nothing matched.
+        """
+        full_prompt = self.get_full_schema_prompt()
+        full_tokens = estimate_tokens(full_prompt)
+        
+        selected = []
+        if SCHEMA_CONFIG["pruning"]["enabled"]:
+            selected = self.get_schema_index().select(question, SCHEMA_CONFIG["pruning"]["max_tables"])
+        
+        schema = self.generate_schema_context(selected or None)
+        relationships = self.get_table_relationships(selected or None)
+        prompt = f"{schema}\n{relationships}"
+        
+        prompt_tokens = estimate_tokens(prompt)
+        report = {
+            "tables": selected or list(self.catalog.get_tables()),
+            "pruned": bool(selected),
+            "full_tokens": full_tokens,
+            "prompt_tokens": prompt_tokens,
+            "tokens_saved": full_tokens - prompt_tokens,
+            "section_tokens": {"schema": estimate_tokens(schema), "relationships": estimate_tokens(relationships)},
+        }
+        return prompt, report
     
     def get_full_schema_prompt(self) -> str:
         """Get complete schema information for AI prompt"""
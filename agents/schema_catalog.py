@@ -0,0 +1,278 @@
+"""
+Schema Catalog - Bulk schema introspection cached against a schema fingerprint
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from agents.db_agent import DatabaseAgent
+from config import DB_CONFIG, SCHEMA_CONFIG
+
+
+def round_estimate(count: Optional[int]) -> Optional[int]:
+    """Round a row estimate to two significant figures.
+
+    Estimates end up in the LLM prompt, and the prompt hash keys the
+    translation cache, so small data changes must not change the text.
+    """
+    if not count:
+        return count
+    digits = len(str(int(count)))
+    factor = 10 ** max(digits - 2, 0)
+    return int(round(count / factor) * factor)
+
+
+class SchemaCatalog:
+    """Whole-schema metadata fetched in a few bulk queries.
+
+    The catalog is cached in memory and on disk together with a cheap
+    fingerprint (``PRAGMA schema_version`` on SQLite, the latest
+    ``last_altered`` time in ``information_schema.tables`` on Databricks).
+    When the fingerprint moves, only tables whose definition changed are
+    introspected again. Row counts are estimates taken from ``sqlite_stat1``
+    or the rowid high-water mark, never ``COUNT(*)`` scans.
+    """
+
+    def __init__(self, db_agent: Optional[DatabaseAgent] = None, cache_path: Optional[str] = None):
+        self.db_agent = db_agent or DatabaseAgent()
+        self.db_type = self.db_agent.db_type
+        self.cache_path = cache_path if cache_path is not None else SCHEMA_CONFIG["cache_path"]
+        self.check_interval = SCHEMA_CONFIG["check_interval"]
+        self.row_estimate_ttl = SCHEMA_CONFIG["row_estimate_ttl"]
+
+        self.fingerprint = None
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self._signatures: Dict[str, Any] = {}
+        self._last_check = 0.0
+        self._estimated_at = 0.0
+        self._lock = threading.RLock()
+        self._load_cache()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_tables(self) -> Dict[str, Dict[str, Any]]:
+        """Return ``{table: info}`` for every user table, refreshing if stale"""
+        self.refresh()
+        return self.tables
+
+    def get_table(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """Return catalog info for a single table"""
+        return self.get_tables().get(table_name)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Bring the catalog up to date; returns True if anything in it changed"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.tables and now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+
+            fingerprint = self._fetch_fingerprint()
+            changed = force or fingerprint != self.fingerprint or not self.tables
+            if changed:
+                self._refresh_changed_tables()
+                self.fingerprint = fingerprint
+            estimates_stale = time.time() - self._estimated_at > self.row_estimate_ttl
+            if changed or estimates_stale:
+                before = {name: info.get("row_estimate") for name, info in self.tables.items()}
+                self._refresh_row_estimates()
+                after = {name: info.get("row_estimate") for name, info in self.tables.items()}
+                changed = changed or before != after
+                self._save_cache()
+            return changed
+
+    def get_relationships(self) -> List[Dict[str, str]]:
+        """Foreign keys across the schema as ``{table, column, ref_table, ref_column}``"""
+        relationships = []
+        for table_name, info in self.get_tables().items():
+            for fk in info["foreign_keys"]:
+                relationships.append({"table": table_name, **fk})
+        return relationships
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def _qualified_schema(self) -> str:
+        return f"{DB_CONFIG['databricks']['catalog']}.{DB_CONFIG['databricks']['schema']}"
+
+    def _fetch_fingerprint(self):
+        if self.db_type == "sqlite":
+            results, _ = self.db_agent.execute_query("PRAGMA schema_version")
+            return results[0][0]
+        elif self.db_type == "databricks":
+            catalog = DB_CONFIG["databricks"]["catalog"]
+            schema = DB_CONFIG["databricks"]["schema"]
+            results, _ = self.db_agent.execute_query(f"""
+                SELECT CAST(MAX(last_altered) AS STRING), COUNT(*)
+                FROM {catalog}.information_schema.tables
+                WHERE table_schema = '{schema}'
+            """)
+            return f"{results[0][0]}|{results[0][1]}"
+
+    def _fetch_signatures(self) -> Dict[str, Any]:
+        """Per-table value that changes whenever the table definition does"""
+        if self.db_type == "sqlite":
+            results, _ = self.db_agent.execute_query("""
+                SELECT name, sql FROM sqlite_master
+                WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'rollup_%'
+            """)
+        elif self.db_type == "databricks":
+            catalog = DB_CONFIG["databricks"]["catalog"]
+            schema = DB_CONFIG["databricks"]["schema"]
+            results, _ = self.db_agent.execute_query(f"""
+                SELECT table_name, CAST(last_altered AS STRING)
+                FROM {catalog}.information_schema.tables
+                WHERE table_schema = '{schema}'
+            """)
+        return {row[0]: row[1] for row in results}
+
+    def _refresh_changed_tables(self):
+        signatures = self._fetch_signatures()
+        changed = [name for name, sig in signatures.items() if self._signatures.get(name) != sig or name not in self.tables]
+
+        tables = {name: info for name, info in self.tables.items() if name in signatures}
+        if changed:
+            tables.update(self._introspect(changed))
+        self.tables = dict(sorted(tables.items()))
+        self._signatures = signatures
+
+    def _introspect(self, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch columns and foreign keys for many tables in one pass each"""
+        tables = {name: {"name": name, "columns": [], "foreign_keys": [], "row_estimate": None}
+                  for name in table_names}
+        in_list = ", ".join("'" + name.replace("'", "''") + "'" for name in table_names)
+
+        if self.db_type == "sqlite":
+            columns, _ = self.db_agent.execute_query(f"""
+                SELECT m.name, p.name, p.type, p."notnull", p.pk
+                FROM sqlite_master m JOIN pragma_table_info(m.name) p
+                WHERE m.type = 'table' AND m.name IN ({in_list})
+                ORDER BY m.name, p.cid
+            """)
+            foreign_keys, _ = self.db_agent.execute_query(f"""
+                SELECT m.name, f."from", f."table", f."to"
+                FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f
+                WHERE m.type = 'table' AND m.name IN ({in_list})
+            """)
+        elif self.db_type == "databricks":
+            catalog = DB_CONFIG["databricks"]["catalog"]
+            schema = DB_CONFIG["databricks"]["schema"]
+            columns, _ = self.db_agent.execute_query(f"""
+                SELECT table_name, column_name, data_type,
+                       CASE WHEN is_nullable = 'NO' THEN 1 ELSE 0 END, 0
+                FROM {catalog}.information_schema.columns
+                WHERE table_schema = '{schema}' AND table_name IN ({in_list})
+                ORDER BY table_name, ordinal_position
+            """)
+            try:
+                foreign_keys, _ = self.db_agent.execute_query(f"""
+                    SELECT k.table_name, k.column_name, c.table_name, c.column_name
+                    FROM {catalog}.information_schema.referential_constraints r
+                    JOIN {catalog}.information_schema.key_column_usage k
+                      ON k.constraint_name = r.constraint_name AND k.constraint_schema = r.constraint_schema
+                    JOIN {catalog}.information_schema.constraint_column_usage c
+                      ON c.constraint_name = r.unique_constraint_name AND c.constraint_schema = r.unique_constraint_schema
+                    WHERE k.table_schema = '{schema}' AND k.table_name IN ({in_list})
+                """)
+            except Exception:
+                # Informational constraints are optional on Databricks
+                foreign_keys = []
+
+        for table_name, col_name, col_type, notnull, pk in columns:
+            tables[table_name]["columns"].append({
+                "name": col_name,
+                "type": col_type or "unknown",
+                "notnull": bool(notnull),
+                "pk": bool(pk),
+            })
+        for table_name, column, ref_table, ref_column in foreign_keys:
+            tables[table_name]["foreign_keys"].append({
+                "column": column,
+                "ref_table": ref_table,
+                "ref_column": ref_column or column,
+            })
+        return tables
+
+    def _refresh_row_estimates(self):
+        """Cheap row estimates; Databricks tables are left as unknown"""
+        self._estimated_at = time.time()
+        if self.db_type != "sqlite" or not self.tables:
+            return
+
+        estimates: Dict[str, int] = {}
+        stat_tables, _ = self.db_agent.execute_query(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )
+        if stat_tables:
+            results, _ = self.db_agent.execute_query("SELECT tbl, stat FROM sqlite_stat1")
+            for table_name, stat in results:
+                if stat:
+                    rows = int(str(stat).split()[0])
+                    estimates[table_name] = max(estimates.get(table_name, 0), rows)
+
+        # Tables ANALYZE has not seen: the rowid high-water mark is an O(log n)
+        # lookup and matches the row count for append-mostly tables.
+        missing = [name for name in self.tables if name not in estimates]
+        if missing:
+            query = " UNION ALL ".join(
+                f"SELECT '{name}', (SELECT MAX(rowid) FROM \"{name}\")" for name in missing
+            )
+            try:
+                results, _ = self.db_agent.execute_query(query)
+                estimates.update({name: count or 0 for name, count in results})
+            except Exception:
+                # WITHOUT ROWID tables have no rowid; leave them unknown
+                pass
+
+        for name, info in self.tables.items():
+            info["row_estimate"] = round_estimate(estimates.get(name))
+
+    # ------------------------------------------------------------------
+    # Disk cache
+    # ------------------------------------------------------------------
+
+    def _database_key(self) -> str:
+        if self.db_type == "sqlite":
+            return f"sqlite:{os.path.abspath(DB_CONFIG['sqlite']['database'])}"
+        return f"databricks:{DB_CONFIG['databricks']['server_hostname']}:{self._qualified_schema()}"
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cached.get("database") != self._database_key():
+            return
+        self.fingerprint = cached.get("fingerprint")
+        self.tables = cached.get("tables", {})
+        self._signatures = cached.get("signatures", {})
+        self._estimated_at = cached.get("estimated_at", 0.0)
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = {
+            "database": self._database_key(),
+            "fingerprint": self.fingerprint,
+            "signatures": self._signatures,
+            "estimated_at": self._estimated_at,
+            "tables": self.tables,
+        }
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write schema cache: {e}")
@@ -0,0 +1,127 @@
+"""
+Schema Index - Picks the tables relevant to a question so the prompt only carries those
+"""
+
+import math
+import re
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Set
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "give",
+    "has", "have", "how", "i", "in", "is", "it", "list", "many", "me", "much", "of", "on",
+    "or", "show", "than", "that", "the", "their", "them", "there", "these", "this", "to",
+    "was", "what", "where", "which", "who", "whose", "with", "all", "any", "each", "get",
+    "find", "display", "total", "number", "count", "over", "under", "above", "below",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with snake_case split and a light plural stem"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower().replace("_", " ")):
+        if word in STOPWORDS or word.isdigit():
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class SchemaIndex:
+    """BM25 index over table names, column names and relationships.
+
+    Each table is one document made of its name and column names, with the
+    name tokens repeated so they outweigh columns. ``select`` returns the
+    best matching tables plus every table on the foreign-key join paths
+    between them, so a question about "claims per agent" still gets the
+    policies table that links the two.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    TABLE_NAME_WEIGHT = 3
+
+    def __init__(self, tables: Dict[str, Dict[str, Any]], aliases: Optional[Dict[str, str]] = None):
+        self.tables = tables
+        self.aliases = {tokenize(k)[0]: v for k, v in (aliases or {}).items() if tokenize(k)}
+        self.graph: Dict[str, Set[str]] = {name: set() for name in tables}
+        for name, info in tables.items():
+            for fk in info.get("foreign_keys", []):
+                if fk["ref_table"] in self.graph:
+                    self.graph[name].add(fk["ref_table"])
+                    self.graph[fk["ref_table"]].add(name)
+
+        self.doc_terms: Dict[str, Counter] = {}
+        for name, info in tables.items():
+            terms = tokenize(name) * self.TABLE_NAME_WEIGHT
+            # Foreign key columns name *other* tables; the join graph covers them
+            fk_columns = {fk["column"] for fk in info.get("foreign_keys", [])}
+            for column in info.get("columns", []):
+                if column["name"] not in fk_columns:
+                    terms.extend(t for t in tokenize(column["name"]) if t != "id")
+            self.doc_terms[name] = Counter(terms)
+
+        self.doc_len = {name: sum(terms.values()) for name, terms in self.doc_terms.items()}
+        self.avg_len = (sum(self.doc_len.values()) / len(self.doc_len)) if self.doc_len else 0.0
+        doc_freq: Counter = Counter()
+        for terms in self.doc_terms.values():
+            doc_freq.update(terms.keys())
+        n_docs = len(self.doc_terms)
+        self.idf = {term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def score(self, question: str) -> Dict[str, float]:
+        """BM25 score of every table for the question"""
+        query_terms = tokenize(question)
+        boosted = {self.aliases[t] for t in query_terms if t in self.aliases}
+        scores: Dict[str, float] = {}
+        for name, terms in self.doc_terms.items():
+            score = 0.0
+            norm = self.K1 * (1 - self.B + self.B * self.doc_len[name] / (self.avg_len or 1))
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.K1 + 1) / (tf + norm)
+            if name in boosted:
+                # Synonym hits (e.g. "customer" for account) count like a name match
+                score += max(self.idf.values(), default=1.0)
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def _path(self, start: str, goal: str) -> List[str]:
+        """Shortest foreign-key path between two tables (BFS)"""
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if node == goal:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = previous[node]
+                return path[::-1]
+            for neighbour in sorted(self.graph.get(node, ())):
+                if neighbour not in previous:
+                    previous[neighbour] = node
+                    queue.append(neighbour)
+        return []
+
+    def select(self, question: str, max_tables: int = 5, min_relative_score: float = 0.5) -> List[str]:
+        """Relevant tables for the question, including join-path tables; [] if nothing matched"""
+        scores = self.score(question)
+        if not scores:
+            return []
+        ranked = sorted(scores, key=lambda name: (-scores[name], name))
+        top_score = scores[ranked[0]]
+        chosen = [name for name in ranked if scores[name] >= top_score * min_relative_score][:max_tables]
+
+        selected = list(chosen)
+        root = chosen[0]
+        for table in chosen[1:]:
+            for hop in self._path(root, table):
+                if hop not in selected:
+                    selected.append(hop)
+        return selected
@@ -2,24 +2,22 @@
 SQL Generator Agent - Converts natural language to SQL using Gemini AI
 """
 
-from google import genai
-from config import GEMINI_CONFIG
+from typing import Any, Dict, List, Optional, Tuple
+from agents import metrics
+from agents.example_store import SEED_EXAMPLES, ExampleStore, format_examples
+from agents.llm_gateway import LLMGateway, get_gateway
 from agents.schema_agent import SchemaAgent
+from agents.sql_templates import SQLTemplateCache
+from agents.token_accounting import TokenLedger, section_tokens
+from agents.translation_cache import TranslationCache, schema_fingerprint
+from config import CACHE_CONFIG, EXAMPLE_CONFIG, TOKEN_CONFIG
 
-class SQLGeneratorAgent:
-    def __init__(self):
-        self.client = genai.Client(api_key=GEMINI_CONFIG["api_key"])
-        self.schema_agent = SchemaAgent()
-        self.schema_context = self.schema_agent.get_full_schema_prompt()
-    
-    def generate_sql(self, question: str) -> str:
-        """Convert natural language question to SQL query"""
-        
-        prompt = f"""
+PROMPT_HEADER = """
 You are an expert SQL query generator for an Insurance Company Database.
 
-{self.schema_context}
+"""
 
+PROMPT_RULES = """
 IMPORTANT RULES:
 1. Return ONLY the SQL query without any markdown, backticks, or explanations
 2. Do NOT include "```sql" or "```" or the word "sql" in your response
@@ -29,28 +27,118 @@ IMPORTANT RULES:
 6. For date comparisons, use proper date functions
 7. Use LIMIT clause for queries that might return many rows
 
-EXAMPLE QUERIES:
-
-Question: "How many accounts are there?"
-SQL: SELECT COUNT(*) as total_accounts FROM account
-
-Question: "Show all active policies with account names"
-SQL: SELECT c.name, p.policy_type, p.premium_amount, p.coverage_amount FROM account c JOIN policies p ON c.account_id = p.account_id WHERE p.status = 'Active'
+"""
 
-Question: "Which agent has sold the most policies?"
-SQL: SELECT a.name, COUNT(p.policy_id) as total_policies FROM agents a JOIN policies p ON a.agent_id = p.agent_id GROUP BY a.name ORDER BY total_policies DESC LIMIT 1
 
-Question: "Show accounts with total claim amounts"
-SQL: SELECT c.name, SUM(cl.claim_amount) as total_claims FROM account c JOIN claims cl ON c.account_id = cl.account_id GROUP BY c.name
+def build_prompt(schema_context: str, question: str, examples: List[Tuple[str, str]]) -> Tuple[str, Dict[str, str]]:
+    """The SQL generation prompt and its sections, in order"""
+    sections = {
+        "schema_context": PROMPT_HEADER + schema_context + "\n",
+        "rules": PROMPT_RULES,
+        "examples": format_examples(examples),
+        "question": f'Now convert this question to SQL:\nQuestion: "{question}"\nSQL:',
+    }
+    return "".join(sections.values()), sections
 
-Now convert this question to SQL:
-Question: "{question}"
-SQL:"""
 
-        response = self.client.models.generate_content(
-            model=GEMINI_CONFIG["model"],
-            contents=prompt
-        )
+class SQLGeneratorAgent:
+    def __init__(self, schema_agent: Optional[SchemaAgent] = None, gateway: Optional[LLMGateway] = None):
+        self.gateway = gateway or get_gateway()
+        self.schema_agent = schema_agent or SchemaAgent()
+        self.cache = TranslationCache()
+        self.last_prompt_report = None
+        self.last_usage = None
+        self.last_template = None
+        self.tokens_saved_total = 0
+        self.ledger = TokenLedger() if TOKEN_CONFIG["enabled"] else None
+        self.examples = ExampleStore() if EXAMPLE_CONFIG["enabled"] else None
+        self.templates = None
+        if CACHE_CONFIG["templates"]["enabled"]:
+            self.templates = SQLTemplateCache(self.schema_agent.db_agent, self.schema_agent.catalog)
+        self.refresh_schema()
+    
+    def refresh_schema(self):
+        """Reload the schema prompt; cached SQL for any other schema is dropped"""
+        self.schema_context = self.schema_agent.get_full_schema_prompt()
+        self.schema_hash = schema_fingerprint(self.schema_context)
+        self.cache.purge_other_schemas(self.schema_hash)
+    
+    def invalidate_cached(self, question: str):
+        """Forget the cached SQL for a question, e.g. when it failed to run"""
+        self.cache.invalidate(question, self.schema_hash)
+        if self.templates is not None:
+            self.templates.invalidate(question, self.schema_hash)
+        if self.examples is not None:
+            self.examples.remove(question)
+    
+    def record_success(self, question: str, sql_query: str):
+        """Keep a question whose SQL ran without error as a few-shot example"""
+        if self.examples is None:
+            return
+        try:
+            self.examples.add(question, sql_query)
+        except Exception as e:
+            print(f"Error saving example: {e}")
+    
+    def _record_usage(self, session_id: Optional[str], question: str, estimates: Dict[str, int],
+                      response) -> Optional[Dict[str, Any]]:
+        """Log the call's token usage and latency; budget alerts are attached as ``alerts``"""
+        trace = metrics.current_trace()
+        if trace is not None:
+            trace.set(prompt_tokens=response.usage.get("prompt_token_count", sum(estimates.values())),
+                      response_tokens=response.usage.get("candidates_token_count"))
+        if self.ledger is None:
+            return None
+        try:
+            entry = self.ledger.record(session_id, question, estimates, response)
+            entry["alerts"] = self.ledger.check_budgets(entry)
+            return entry
+        except Exception as e:
+            print(f"Error recording token usage: {e}")
+            return None
+    
+    def generate_sql(self, question: str, session_id: Optional[str] = None) -> str:
+        """Convert natural language question to SQL query"""
+        # Cheap fingerprint check; rebuilds the prompt only if the schema moved
+        with metrics.span("schema_refresh"):
+            if self.schema_agent.catalog.refresh():
+                self.refresh_schema()
+        
+        with metrics.span("translation_cache"):
+            cached_sql = self.cache.get(question, self.schema_hash)
+        self.last_prompt_report = None
+        self.last_usage = None
+        self.last_template = None
+        if cached_sql is not None:
+            return cached_sql
+        
+        # Same question with other values: bind them into the learned SQL, no model call
+        if self.templates is not None:
+            with metrics.span("template_match"):
+                match = self.templates.match(question, self.schema_hash)
+            if match is not None:
+                self.last_template = match
+                return match.render()
+        
+        # Only the tables relevant to this question (plus join paths) go in the prompt
+        with metrics.span("schema_prompt"):
+            schema_context, report = self.schema_agent.get_schema_prompt_for(question)
+        self.last_prompt_report = report
+        self.tokens_saved_total += report["tokens_saved"]
+        
+        # The stored examples closest to this question instead of a fixed set
+        with metrics.span("example_retrieval"):
+            examples = self.examples.nearest(question) if self.examples is not None else SEED_EXAMPLES
+        
+        prompt, sections = build_prompt(schema_context, question, examples)
+        estimates = dict(report["section_tokens"])   # schema, relationships
+        estimates.update(section_tokens({name: text for name, text in sections.items() if name != "schema_context"}))
+        
+        # Shared gateway: concurrency limit, deadline, retries, coalescing
+        with metrics.span("llm"):
+            response = self.gateway.generate(prompt)
+        
+        self.last_usage = self._record_usage(session_id, question, estimates, response)
         
         sql_query = response.text.strip()
         
@@ -59,4 +147,10 @@ SQL:"""
         if sql_query.lower().startswith("sql"):
             sql_query = sql_query[3:].strip()
         
+        self.cache.put(question, self.schema_hash, sql_query)
+        if self.templates is not None:
+            try:
+                self.templates.learn(question, sql_query, self.schema_hash)
+            except Exception as e:
+                print(f"Error learning SQL template: {e}")
         return sql_query
\ No newline at end of file
@@ -0,0 +1,427 @@
+"""
+SQL Templates - Reuses generated SQL for questions that differ only in their literal values
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from agents.sql_utils import apply_limit, strip_comments
+from agents.translation_cache import normalize_question
+from config import CACHE_CONFIG
+
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "FL": "Florida", "GA": "Georgia",
+    "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa",
+    "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+    "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+    "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+    "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont",
+    "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "DC": "District of Columbia",
+}
+
+_TEXT_TYPES = ("CHAR", "TEXT", "CLOB", "STRING", "UNKNOWN")
+_DATE_LIKE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_NUMBER = re.compile(r"(?<![\w.$-])\$?(\d[\d,]*(?:\.\d+)?)(k\b)?(?![\w-])", re.IGNORECASE)
+# String literals, bare numbers and ? placeholders (numbers inside identifiers are skipped)
+_SQL_TOKEN = re.compile(r"'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?![\w.])|\?")
+# A learned "top N" LIMIT at the end of the statement: "LIMIT ?", "LIMIT ? OFFSET n" or "LIMIT n, ?"
+_LIMIT_PARAM = re.compile(r"\bLIMIT\s+(?:(\?)(?:\s+OFFSET\s+(?:\?|\d+))?|(?:\?|\d+)\s*,\s*(\?))\s*$",
+                          re.IGNORECASE)
+
+
+class Entity:
+    """A value from the database (or a number) found in a question"""
+
+    __slots__ = ("kind", "value", "start", "end", "columns")
+
+    def __init__(self, kind: str, value: Any, start: int, end: int, columns: FrozenSet[str] = frozenset()):
+        self.kind = kind          # Column name ("state", "policy_type") or "number"
+        self.value = value
+        self.start = start
+        self.end = end
+        self.columns = columns    # "table.column" entries holding the value
+
+
+class TemplateMatch:
+    """Parameterized SQL for a question plus the values bound to it"""
+
+    def __init__(self, key: str, sql: str, params: List[Any], template_question: str):
+        self.key = key
+        self.sql = sql
+        self.params = params
+        self.template_question = template_question
+
+    def render(self) -> str:
+        """The SQL with each parameter written in as a literal (for display and the guard)"""
+        params = iter(self.params)
+        return _SQL_TOKEN.sub(lambda m: _literal(next(params)) if m.group(0) == "?" else m.group(0), self.sql)
+
+    def prepared(self, limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+        """``(sql, params)`` to execute, with the guard's row limit applied.
+
+        A LIMIT learned as a parameter keeps its placeholder and has the
+        bound value clamped; appending a second LIMIT would be a syntax error.
+        """
+        if not limit:
+            return self.sql, self.params
+        sql = strip_comments(self.sql).strip().rstrip(";").rstrip()
+        match = _LIMIT_PARAM.search(sql)
+        if match is None:
+            return apply_limit(self.sql, limit)[0], self.params
+        position = match.start(1) if match.group(1) else match.start(2)
+        index = sum(1 for token in _SQL_TOKEN.finditer(sql[:position]) if token.group(0) == "?")
+        params = list(self.params)
+        params[index] = max(0, min(int(params[index]), limit))
+        return sql, params
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def _number(text: str, thousands: Optional[str]) -> Any:
+    value = float(text.replace(",", ""))
+    if thousands:
+        value *= 1000
+    return int(value) if value.is_integer() else value
+
+
+class EntityDetector:
+    """Finds database values (states, policy types, statuses, ...) and numbers in questions.
+
+    Candidate values are the distinct values of every text column with at
+    most ``max_distinct`` of them in the first ``sample_rows`` rows of its
+    table (one bounded read per table, so no column is scanned in full).
+    They are reloaded on a background thread every ``refresh_interval``
+    seconds or when the catalog changes; until the first load finishes only
+    numbers are detected. Besides the values themselves it knows US state
+    names for two-letter state codes, and the leading words of values that
+    all end in the same word ("life" for "Life Insurance"). Short values
+    (codes) only match when written exactly, so "in" and "or" are never
+    read as states.
+    """
+
+    def __init__(self, db_agent, catalog, max_distinct: int = 100, refresh_interval: float = 600,
+                 sample_rows: int = 50000):
+        self.db_agent = db_agent
+        self.catalog = catalog
+        self.max_distinct = max_distinct
+        self.refresh_interval = refresh_interval
+        self.sample_rows = sample_rows
+        # (phrases, exact, pattern, exact pattern), replaced as a whole by each reload
+        self._index: Tuple[Dict[str, Dict[str, set]], Dict[str, Dict[str, set]], Any, Any] = ({}, {}, None, None)
+        self._loaded_at = float("-inf")
+        self._fingerprint = None
+        self._refreshing = False
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Start a background reload when the values are stale; never waits for it"""
+        self.catalog.get_tables()
+        with self._lock:
+            if self._refreshing or (self._fingerprint == self.catalog.fingerprint
+                                    and time.monotonic() - self._loaded_at < self.refresh_interval):
+                return
+            self._refreshing = True
+        threading.Thread(target=self._reload, name="entity-values", daemon=True).start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Load the values if needed and block until the first load has finished"""
+        self._load()
+        return self._ready.wait(timeout)
+
+    def _reload(self):
+        fingerprint = self.catalog.fingerprint
+        try:
+            phrases: Dict[str, Dict[str, set]] = {}
+            exact: Dict[str, Dict[str, set]] = {}
+
+            def add(target, phrase, value, column_key):
+                target.setdefault(phrase, {}).setdefault(value, set()).add(column_key)
+
+            for table_name, info in self.catalog.get_tables().items():
+                columns = [column["name"] for column in info["columns"]
+                           if not column["pk"] and any(t in column["type"].upper() for t in _TEXT_TYPES)]
+                for column_name, values in self._sample_values(table_name, columns).items():
+                    column_key = f"{table_name}.{column_name}"
+                    for value in values:
+                        if len(value) <= 3:
+                            add(exact, value, value, column_key)
+                        else:
+                            add(phrases, value.lower(), value, column_key)
+                        if value in US_STATES:
+                            add(phrases, US_STATES[value].lower(), value, column_key)
+                    # "Auto Insurance", "Life Insurance", ...: "auto" and "life" alone mean the same
+                    last_words = {value.rsplit(" ", 1)[-1] for value in values if " " in value}
+                    if len(values) > 1 and len(last_words) == 1 and all(" " in value for value in values):
+                        for value in values:
+                            prefix = value.rsplit(" ", 1)[0].lower()
+                            if len(prefix) >= 3:
+                                add(phrases, prefix, value, column_key)
+
+            index = (phrases, exact, self._compile(phrases, re.IGNORECASE), self._compile(exact, 0))
+            with self._lock:
+                self._index = index
+                self._fingerprint = fingerprint
+        except Exception as e:
+            print(f"Error loading entity values: {e}")
+        finally:
+            with self._lock:
+                # A failed load waits out the interval too, rather than retrying on every question
+                self._loaded_at = time.monotonic()
+                self._refreshing = False
+            self._ready.set()
+
+    @staticmethod
+    def _compile(phrases: Dict[str, Any], flags: int):
+        if not phrases:
+            return None
+        alternatives = sorted(phrases, key=len, reverse=True)
+        return re.compile(r"(?<!\w)(" + "|".join(re.escape(p) for p in alternatives) + r")(?!\w)", flags)
+
+    def _sample_values(self, table: str, columns: List[str]) -> Dict[str, List[str]]:
+        """``{column: values}`` for the columns with few enough distinct values in the sample"""
+        if not columns:
+            return {}
+        # Straight from the pool: these reads shouldn't feed the index advisor or the result cache
+        conn = self.db_agent.pool.acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT " + ", ".join(f'"{column}"' for column in columns)
+                           + f' FROM "{table}" LIMIT {int(self.sample_rows)}')
+            rows = cursor.fetchall()
+            cursor.close()
+        except Exception as e:
+            print(f"Error reading values of {table}: {e}")
+            return {}
+        finally:
+            self.db_agent.pool.release(conn)
+
+        found = {}
+        for i, column in enumerate(columns):
+            distinct = set()
+            for row in rows:
+                if isinstance(row[i], str):
+                    distinct.add(row[i])
+                    if len(distinct) > self.max_distinct:
+                        break
+            if len(distinct) > self.max_distinct:
+                continue
+            found[column] = sorted(value for value in distinct
+                                   if value.strip() and len(value) >= 2 and not _DATE_LIKE.match(value))
+        return found
+
+    def detect(self, question: str) -> List[Entity]:
+        """Entities in the order they appear; overlapping matches keep the longest"""
+        self._load()
+        all_phrases, all_exact, phrase_pattern, exact_pattern = self._index
+        found: List[Entity] = []
+        for pattern, phrases, fold in ((phrase_pattern, all_phrases, True), (exact_pattern, all_exact, False)):
+            if pattern is None:
+                continue
+            for match in pattern.finditer(question):
+                candidates = phrases[match.group(1).lower() if fold else match.group(1)]
+                # One phrase naming different values is ambiguous; take the value in most columns
+                value, columns = max(candidates.items(), key=lambda item: len(item[1]))
+                names = {column.split(".", 1)[1] for column in columns}
+                kind = names.pop() if len(names) == 1 else "value"
+                found.append(Entity(kind, value, match.start(), match.end(), frozenset(columns)))
+        found.sort(key=lambda entity: (entity.start, -(entity.end - entity.start)))
+
+        entities: List[Entity] = []
+        for entity in found:
+            if entities and entity.start < entities[-1].end:
+                continue
+            entities.append(entity)
+        taken = [(entity.start, entity.end) for entity in entities]
+        for match in _NUMBER.finditer(question):
+            if any(start < match.end() and match.start() < end for start, end in taken):
+                continue
+            entities.append(Entity("number", _number(match.group(1), match.group(2)), match.start(), match.end()))
+        entities.sort(key=lambda entity: entity.start)
+        return entities
+
+
+def template_question(question: str, entities: List[Entity]) -> str:
+    """The question with every entity replaced by ``{kind}``, normalized"""
+    text = question.strip()
+    for entity in reversed(entities):
+        text = text[:entity.start] + "{" + entity.kind + "}" + text[entity.end:]
+    return normalize_question(text)
+
+
+class SQLTemplateCache:
+    """Parameterized SQL learned from model output, keyed on the question's template.
+
+    After the model answers "accounts from Texas with life insurance" the
+    detected values ('TX', 'Life Insurance') are replaced by ``?`` in the
+    SQL and stored under "accounts from {state} with {policy_type}
+    insurance". A later question with the same shape is answered by binding
+    its own values, without a model call. SQL is only learned when every
+    detected value appears in it as a literal, and a match requires each
+    new value to come from a column the original value came from.
+    """
+
+    def __init__(self, db_agent, catalog, path: Optional[str] = None, max_entries: Optional[int] = None):
+        config = CACHE_CONFIG["templates"]
+        self.path = path or config["path"]
+        self.max_entries = max_entries or config["max_entries"]
+        self.detector = EntityDetector(db_agent, catalog, config["max_distinct_values"],
+                                       config["value_refresh_interval"], config["value_sample_rows"])
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_templates (
+                template_key TEXT PRIMARY KEY,
+                template_question TEXT,
+                schema_hash TEXT,
+                sql_template TEXT,
+                slots TEXT,
+                created_at REAL,
+                last_used REAL,
+                hit_count INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.commit()
+
+    def _key(self, template: str, schema_hash: str) -> str:
+        return hashlib.sha256(f"{schema_hash}\n{template}".encode("utf-8")).hexdigest()
+
+    def learn(self, question: str, sql_query: str, schema_hash: str) -> bool:
+        """Store the SQL as a template if its literals can be tied to the question's values"""
+        entities = self.detector.detect(question)
+        if not entities or len({repr(entity.value) for entity in entities}) < len(entities):
+            return False
+
+        order: List[int] = []
+        kinds: List[str] = [""] * len(entities)
+
+        def parameterize(match: re.Match) -> str:
+            token = match.group(0)
+            if token == "?":
+                raise ValueError("SQL already has placeholders")
+            for index, entity in enumerate(entities):
+                if token.startswith("'"):
+                    text = token[1:-1].replace("''", "'")
+                    hit = text == (entity.value if isinstance(entity.value, str) else str(entity.value))
+                    literal = "string"
+                else:
+                    hit = entity.kind == "number" and float(token) == entity.value
+                    literal = "number"
+                if hit:
+                    order.append(index)
+                    kinds[index] = literal
+                    return "?"
+            return token
+
+        try:
+            sql_template = _SQL_TOKEN.sub(parameterize, sql_query)
+        except ValueError:
+            return False
+        if set(order) != set(range(len(entities))):
+            return False
+
+        slots = {
+            "entities": [
+                {"kind": entity.kind, "columns": sorted(entity.columns), "literal": kinds[index]}
+                for index, entity in enumerate(entities)
+            ],
+            "order": order,
+        }
+        template = template_question(question, entities)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO sql_templates
+                    (template_key, template_question, schema_hash, sql_template, slots, created_at, last_used, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                (self._key(template, schema_hash), template, schema_hash, sql_template, json.dumps(slots), now, now)
+            )
+            self._conn.execute(
+                """
+                DELETE FROM sql_templates WHERE template_key IN (
+                    SELECT template_key FROM sql_templates
+                    ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._conn.commit()
+        return True
+
+    def match(self, question: str, schema_hash: str) -> Optional[TemplateMatch]:
+        """Bind the question's values into a known template, or None"""
+        entities = self.detector.detect(question)
+        if not entities:
+            return None
+        template = template_question(question, entities)
+        key = self._key(template, schema_hash)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql_template, slots FROM sql_templates WHERE template_key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        sql_template, slots = row[0], json.loads(row[1])
+        if len(slots["entities"]) != len(entities):
+            self.misses += 1
+            return None
+        values = []
+        for entity, slot in zip(entities, slots["entities"]):
+            if slot["columns"] and not entity.columns & set(slot["columns"]):
+                self.misses += 1
+                return None
+            value = entity.value
+            if slot["literal"] == "string" and not isinstance(value, str):
+                value = str(value)
+            values.append(value)
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sql_templates SET last_used = ?, hit_count = hit_count + 1 WHERE template_key = ?",
+                (time.time(), key)
+            )
+            self._conn.commit()
+        self.hits += 1
+        return TemplateMatch(key, sql_template, [values[index] for index in slots["order"]], template)
+
+    def invalidate(self, question: str, schema_hash: str):
+        """Forget the template a question maps to, e.g. when its SQL failed to run"""
+        entities = self.detector.detect(question)
+        if not entities:
+            return
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sql_templates WHERE template_key = ?",
+                (self._key(template_question(question, entities), schema_hash),)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sql_templates").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,166 @@
+"""
+SQL Utilities - Lightweight helpers for inspecting SQL text without a full parser
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# Literals and quoted identifiers are matched in the same scan as comments so
+# that a "--" or "/*" inside quotes is never taken for the start of a comment
+_COMMENT_OR_QUOTED = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?(?:\*/|$)""", re.DOTALL)
+
+_SQL_KEYWORDS = {
+    "where", "on", "join", "inner", "left", "right", "full", "outer", "cross", "natural",
+    "group", "order", "limit", "having", "union", "except", "intersect", "using", "as", "select",
+}
+
+
+def strip_comments(query: str) -> str:
+    """Remove ``--`` and ``/* */`` comments, leaving quoted text untouched"""
+    return _COMMENT_OR_QUOTED.sub(lambda m: m.group(0) if m.group(0)[0] in "'\"" else " ", query)
+
+
+def mask_literals(query: str) -> str:
+    """Replace string literals with ``?`` so their contents can't look like SQL"""
+    return _STRING_LITERAL.sub("?", query)
+
+
+def table_aliases(query: str) -> Dict[str, str]:
+    """Map every name a table is referenced by in FROM/JOIN clauses to the table.
+
+    ``FROM policies p JOIN claims AS cl`` gives
+    ``{"policies": "policies", "p": "policies", "claims": "claims", "cl": "claims"}``.
+    """
+    text = mask_literals(strip_comments(query))
+    aliases: Dict[str, str] = {}
+    # A FROM clause may list several comma-separated tables; JOIN names one
+    sources = re.findall(
+        r"\bFROM\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|LIMIT|HAVING|UNION|EXCEPT|INTERSECT|JOIN|LEFT|RIGHT|"
+        r"INNER|CROSS|FULL|NATURAL|ON|USING)\b|[()]|$)",
+        text, re.IGNORECASE | re.DOTALL,
+    )
+    sources = [part for source in sources for part in source.split(",")]
+    sources += re.findall(r"\bJOIN\s+([^()]*?)(?=\b(?:ON|USING|WHERE|GROUP|ORDER|LIMIT|JOIN|LEFT|INNER|CROSS)\b|[()]|$)",
+                          text, re.IGNORECASE | re.DOTALL)
+    for source in sources:
+        match = re.match(r'\s*(?:\w+\.)?"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?\s*$', source, re.IGNORECASE)
+        if not match:
+            continue
+        table, alias = match.group(1), match.group(2)
+        if table.lower() in _SQL_KEYWORDS:
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def predicate_columns(query: str, literal_only: bool = False) -> List[Tuple[Optional[str], str, str]]:
+    """``(qualifier, column, kind)`` for columns filtered in WHERE/ON clauses.
+
+    ``kind`` is ``"eq"`` for equality-style tests (=, IN, IS) and ``"range"``
+    for everything an index can only range-scan (<, >, BETWEEN, LIKE).
+    With ``literal_only`` join conditions are skipped and only comparisons
+    against constants are returned.
+    """
+    text = mask_literals(strip_comments(query))
+    clauses = re.findall(
+        r"\b(?:WHERE|ON)\b(.*?)(?=\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|UNION|JOIN|LEFT|INNER|WHERE)\b|$)",
+        text, re.IGNORECASE | re.DOTALL,
+    )
+    found = []
+    pattern = r"(?:\b(\w+)\.)?\b([A-Za-z_]\w*)\s*(==|=|<=|>=|<>|!=|<|>|\bIN\b|\bIS\b|\bBETWEEN\b|\bLIKE\b)"
+    if literal_only:
+        pattern += r"(?=\s*(?:\?|[-+]?\d|\(|NULL\b|NOT\b))"
+    for clause in clauses:
+        for qualifier, column, operator in re.findall(pattern, clause, re.IGNORECASE):
+            operator = operator.upper()
+            if column.lower() in _SQL_KEYWORDS or operator in ("<>", "!="):
+                continue
+            kind = "eq" if operator in ("=", "==", "IN", "IS") else "range"
+            found.append((qualifier or None, column, kind))
+    return found
+
+
+def normalize_sql(query: str) -> str:
+    """Canonical text for a statement: no comments, single spaces, no trailing semicolon.
+
+    String literals are kept byte for byte, so only queries that differ in
+    layout share a normalized form.
+    """
+    text = strip_comments(query).strip().rstrip(";").strip()
+    parts = []
+    position = 0
+    for literal in _STRING_LITERAL.finditer(text):
+        parts.append(re.sub(r"\s+", " ", text[position:literal.start()]))
+        parts.append(literal.group(0))
+        position = literal.end()
+    parts.append(re.sub(r"\s+", " ", text[position:]))
+    return "".join(parts)
+
+
+def _statement_keyword(text: str) -> Optional[str]:
+    """The verb of the main statement, looking past a WITH clause's CTE list"""
+    depth = 0
+    for match in re.finditer(r"[()]|\b(?:SELECT|VALUES|INSERT|REPLACE|UPDATE|DELETE)\b", text, re.IGNORECASE):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            return token.upper()
+    return None
+
+
+def is_read_only(query: str) -> bool:
+    """True for a single SELECT statement, with or without a WITH clause.
+
+    ``WITH x AS (...) DELETE FROM ...`` is not read-only: CTE bodies sit
+    in parentheses, so the first keyword outside them is the real statement.
+    """
+    text = mask_literals(strip_comments(query)).strip().rstrip(";").strip()
+    if ";" in text:
+        return False
+    if re.match(r"SELECT\b", text, re.IGNORECASE):
+        return True
+    if not re.match(r"WITH\b", text, re.IGNORECASE):
+        return False
+    return _statement_keyword(text) in ("SELECT", "VALUES")
+
+
+def _top_level_limit(text: str) -> Optional[re.Match]:
+    """The LIMIT clause of the outermost query, ignoring subqueries"""
+    depth = 0
+    depths = []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        depths.append(depth)
+    match = None
+    for candidate in re.finditer(r"\bLIMIT\s+(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+\d+)?\s*$", text, re.IGNORECASE):
+        if depths[candidate.start()] == 0:
+            match = candidate
+    return match
+
+
+def apply_limit(query: str, limit: int) -> Tuple[str, Optional[int]]:
+    """Ensure the outer query returns at most ``limit`` rows.
+
+    Returns the rewritten SQL and the LIMIT that was there before (None if
+    there was none). An existing smaller LIMIT is left alone.
+    """
+    text = strip_comments(query).strip().rstrip(";").rstrip()
+    # Masked to the same length, so match offsets index into ``text``
+    match = _top_level_limit(_STRING_LITERAL.sub(lambda m: "?" * len(m.group(0)), text))
+    if match is None:
+        return f"{text}\nLIMIT {limit}", None
+    # The comma form is "LIMIT offset, count"
+    group = 2 if match.group(2) else 1
+    existing = int(match.group(group))
+    if existing <= limit:
+        return text, existing
+    return text[:match.start(group)] + str(limit) + text[match.end(group):], existing
@@ -0,0 +1,230 @@
+"""
+Token Accounting - Prompt size estimates and recorded model usage for SQL generation
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from config import TOKEN_CONFIG
+
+# Order the sections appear in the SQL generation prompt
+PROMPT_SECTIONS = ["schema", "relationships", "rules", "examples", "question"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token estimate (about four characters per token)"""
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+def section_tokens(sections: Dict[str, str]) -> Dict[str, int]:
+    """Estimated tokens per prompt section"""
+    return {name: estimate_tokens(text) for name, text in sections.items()}
+
+
+def usage_tokens(usage: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """Prompt/response/total token counts from a backend's usage metadata (None when not reported)"""
+    prompt = usage.get("prompt_token_count")
+    response = usage.get("candidates_token_count")
+    total = usage.get("total_token_count")
+    if total is None and prompt is not None:
+        total = prompt + (response or 0)
+    return {"prompt_tokens": prompt, "response_tokens": response, "total_tokens": total}
+
+
+class TokenLedger:
+    """SQLite log of every model call made to generate SQL.
+
+    Each row keeps the estimated tokens per prompt section next to the
+    usage the model reported and the call's latency, so the totals can be
+    grouped per session or per day and the sections compared by cost.
+    Calls answered from the translation cache never reach the model and
+    are not recorded. Calls the gateway coalesced onto an identical
+    in-flight prompt are recorded with zero tokens and counted separately,
+    since only the first one was paid for. ``check_budgets`` compares a
+    call and the running totals with ``TOKEN_CONFIG["budgets"]``.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or TOKEN_CONFIG["path"]
+        self.budgets = TOKEN_CONFIG["budgets"]
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL,
+                day TEXT,
+                session_id TEXT,
+                question TEXT,
+                sections TEXT,
+                estimated_tokens INTEGER,
+                prompt_tokens INTEGER,
+                response_tokens INTEGER,
+                total_tokens INTEGER,
+                latency REAL,
+                attempts INTEGER,
+                coalesced INTEGER DEFAULT 0
+            )
+        """)
+        # Ledgers written before coalesced calls were told apart
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_calls)")}
+        if "coalesced" not in columns:
+            self._conn.execute("ALTER TABLE llm_calls ADD COLUMN coalesced INTEGER DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_session ON llm_calls(session_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_day ON llm_calls(day)")
+        self._conn.commit()
+
+    def record(self, session_id: Optional[str], question: str, sections: Dict[str, int],
+               response) -> Dict[str, Any]:
+        """Store one model call (``response`` is an ``LLMResponse``) and return the row"""
+        now = time.time()
+        coalesced = bool(getattr(response, "coalesced", False))
+        entry = {
+            "session_id": session_id or "",
+            "question": question,
+            "sections": sections,
+            "estimated_tokens": sum(sections.values()),
+            # A coalesced call shares the first caller's response: its usage was paid for once
+            **({"prompt_tokens": 0, "response_tokens": 0, "total_tokens": 0} if coalesced
+               else usage_tokens(response.usage)),
+            "latency": response.latency,
+            "attempts": response.attempts,
+            "coalesced": coalesced,
+        }
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO llm_calls
+                    (created_at, day, session_id, question, sections, estimated_tokens,
+                     prompt_tokens, response_tokens, total_tokens, latency, attempts, coalesced)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (now, time.strftime("%Y-%m-%d", time.localtime(now)), entry["session_id"], question,
+                 json.dumps(sections), entry["estimated_tokens"], entry["prompt_tokens"],
+                 entry["response_tokens"], entry["total_tokens"], entry["latency"], entry["attempts"],
+                 int(coalesced))
+            )
+            self._conn.commit()
+        return entry
+
+    def _summary(self, where: str, params: tuple) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                SELECT COUNT(*) - COALESCE(SUM(coalesced), 0), SUM(COALESCE(prompt_tokens, estimated_tokens)),
+                       SUM(COALESCE(response_tokens, 0)),
+                       SUM(COALESCE(total_tokens, prompt_tokens, estimated_tokens)),
+                       AVG(latency), MAX(latency), COALESCE(SUM(coalesced), 0)
+                FROM llm_calls WHERE {where}
+                """,
+                params
+            ).fetchone()
+        return {
+            "calls": row[0],
+            "prompt_tokens": row[1] or 0,
+            "response_tokens": row[2] or 0,
+            "total_tokens": row[3] or 0,
+            "avg_latency": row[4] or 0.0,
+            "max_latency": row[5] or 0.0,
+            "coalesced": row[6],
+        }
+
+    def session_summary(self, session_id: str) -> Dict[str, Any]:
+        """Calls, tokens and latency for one app session"""
+        return self._summary("session_id = ?", (session_id,))
+
+    def day_summary(self, day: Optional[str] = None) -> Dict[str, Any]:
+        """Totals for one day (``YYYY-MM-DD``, default today)"""
+        return self._summary("day = ?", (day or time.strftime("%Y-%m-%d"),))
+
+    def daily(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Per-day totals for the most recent ``days`` days with any calls"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT day FROM llm_calls ORDER BY day DESC LIMIT ?", (days,)
+            ).fetchall()
+        return [{"day": day, **self.day_summary(day)} for (day,) in rows]
+
+    def section_breakdown(self, since: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Average estimated tokens per prompt section and its share of the prompt.
+
+        ``latency_share_ms`` splits each call's latency across the sections
+        by their share of its tokens: a rough guide to which part of the
+        prompt the model spends its time reading.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sections, estimated_tokens, latency FROM llm_calls WHERE created_at >= ? AND coalesced = 0",
+                (since or 0,)
+            ).fetchall()
+        totals = {name: {"tokens": 0.0, "latency": 0.0} for name in PROMPT_SECTIONS}
+        for sections_json, estimated, latency in rows:
+            for name, tokens in json.loads(sections_json).items():
+                bucket = totals.setdefault(name, {"tokens": 0.0, "latency": 0.0})
+                bucket["tokens"] += tokens
+                if estimated:
+                    bucket["latency"] += (latency or 0.0) * tokens / estimated
+        all_tokens = sum(bucket["tokens"] for bucket in totals.values())
+        return {
+            name: {
+                "avg_tokens": round(bucket["tokens"] / len(rows), 1) if rows else 0.0,
+                "share": round(bucket["tokens"] / all_tokens, 3) if all_tokens else 0.0,
+                "latency_share_ms": round(bucket["latency"] / len(rows) * 1000, 1) if rows else 0.0,
+            }
+            for name, bucket in totals.items()
+        }
+
+    def check_budgets(self, entry: Dict[str, Any]) -> List[str]:
+        """Budget alerts raised by a recorded call (empty when within every budget)"""
+        if entry.get("coalesced"):
+            # Added nothing to the totals; the call it shared already checked them
+            return []
+        alerts = []
+        prompt_tokens = entry["prompt_tokens"] or entry["estimated_tokens"]
+        if self.budgets["prompt_tokens_per_call"] and prompt_tokens > self.budgets["prompt_tokens_per_call"]:
+            alerts.append(f"prompt used {prompt_tokens:,} tokens "
+                          f"(budget {self.budgets['prompt_tokens_per_call']:,} per call)")
+        if self.budgets["latency_per_call"] and entry["latency"] > self.budgets["latency_per_call"]:
+            alerts.append(f"model took {entry['latency']:.1f}s (budget {self.budgets['latency_per_call']}s per call)")
+        if self.budgets["tokens_per_session"] and entry["session_id"]:
+            used = self.session_summary(entry["session_id"])["total_tokens"]
+            if used > self.budgets["tokens_per_session"]:
+                alerts.append(f"session used {used:,} tokens (budget {self.budgets['tokens_per_session']:,})")
+        if self.budgets["tokens_per_day"]:
+            used = self.day_summary()["total_tokens"]
+            if used > self.budgets["tokens_per_day"]:
+                alerts.append(f"{used:,} tokens used today (budget {self.budgets['tokens_per_day']:,})")
+        for alert in alerts:
+            print(f"Token budget exceeded: {alert}")
+        return alerts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize recorded SQL generation token usage")
+    parser.add_argument("--days", type=int, default=7, help="Days to list")
+    parser.add_argument("--path", default=None, help="Ledger database (default: TOKEN_CONFIG['path'])")
+    args = parser.parse_args()
+
+    ledger = TokenLedger(args.path)
+    print(f"{'day':<12}{'calls':>7}{'shared':>8}{'prompt':>10}{'response':>10}{'total':>10}{'avg s':>8}")
+    for row in ledger.daily(args.days):
+        print(f"{row['day']:<12}{row['calls']:>7}{row['coalesced']:>8}{row['prompt_tokens']:>10,}"
+              f"{row['response_tokens']:>10,}{row['total_tokens']:>10,}{row['avg_latency']:>8.2f}")
+    print("\nPrompt sections (all calls):")
+    for name, section in ledger.section_breakdown().items():
+        print(f"  {name:<14}{section['avg_tokens']:>8} tokens  {section['share']:>6.1%}  "
+              f"~{section['latency_share_ms']:,} ms")
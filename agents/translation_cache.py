@@ -0,0 +1,149 @@
+"""
+Translation Cache - Persists natural language to SQL translations on disk
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from config import CACHE_CONFIG
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache entry"""
+    text = question.strip().strip('"\'').lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip("?!. ")
+
+
+def schema_fingerprint(schema_context: str) -> str:
+    """Hash the schema prompt so cached SQL is tied to the schema it was built for"""
+    return hashlib.sha256(schema_context.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """SQLite-backed cache of generated SQL keyed on question + schema hash.
+
+    Entries expire after ``ttl_seconds`` and the least recently used ones are
+    evicted once there are more than ``max_entries``. Because the schema hash
+    is part of the key, any change to the schema prompt makes every older
+    translation unreachable.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        config = CACHE_CONFIG["translation"]
+        self.path = path or config["path"]
+        self.max_entries = max_entries or config["max_entries"]
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config["ttl_seconds"]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                cache_key TEXT PRIMARY KEY,
+                question TEXT,
+                schema_hash TEXT,
+                sql_query TEXT,
+                created_at REAL,
+                last_used REAL,
+                hit_count INTEGER DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)")
+        self._conn.commit()
+
+    def _key(self, question: str, schema_hash: str) -> str:
+        return hashlib.sha256(f"{schema_hash}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def get(self, question: str, schema_hash: str) -> Optional[str]:
+        """Return the cached SQL for a question, or None on a miss"""
+        key = self._key(question, schema_hash)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql_query, created_at FROM translations WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            sql_query, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM translations WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE translations SET last_used = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return sql_query
+
+    def put(self, question: str, schema_hash: str, sql_query: str):
+        """Store a translation and evict the least recently used overflow"""
+        key = self._key(question, schema_hash)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO translations
+                    (cache_key, question, schema_hash, sql_query, created_at, last_used, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+                """,
+                (key, question, schema_hash, sql_query, now, now)
+            )
+            self._conn.execute(
+                """
+                DELETE FROM translations WHERE cache_key IN (
+                    SELECT cache_key FROM translations
+                    ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def invalidate(self, question: str, schema_hash: str):
+        """Forget one translation, e.g. after the SQL failed to execute"""
+        with self._lock:
+            self._conn.execute("DELETE FROM translations WHERE cache_key = ?", (self._key(question, schema_hash),))
+            self._conn.commit()
+
+    def purge_other_schemas(self, schema_hash: str) -> int:
+        """Delete translations generated against any other schema"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM translations WHERE schema_hash != ?", (schema_hash,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        """Remove every cached translation"""
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the number of stored entries"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
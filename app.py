@@ -1,15 +1,27 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import contextvars
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from agents.db_agent import DatabaseAgent
+from agents.columnar import ColumnarResult
+from agents.frame_types import FrameTyper
 from agents.schema_agent import SchemaAgent
 from agents.sql_agent import SQLGeneratorAgent
 from agents.analytics_agent import AnalyticsAgent
-from config import APP_CONFIG
+from agents.query_guard import QueryGuard
+from agents.cancellation import CancellationToken, QueryCancelled
+from agents.query_orchestrator import QueryOrchestrator
+from agents.export_agent import FORMATS as EXPORT_FORMATS, ExportAgent, file_name, mime_type
+from agents import metrics
+from config import APP_CONFIG, EXPORT_CONFIG, FRAME_CONFIG, INDEX_CONFIG, METRICS_CONFIG, POOL_CONFIG, QUERY_CONFIG, ROLLUP_CONFIG
 
 # Page Configuration
 st.set_page_config(
@@ -121,14 +133,33 @@ st.markdown("""
 # Initialize agents
 @st.cache_resource
 def init_agents():
+    # One DatabaseAgent (and its pooled connections) shared by every agent
+    db_agent = DatabaseAgent()
+    if INDEX_CONFIG["create_defaults"]:
+        try:
+            db_agent.ensure_default_indexes()
+        except Exception as e:
+            print(f"Error creating default indexes: {e}")
+    schema_agent = SchemaAgent(db_agent)
+    analytics_agent = AnalyticsAgent(db_agent)
+    if ROLLUP_CONFIG["install_on_startup"]:
+        try:
+            analytics_agent.rollups.ensure_installed()
+        except Exception as e:
+            print(f"Error installing rollups: {e}")
     return {
-        'db': DatabaseAgent(),
-        'schema': SchemaAgent(),
-        'sql': SQLGeneratorAgent(),
-        'analytics': AnalyticsAgent()
+        'db': db_agent,
+        'schema': schema_agent,
+        'sql': SQLGeneratorAgent(schema_agent),
+        'analytics': analytics_agent,
+        'guard': QueryGuard(db_agent, schema_agent.catalog),
+        'orchestrator': QueryOrchestrator(),
+        'export': ExportAgent(db_agent),
+        'frames': FrameTyper(schema_agent.catalog)
     }
 
 agents = init_agents()
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
 
 # Sidebar
 with st.sidebar:
@@ -156,17 +187,218 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### ⚙️ Settings")
     st.info(f"**Database**: SQLite\n**Model**: Gemini 2.5 Flash")
+    
+    if agents['db'].snapshot is not None:
+        snapshot = agents['db'].snapshot.stats()
+        if snapshot['ready']:
+            st.caption(f"💾 Reads from a {snapshot['size_mb']} MB memory snapshot "
+                       f"({snapshot['served']:,} served, {snapshot['fallbacks']:,} from disk)")
+        elif snapshot['skipped']:
+            st.caption(f"💾 Memory snapshot off: {snapshot['skipped']}")
+    
+    if agents['db'].engine is not None:
+        engine = agents['db'].engine.stats()
+        if engine['ready']:
+            st.caption(f"🦆 DuckDB {engine['mode']}: {engine['routed']:,} aggregate queries routed "
+                       f"({engine['rejected']:,} sent back to SQLite)")
+        elif engine['skipped']:
+            st.caption(f"🦆 DuckDB engine off: {engine['skipped']}")
+    
+    if agents['db'].result_cache is not None:
+        cache = agents['db'].result_cache.stats()
+        st.caption(f"🗄️ Result cache: {cache['hit_ratio']:.0%} hits, {cache['entries']:,} results, "
+                   f"{cache['bytes'] / 2**20:.1f} of {cache['max_bytes'] / 2**20:.0f} MB")
+    
+    if agents['sql'].ledger is not None:
+        session_usage = agents['sql'].ledger.session_summary(session_id)
+        today_usage = agents['sql'].ledger.day_summary()
+        st.caption(f"🧮 Tokens: {session_usage['total_tokens']:,} this session "
+                   f"({session_usage['calls']} calls), {today_usage['total_tokens']:,} today")
 
 # Main content
 st.markdown('<p class="main-header">🔍 Smart Data Analytics Assistant</p>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Query your insurance database using natural language - No SQL required!</p>', unsafe_allow_html=True)
 
+@st.cache_resource
+def get_query_executor():
+    # Interactive queries start on these threads so the script thread stays
+    # free to notice a Stop click (which reruns the script) and cancel them.
+    return ThreadPoolExecutor(max_workers=POOL_CONFIG["max_size"], thread_name_prefix="query")
+
+def _close_abandoned(future):
+    """Close a stream whose page run was interrupted before it finished opening"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def show_query_results(sql_query: str, guard_limit=None, params=None):
+    """Run a checked query (binding ``params`` to its placeholders) and render its results as they stream in"""
+    # Only one query per session: a new one stops whatever is still running
+    previous = st.session_state.get('query_token')
+    if previous is not None:
+        previous.cancel()
+    token = CancellationToken(QUERY_CONFIG["timeout"])
+    st.session_state['query_token'] = token
+    
+    # Execute query on a worker thread, streaming results in batches
+    # (in a copy of this context so its spans land in the current trace)
+    future = get_query_executor().submit(
+        contextvars.copy_context().run, agents['db'].stream_query, sql_query, token=token, params=params
+    )
+    stream = None
+    try:
+        stop_placeholder = st.empty()
+        stop_placeholder.button("⏹️ Stop query", key="stop_query")
+        with st.spinner("⚙️ Executing query..."):
+            elapsed_placeholder = st.empty()
+            started = time.monotonic()
+            while not future.done():
+                elapsed_placeholder.caption(f"⏱️ Running for {time.monotonic() - started:.0f}s")
+                time.sleep(0.2)
+            elapsed_placeholder.empty()
+        stop_placeholder.empty()
+        stream = future.result()
+    finally:
+        if stream is None and not future.done():
+            # Interrupted by a rerun (Stop, navigation, new question)
+            token.cancel()
+            st.session_state['query_stopped'] = True
+            future.add_done_callback(_close_abandoned)
+    
+    # Display results
+    st.markdown("### 📊 Query Results")
+    
+    with stream:
+        columns = stream.columns
+        batches = iter(stream)
+        first_batch = next(batches, None)
+        
+        if first_batch is not None:
+            first_chunk = ColumnarResult.from_batches(columns, [first_batch]).to_pandas()
+            
+            # Show metrics if single value (a short first batch means nothing follows)
+            if len(first_chunk) == 1 and len(columns) == 1 and len(first_chunk) < stream.batch_size:
+                value = first_chunk.iloc[0, 0]
+                with metrics.span("render"):
+                    st.markdown(f"""
+                    <div class="metric-card" style="max-width: 300px; margin: 2rem auto;">
+                        <h3>{value:,}</h3>
+                        <p>{columns[0].replace('_', ' ').title()}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+            else:
+                # Show the first page right away, then keep loading
+                table_placeholder = st.empty()
+                status_placeholder = st.empty()
+                with metrics.span("render"):
+                    table_placeholder.dataframe(first_chunk, use_container_width=True)
+                
+                def loading():
+                    yield first_batch
+                    for batch in batches:
+                        status_placeholder.caption(f"⏳ Loading results... {stream.row_count:,} rows so far")
+                        yield batch
+                
+                # Columns are packed as batches arrive, then given compact dtypes
+                result = ColumnarResult.from_batches(columns, loading())
+                frame_report = None
+                if FRAME_CONFIG["enabled"]:
+                    df, frame_report = agents['frames'].to_frame(result)
+                else:
+                    df = result.to_pandas()
+                with metrics.span("render"):
+                    table_placeholder.dataframe(df, use_container_width=True)
+                    status_placeholder.empty()
+                if frame_report is not None and frame_report['before_bytes'] >= 2**20:
+                    st.caption(
+                        f"🗜️ {frame_report['after_bytes'] / 2**20:,.1f} MB in memory with typed columns "
+                        f"(untyped {frame_report['before_bytes'] / 2**20:,.1f} MB, "
+                        f"{1 - frame_report['after_bytes'] / frame_report['before_bytes']:.0%} saved)"
+                    )
+            
+            if stream.truncated:
+                st.warning(
+                    f"⚠️ Showing the first {stream.row_count:,} of "
+                    f"{stream.total_rows():,} records. Refine the question to narrow the results."
+                )
+            elif guard_limit and stream.row_count >= guard_limit:
+                st.warning(
+                    f"⚠️ Showing the first {stream.row_count:,} records (row limit added by the query guard). "
+                    f"Refine the question to narrow the results."
+                )
+            else:
+                st.success(f"✅ Query executed successfully! Found {stream.row_count} record(s)")
+        else:
+            st.info("ℹ️ No records found for this query.")
+
+
+def show_export_panel(export_query):
+    """Stream the full result of the last query to a file, then offer it for download"""
+    with st.expander("📥 Export full results", expanded=bool(st.session_state.get('last_export'))):
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format",
+                                         format_func=lambda name: EXPORT_FORMATS[name][1])
+        with col2:
+            compress = st.checkbox("gzip", key="export_gzip", disabled=export_format == "xlsx",
+                                   help="Compressed .csv.gz, or gzip-coded Parquet (Excel files are already compressed)")
+        with col3:
+            start_export = st.button("📤 Export", use_container_width=True)
+        
+        if start_export:
+            st.session_state.pop('last_export', None)
+            stop_placeholder = st.empty()
+            stop_placeholder.button("⏹️ Stop export", key="stop_export")
+            progress_bar = st.progress(0.0, text="📤 Counting rows...")
+            
+            def report(rows, total):
+                if total:
+                    progress_bar.progress(min(rows / total, 1.0), text=f"📤 {rows:,} of {total:,} rows written")
+                else:
+                    progress_bar.progress(0.0, text=f"📤 {rows:,} rows written")
+            
+            # Rows go straight from the cursor to the file; a rerun (Stop) raises out of report()
+            try:
+                result = agents['export'].export(
+                    export_query['sql'], export_format, compress=compress and export_format != "xlsx",
+                    params=export_query['params'], token=CancellationToken(EXPORT_CONFIG["timeout"]),
+                    progress=report
+                )
+                st.session_state['last_export'] = result
+            except QueryCancelled as e:
+                st.warning(f"⏹️ {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Export failed: {str(e)}")
+            finally:
+                stop_placeholder.empty()
+            progress_bar.empty()
+        
+        result = st.session_state.get('last_export')
+        if result is not None and os.path.exists(result.path):
+            size_mb = result.bytes / 2**20
+            st.success(f"✅ Exported {result.rows:,} rows ({size_mb:,.1f} MB) in {result.seconds:.1f}s")
+            if result.bytes <= EXPORT_CONFIG["download_max_bytes"]:
+                with open(result.path, "rb") as f:
+                    st.download_button(
+                        label=f"📥 Download {EXPORT_FORMATS[result.format][1]}",
+                        data=f,
+                        file_name=file_name("query_results", result.format, result.path.endswith(".gz")),
+                        mime=mime_type(result.path)
+                    )
+            else:
+                st.info(f"💾 Too large to download through the browser; saved on the server as `{result.path}`")
+
+
 # PAGE 1: DASHBOARD
 if page == "🏠 Dashboard":
     st.markdown("## 📊 Executive Dashboard")
     
+    # Run every dashboard query at once; the page waits only for the slowest
+    page_trace = metrics.start_trace("dashboard")
+    page_load = agents['orchestrator'].load_page(agents['analytics'], "dashboard")
+    render_started = time.perf_counter()
+    
     # Get quick stats
-    stats = agents['analytics'].get_quick_stats()
+    stats = page_load.get('stats')
     
     # Display metrics in cards
     col1, col2, col3, col4 = st.columns(4)
@@ -210,7 +442,7 @@ if page == "🏠 Dashboard":
     
     with col1:
         st.markdown("### 📊 Policy Distribution")
-        policy_dist = agents['analytics'].get_policy_distribution()
+        policy_dist = page_load.get('policy_distribution')
         if not policy_dist.empty:
             fig = px.pie(
                 policy_dist, 
@@ -224,7 +456,7 @@ if page == "🏠 Dashboard":
     
     with col2:
         st.markdown("### 🏆 Top Performing Agents")
-        top_agents = agents['analytics'].get_top_agents()
+        top_agents = page_load.get('top_agents')
         if not top_agents.empty:
             fig = px.bar(
                 top_agents,
@@ -238,7 +470,7 @@ if page == "🏠 Dashboard":
     
     # Claims summary
     st.markdown("### 📋 Claims Overview")
-    claims_summary = agents['analytics'].get_claims_summary()
+    claims_summary = page_load.get('claims_summary')
     if not claims_summary.empty:
         col1, col2 = st.columns([2, 1])
         with col1:
@@ -251,6 +483,10 @@ if page == "🏠 Dashboard":
         
         with col2:
             st.dataframe(claims_summary, use_container_width=True, height=350)
+    
+    metrics.record("render", time.perf_counter() - render_started, render_started)
+    metrics.finish_trace(page_trace)
+    st.caption(f"⏱️ {page_load.report()}")
 
 # PAGE 2: QUERY ASSISTANT
 elif page == "💬 Query Assistant":
@@ -305,57 +541,125 @@ elif page == "💬 Query Assistant":
     with col2:
         submit = st.button("🚀 Generate & Execute Query", use_container_width=True)
     
+    if st.session_state.pop('query_stopped', False) and not submit:
+        st.info("⏹️ The previous query was stopped.")
+    
     if submit and question:
+        st.session_state.pop('pending_query', None)
+        st.session_state.pop('export_query', None)
+        st.session_state.pop('last_export', None)
+        query_trace = metrics.start_trace("query")
         with st.spinner("🤔 Analyzing your question..."):
             try:
                 # Generate SQL
-                sql_query = agents['sql'].generate_sql(question)
+                sql_query = agents['sql'].generate_sql(question, session_id=session_id)
+                template = agents['sql'].last_template
                 
                 # Display generated SQL
                 st.markdown("### 📝 Generated SQL Query")
                 st.code(sql_query, language="sql")
+                prompt_report = agents['sql'].last_prompt_report
+                if template is not None:
+                    st.caption(f"🧩 Filled in a learned template (no model call): \"{template.template_question}\"")
+                elif prompt_report is None:
+                    st.caption("⚡ Served from the translation cache")
+                elif prompt_report["pruned"]:
+                    st.caption(
+                        f"✂️ Schema context: {', '.join(prompt_report['tables'])} "
+                        f"(~{prompt_report['tokens_saved']:,} prompt tokens saved)"
+                    )
+                usage = agents['sql'].last_usage
+                if usage is not None:
+                    sections = ", ".join(f"{name} {tokens:,}" for name, tokens in usage['sections'].items())
+                    prompt_tokens = usage['prompt_tokens'] or usage['estimated_tokens']
+                    st.caption(f"🧮 Prompt {prompt_tokens:,} tokens (est. {sections}), "
+                               f"response {usage['response_tokens'] or 0:,}, model {usage['latency']:.2f}s")
+                    for alert in usage['alerts']:
+                        st.warning(f"💸 Token budget: {alert}")
                 
-                # Execute query
-                with st.spinner("⚙️ Executing query..."):
-                    results, columns = agents['db'].execute_query(sql_query)
+                # Check cost and bound the result size before running anything
+                with metrics.span("guard"):
+                    guard_result = agents['guard'].check(sql_query)
+                if guard_result.summary():
+                    st.caption(f"🛡️ Query guard: {guard_result.summary()}")
                 
-                # Display results
-                st.markdown("### 📊 Query Results")
+                # Template SQL runs as a prepared statement with the values bound
+                guard_limit = guard_result.limit if guard_result.limit_changed else None
+                run_sql, params = guard_result.sql, None
+                if template is not None:
+                    run_sql, params = template.prepared(guard_limit)
+                # Exports get the full result, without the guard's display limit
+                export_query = {'sql': sql_query, 'params': None}
+                if template is not None:
+                    export_query['sql'], export_query['params'] = template.prepared()
                 
-                if results:
-                    df = pd.DataFrame(results, columns=columns)
-                    
-                    # Show metrics if single value
-                    if len(df) == 1 and len(df.columns) == 1:
-                        value = df.iloc[0, 0]
-                        st.markdown(f"""
-                        <div class="metric-card" style="max-width: 300px; margin: 2rem auto;">
-                            <h3>{value:,}</h3>
-                            <p>{columns[0].replace('_', ' ').title()}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.dataframe(df, use_container_width=True)
-                        
-                        # Download button
-                        csv = df.to_csv(index=False)
-                        st.download_button(
-                            label="📥 Download Results as CSV",
-                            data=csv,
-                            file_name="query_results.csv",
-                            mime="text/csv"
-                        )
-                    
-                    st.success(f"✅ Query executed successfully! Found {len(results)} record(s)")
+                if guard_result.rejected:
+                    st.error("🚫 This query was blocked by the query guard. Try a more specific question.")
+                elif guard_result.needs_confirmation:
+                    st.session_state['pending_query'] = {
+                        'question': question,
+                        'generated_sql': sql_query,
+                        'sql': guard_result.sql,
+                        'run_sql': run_sql,
+                        'params': params,
+                        'summary': guard_result.summary(),
+                        'limit': guard_limit,
+                        'export': export_query
+                    }
                 else:
-                    st.info("ℹ️ No records found for this query.")
+                    show_query_results(run_sql, guard_limit, params)
+                    st.session_state['export_query'] = export_query
+                    # It ran: offer it as a few-shot example for similar questions
+                    agents['sql'].record_success(question, sql_query)
                     
+            except QueryCancelled as e:
+                st.warning(f"⏹️ {str(e)}")
             except Exception as e:
+                # Don't keep serving a cached translation that failed
+                agents['sql'].invalidate_cached(question)
                 st.error(f"❌ Error: {str(e)}")
                 st.info("💡 Try rephrasing your question or check the example questions above.")
+            finally:
+                metrics.finish_trace(query_trace)
+                st.session_state['last_trace'] = query_trace.to_dict()
     
     elif submit:
         st.warning("⚠️ Please enter a question first!")
+    
+    # Expensive query waiting for the user's go-ahead (survives the button rerun)
+    pending = st.session_state.get('pending_query')
+    if pending:
+        st.warning(f"⚠️ This query looks expensive ({pending['summary']}). Run it anyway?")
+        if not submit:
+            st.code(pending['sql'], language="sql")
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            run_anyway = st.button("▶️ Run anyway", use_container_width=True)
+        with col2:
+            cancel = st.button("✖️ Cancel", use_container_width=True)
+        
+        if cancel:
+            del st.session_state['pending_query']
+            st.rerun()
+        elif run_anyway:
+            del st.session_state['pending_query']
+            query_trace = metrics.start_trace("query", confirmed=True)
+            try:
+                show_query_results(pending['run_sql'], pending['limit'], pending['params'])
+                st.session_state['export_query'] = pending['export']
+                agents['sql'].record_success(pending['question'], pending['generated_sql'])
+            except QueryCancelled as e:
+                st.warning(f"⏹️ {str(e)}")
+            except Exception as e:
+                agents['sql'].invalidate_cached(pending['question'])
+                st.error(f"❌ Error: {str(e)}")
+            finally:
+                metrics.finish_trace(query_trace)
+                st.session_state['last_trace'] = query_trace.to_dict()
+    
+    # Full-result export for the last query that ran (survives the button reruns)
+    if st.session_state.get('export_query') and not st.session_state.get('pending_query'):
+        show_export_panel(st.session_state['export_query'])
 
 # PAGE 3: DATABASE SCHEMA
 elif page == "📊 Database Schema":
@@ -401,31 +705,46 @@ elif page == "📊 Database Schema":
         color_continuous_scale='Viridis'
     )
     st.plotly_chart(fig, use_container_width=True)
+    
+    # Index advisor
+    if agents['db'].advisor:
+        st.markdown("### 🧭 Index Advisor")
+        recommendations = agents['db'].advisor.recommendations()
+        if not recommendations:
+            st.info("No index recommendations yet - run some queries first.")
+        for idx, rec in enumerate(recommendations):
+            with st.expander(f"{rec['table']}({', '.join(rec['columns'])}) - seen {rec['occurrences']}x - {rec['status']}"):
+                st.caption(rec['reason'])
+                st.code(rec['statement'], language='sql')
+                if rec['status'] == 'recommended':
+                    if st.button("Create index", key=f"create_index_{idx}"):
+                        with st.spinner("Timing the query before and after..."):
+                            rec = agents['db'].advisor.create_index(rec['table'], rec['columns'])
+                        st.success(
+                            f"Created {rec['name']}: {rec['before'] * 1000:.1f} ms → "
+                            f"{rec['after'] * 1000:.1f} ms ({rec['speedup']}x)"
+                            if rec['speedup'] else
+                            f"Created {rec['name']}; the sample query still ran past the timing deadline"
+                        )
+                elif rec['before'] is not None:
+                    st.write(f"Before {rec['before'] * 1000:.1f} ms → after {rec['after'] * 1000:.1f} ms "
+                             + (f"({rec['speedup']}x)" if rec['speedup'] else "(stopped at the timing deadline)"))
 
 # PAGE 4: ANALYTICS
 elif page == "📈 Analytics":
     st.markdown("## 📈 Advanced Analytics & Reports")
     
+    # All three tabs render on every run, so load their queries together
+    page_trace = metrics.start_trace("analytics")
+    page_load = agents['orchestrator'].load_page(agents['analytics'], "analytics")
+    render_started = time.perf_counter()
+    
     tab1, tab2, tab3 = st.tabs(["💰 Revenue Analysis", "📋 Policy Insights", "⚠️ Risk Assessment"])
     
     with tab1:
         st.markdown("### 💰 Revenue & Premium Analysis")
         
-        query = """
-        SELECT 
-            p.policy_type,
-            COUNT(*) as policy_count,
-            SUM(p.premium_amount) as total_premium,
-            AVG(p.premium_amount) as avg_premium,
-            SUM(p.coverage_amount) as total_coverage
-        FROM policies p
-        WHERE p.status = 'Active'
-        GROUP BY p.policy_type
-        ORDER BY total_premium DESC
-        """
-        
-        results, columns = agents['db'].execute_query(query)
-        df = pd.DataFrame(results, columns=columns)
+        df = page_load.get('revenue_by_policy_type')
         
         col1, col2 = st.columns(2)
         
@@ -456,21 +775,7 @@ elif page == "📈 Analytics":
     with tab2:
         st.markdown("### 📋 Policy Distribution & Trends")
         
-        query = """
-        SELECT 
-            c.state,
-            COUNT(p.policy_id) as total_policies,
-            SUM(p.premium_amount) as total_premium
-        FROM account c
-        JOIN policies p ON c.account_id = p.account_id
-        WHERE p.status = 'Active'
-        GROUP BY c.state
-        ORDER BY total_policies DESC
-        LIMIT 10
-        """
-        
-        results, columns = agents['db'].execute_query(query)
-        df = pd.DataFrame(results, columns=columns)
+        df = page_load.get('policies_by_state')
         
         fig = px.treemap(
             df,
@@ -484,21 +789,7 @@ elif page == "📈 Analytics":
     with tab3:
         st.markdown("### ⚠️ Claims Risk Assessment")
         
-        query = """
-        SELECT 
-            p.policy_type,
-            COUNT(cl.claim_id) as total_claims,
-            SUM(cl.claim_amount) as total_claim_amount,
-            SUM(cl.approved_amount) as total_approved,
-            ROUND(100.0 * SUM(cl.approved_amount) / SUM(cl.claim_amount), 2) as approval_rate
-        FROM policies p
-        LEFT JOIN claims cl ON p.policy_id = cl.policy_id
-        WHERE cl.claim_id IS NOT NULL
-        GROUP BY p.policy_type
-        """
-        
-        results, columns = agents['db'].execute_query(query)
-        df = pd.DataFrame(results, columns=columns)
+        df = page_load.get('claims_risk')
         
         fig = go.Figure(data=[
             go.Bar(name='Claimed', x=df['policy_type'], y=df['total_claim_amount']),
@@ -508,6 +799,23 @@ elif page == "📈 Analytics":
         st.plotly_chart(fig, use_container_width=True)
         
         st.dataframe(df, use_container_width=True)
+    
+    metrics.record("render", time.perf_counter() - render_started, render_started)
+    metrics.finish_trace(page_trace)
+    st.caption(f"⏱️ {page_load.report()}")
+
+# Stage breakdown of the last question (the sidebar was drawn before it ran)
+last_trace = st.session_state.get('last_trace')
+if METRICS_CONFIG["sidebar_panel"] and last_trace:
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### ⏱️ Last Query Timing")
+        timing = pd.DataFrame(
+            [(stage, ms) for stage, ms in last_trace['stages_ms'].items()],
+            columns=['stage', 'ms']
+        )
+        st.dataframe(timing, use_container_width=True, hide_index=True)
+        st.caption(f"Total {last_trace['total_ms']:,.0f} ms")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,311 @@
+"""
+Batch Query Runner - Answers a file of questions headlessly and writes each result to disk
+
+Usage:
+    python batch_query.py questions.txt
+    python batch_query.py questions.csv --format csv --concurrency 8 --rate-limit 5
+    python batch_query.py questions.jsonl --output-dir nightly/2024-05-01 --retry-failed
+
+Questions come from a .txt file (one per line), a .csv file with a
+"question" column or a .jsonl file with a "question" field; an "id"
+column/field is used when present, otherwise the question's position.
+Ids must stay unique once reduced to file-name characters.
+Each result is streamed to <output-dir>/results/<id>.<format> (.csv.gz
+with --compress) and one line
+per question is appended to <output-dir>/manifest.jsonl with its status,
+SQL, row count and timings. Running the same command again skips every
+question the manifest already has, so an interrupted run carries on where
+it stopped. Translations come from the same cache the app uses; only
+cache misses call the model, at most --rate-limit times per second.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.export_agent import FORMATS, ResultWriter, file_name
+from config import BATCH_CONFIG, POOL_CONFIG
+
+MANIFEST = "manifest.jsonl"
+FINISHED = ("ok", "rejected")   # Statuses a resumed run does not repeat (see --retry-failed)
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads: ``rate`` calls per second after a burst"""
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call may be made"""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class RateLimitedGateway:
+    """The shared LLM gateway behind a rate limiter (translation cache hits never reach it)"""
+
+    def __init__(self, gateway, limiter: RateLimiter):
+        self.gateway = gateway
+        self.limiter = limiter
+
+    def generate(self, prompt: str, timeout: Optional[float] = None):
+        self.limiter.acquire()
+        return self.gateway.generate(prompt, timeout)
+
+
+def read_questions(path: str) -> List[Tuple[str, str]]:
+    """``(id, question)`` pairs from a .txt, .csv or .jsonl file.
+
+    Ids are reduced to characters safe in a file name; two ids that end up
+    the same ("a/b" and "a_b") would share a result file and a manifest
+    entry, so they raise ``ValueError``.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    rows: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            rows = list(csv.DictReader(f))
+        elif extension in (".jsonl", ".ndjson"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = [{"question": line.strip()} for line in f]
+
+    questions = []
+    seen: Dict[str, str] = {}
+    for position, row in enumerate(rows, start=1):
+        question = str(row.get("question") or "").strip()
+        if not question or question.startswith("#"):
+            continue
+        question_id = str(row.get("id") or f"q{position:06d}")
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", question_id)
+        if safe_id in seen:
+            raise ValueError(f"Duplicate question id {question_id!r} (same file name as {seen[safe_id]!r})")
+        seen[safe_id] = question_id
+        questions.append((safe_id, question))
+    return questions
+
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """Latest manifest entry per question id (a line cut off by a crash is ignored)"""
+    entries: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["id"]] = entry
+    return entries
+
+
+class BatchRunner:
+    """Generates and runs SQL for many questions on a thread pool.
+
+    Each worker translates its question (translation cache first, then the
+    rate-limited model), rejects anything but a single SELECT, and streams
+    the result from a pooled connection into its own file. The manifest
+    line is written once the file is in place, so whatever the manifest
+    lists is complete on disk.
+    """
+
+    def __init__(self, output_dir: str, output_format: str = "parquet", concurrency: int = 4,
+                 rate_limit: Optional[float] = None, burst: int = 1, max_rows: Optional[int] = None,
+                 query_timeout: Optional[float] = None, compress: bool = False):
+        from agents.db_agent import DatabaseAgent
+        from agents.llm_gateway import get_gateway
+        from agents.schema_agent import SchemaAgent
+        from agents.sql_agent import SQLGeneratorAgent
+
+        self.output_dir = output_dir
+        self.results_dir = os.path.join(output_dir, "results")
+        self.manifest_path = os.path.join(output_dir, MANIFEST)
+        self.format = output_format
+        self.compress = compress
+        # More workers than pooled connections would only queue on the pool
+        self.concurrency = max(1, min(concurrency, POOL_CONFIG["max_size"]))
+        self.max_rows = max_rows
+        self.query_timeout = query_timeout
+        self.session_id = f"batch-{uuid.uuid4().hex[:8]}"
+
+        self.db_agent = DatabaseAgent()
+        # Every result is read once; caching them would only evict the app's
+        self.db_agent.result_cache = None
+        schema_agent = SchemaAgent(self.db_agent)
+        self.sql_agent = SQLGeneratorAgent(schema_agent, RateLimitedGateway(get_gateway(), RateLimiter(rate_limit, burst)))
+        self._tokens = set()
+        self._manifest_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def run(self, questions: List[Tuple[str, str]], retry_failed: bool = False) -> Dict[str, int]:
+        """Answer every question the manifest doesn't already have; returns counts per status"""
+        os.makedirs(self.results_dir, exist_ok=True)
+        done = load_manifest(self.manifest_path)
+        statuses = FINISHED if retry_failed else FINISHED + ("error", "cancelled")
+        todo = [
+            (question_id, question) for question_id, question in questions
+            if done.get(question_id, {}).get("status") not in statuses
+            or done[question_id].get("question") != question
+        ]
+        counts = {"skipped": len(questions) - len(todo)}
+        print(f"{len(todo):,} of {len(questions):,} questions to run "
+              f"({counts['skipped']:,} already in {self.manifest_path})")
+
+        started = time.perf_counter()
+        finished = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            pending = list(reversed(todo))
+            running = set()
+            try:
+                while pending or running:
+                    while pending and len(running) < self.concurrency * 2:
+                        running.add(executor.submit(self.answer, *pending.pop()))
+                    completed, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        entry = future.result()
+                        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+                        finished += 1
+                        rate = finished / (time.perf_counter() - started)
+                        print(f"[{finished:,}/{len(todo):,}] {entry['id']} {entry['status']} "
+                              f"{entry['rows']:,} rows in {entry['total_seconds']:.2f}s ({rate:.1f} q/s)")
+            except KeyboardInterrupt:
+                # Stop queued work and the queries in flight; the manifest keeps what finished
+                print("\nInterrupted; stopping running queries (rerun the same command to resume)")
+                self._stopping.set()
+                for future in running:
+                    future.cancel()
+                for token in list(self._tokens):
+                    token.cancel("batch interrupted")
+                raise
+        return counts
+
+    def answer(self, question_id: str, question: str) -> Dict[str, Any]:
+        """Translate, run and save one question, then append its manifest line"""
+        from agents.cancellation import CancellationToken, QueryCancelled
+        from agents.sql_utils import is_read_only
+
+        entry: Dict[str, Any] = {
+            "id": question_id, "question": question, "status": "error", "sql": None, "cached": False,
+            "rows": 0, "truncated": False, "file": None, "error": None,
+            "generate_seconds": 0.0, "execute_seconds": 0.0, "total_seconds": 0.0,
+        }
+        started = time.perf_counter()
+        try:
+            sql_query = self.sql_agent.cache.get(question, self.sql_agent.schema_hash)
+            entry["cached"] = sql_query is not None
+            if sql_query is None:
+                sql_query = self.sql_agent.generate_sql(question, session_id=self.session_id)
+            entry["sql"] = sql_query
+            entry["generate_seconds"] = round(time.perf_counter() - started, 4)
+
+            if not is_read_only(sql_query):
+                entry["status"] = "rejected"
+                entry["error"] = "only a single SELECT statement can be run"
+            elif not self._stopping.is_set():
+                entry.update(self._execute(question_id, sql_query, CancellationToken(self.query_timeout)))
+                entry["status"] = "ok"
+                self.sql_agent.record_success(question, sql_query)
+        except QueryCancelled as e:
+            entry["status"] = "cancelled"
+            entry["error"] = str(e)
+        except Exception as e:
+            entry["error"] = str(e)
+            self.sql_agent.invalidate_cached(question)
+        entry["total_seconds"] = round(time.perf_counter() - started, 4)
+        if self._stopping.is_set() and entry["status"] != "ok":
+            return entry   # Not recorded, so the resumed run repeats it
+        entry["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        with self._manifest_lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        return entry
+
+    def _execute(self, question_id: str, sql_query: str, token) -> Dict[str, Any]:
+        """Stream one query's rows into its result file"""
+        path = os.path.join(self.results_dir, file_name(question_id, self.format, self.compress))
+        started = time.perf_counter()
+        self._tokens.add(token)
+        try:
+            # max_rows=0 reads the full result instead of the interactive cap
+            with self.db_agent.stream_query(sql_query, max_rows=self.max_rows or 0, token=token) as stream:
+                writer = ResultWriter(path, self.format, stream.columns, self.compress)
+                try:
+                    for batch in stream:
+                        writer.write(batch)
+                    writer.close()
+                except BaseException:
+                    writer.abort()
+                    raise
+                return {
+                    "rows": stream.row_count,
+                    "truncated": stream.truncated,
+                    "file": os.path.relpath(path, self.output_dir),
+                    "execute_seconds": round(time.perf_counter() - started, 4),
+                }
+        finally:
+            self._tokens.discard(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and run SQL for a file of questions")
+    parser.add_argument("questions", help="Questions file (.txt, .csv or .jsonl)")
+    parser.add_argument("--output-dir", default=BATCH_CONFIG["output_dir"])
+    parser.add_argument("--format", choices=list(FORMATS), default=BATCH_CONFIG["format"])
+    parser.add_argument("--compress", action="store_true", default=BATCH_CONFIG["compress"],
+                        help="gzip CSV files (Parquet uses the gzip codec; Excel is already compressed)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONFIG["concurrency"])
+    parser.add_argument("--rate-limit", type=float, default=BATCH_CONFIG["rate_limit"],
+                        help="Model calls per second (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=BATCH_CONFIG["burst"])
+    parser.add_argument("--max-rows", type=int, default=BATCH_CONFIG["max_rows"], help="Rows kept per question")
+    parser.add_argument("--timeout", type=float, default=BATCH_CONFIG["query_timeout"], help="Seconds per query")
+    parser.add_argument("--retry-failed", action="store_true", help="Also rerun questions that failed before")
+    args = parser.parse_args()
+
+    try:
+        questions = read_questions(args.questions)
+    except ValueError as e:
+        print(f"Error reading {args.questions}: {e}")
+        sys.exit(2)
+    runner = BatchRunner(args.output_dir, args.format, args.concurrency, args.rate_limit, args.burst,
+                         args.max_rows, args.timeout, args.compress)
+    started = time.perf_counter()
+    try:
+        counts = runner.run(questions, retry_failed=args.retry_failed)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    print(f"\nDone in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{count:,} {status}" for status, count in sorted(counts.items())))
+    print(f"Manifest: {runner.manifest_path}")
+    if counts.get("error") or counts.get("cancelled"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
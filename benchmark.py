@@ -0,0 +1,381 @@
+"""
+Benchmark Runner - Times the dashboard and analytics queries across data scales
+
+Usage:
+    python benchmark.py                          # scales and iterations from BENCHMARK_CONFIG
+    python benchmark.py --scales 1 10 100 --iterations 30 --output bench.json
+    python benchmark.py --save-baseline          # record the current numbers as the baseline
+    python benchmark.py --suite aggregates --compare-duckdb
+
+Databases for each scale are generated once with insurance_db.py into
+BENCHMARK_CONFIG["data_dir"] and reused. Every scale is measured in its own
+subprocess so peak RSS belongs to that scale alone. The run exits with status
+1 when a query's p95 regresses past the configured threshold. With
+--compare-duckdb every scale is measured a second time with the DuckDB engine
+enabled (DB_CONFIG["duckdb"]) and the two runs are printed side by side.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from config import BENCHMARK_CONFIG
+
+# Queries below this p95 (seconds) are too fast to flag reliably
+NOISE_FLOOR = 0.002
+
+
+class BenchmarkQuery:
+    """One named query in a suite: the tables it reads and how to run it.
+
+    ``rollup_tables`` are the tables it reads instead while the rollups
+    (agents/rollups.py) are installed; None when it never uses them.
+    """
+
+    def __init__(self, name: str, tables: List[str], run: Callable[[Any], int],
+                 rollup_tables: Optional[List[str]] = None):
+        self.name = name
+        self.tables = tables
+        self.run = run
+        self.rollup_tables = rollup_tables
+
+
+def _kpis(analytics) -> int:
+    # Measure the real scan, not the KPI engine's cached snapshot
+    analytics.kpi_engine.invalidate()
+    return len(analytics.kpi_engine.get_stats())
+
+
+_orchestrator = None
+
+
+def _page(page: str) -> Callable[[Any], int]:
+    """Load a whole page through the query orchestrator, as the app does"""
+    def run(analytics) -> int:
+        global _orchestrator
+        if _orchestrator is None:
+            from agents.query_orchestrator import QueryOrchestrator
+            _orchestrator = QueryOrchestrator()
+        analytics.kpi_engine.invalidate()
+        load = _orchestrator.load_page(analytics, page)
+        return sum(len(load.get(name)) for name in load.tasks)
+    return run
+
+
+def _sql(query: str) -> Callable[[Any], int]:
+    """Run raw SQL through the DatabaseAgent, bypassing the rollup tables"""
+    def run(analytics) -> int:
+        return len(analytics.db_agent.execute_query(query)[0])
+    return run
+
+
+SUITES = {
+    "dashboard": [
+        BenchmarkQuery("dashboard_kpis", ["account", "policies", "claims"], _kpis,
+                       ["rollup_account_totals", "rollup_policies_by_type_status", "rollup_claims_by_status"]),
+        BenchmarkQuery("policy_distribution", ["policies"], lambda a: len(a.get_policy_distribution()),
+                       ["rollup_policies_by_type_status"]),
+        BenchmarkQuery("top_agents", ["agents", "policies"], lambda a: len(a.get_top_agents()),
+                       ["agents", "rollup_policies_by_agent"]),
+        BenchmarkQuery("claims_summary", ["claims"], lambda a: len(a.get_claims_summary()),
+                       ["rollup_claims_by_status"]),
+    ],
+    "analytics": [
+        BenchmarkQuery("revenue_by_policy_type", ["policies"], lambda a: len(a.get_revenue_by_policy_type()),
+                       ["rollup_policies_by_type_status"]),
+        BenchmarkQuery("policies_by_state", ["account", "policies"], lambda a: len(a.get_policies_by_state())),
+        BenchmarkQuery("claims_risk", ["policies", "claims"], lambda a: len(a.get_claims_risk())),
+    ],
+    "pages": [
+        BenchmarkQuery("dashboard_page", ["account", "agents", "policies", "claims"], _page("dashboard"),
+                       ["agents", "rollup_account_totals", "rollup_policies_by_type_status",
+                        "rollup_policies_by_agent", "rollup_claims_by_status"]),
+        # Only revenue_by_policy_type has a rollup; the other two still scan the base tables
+        BenchmarkQuery("analytics_page", ["account", "policies", "claims"], _page("analytics"),
+                       ["account", "policies", "claims", "rollup_policies_by_type_status"]),
+    ],
+    # Ad-hoc GROUP BY scans, the shape generated SQL takes (and the DuckDB engine routes)
+    "aggregates": [
+        BenchmarkQuery("payments_by_method", ["payments"], _sql(
+            "SELECT payment_method, status, COUNT(*) AS payments, SUM(amount) AS total "
+            "FROM payments GROUP BY payment_method, status ORDER BY total DESC")),
+        BenchmarkQuery("premium_by_state", ["account", "policies"], _sql(
+            "SELECT a.state, COUNT(p.policy_id) AS policies, SUM(p.premium_amount) AS premium "
+            "FROM account a JOIN policies p ON a.account_id = p.account_id GROUP BY a.state ORDER BY premium DESC")),
+        BenchmarkQuery("payments_by_policy_type", ["payments", "policies"], _sql(
+            "SELECT p.policy_type, COUNT(*) AS payments, AVG(pm.amount) AS avg_amount "
+            "FROM payments pm JOIN policies p ON p.policy_id = pm.policy_id "
+            "WHERE pm.status = 'Completed' GROUP BY p.policy_type ORDER BY p.policy_type")),
+    ],
+}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far in MB (a high-water mark, never falls)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 of the timings in seconds"""
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def database_path(scale: float, seed: int, indexes: bool = True) -> str:
+    suffix = "" if indexes else "_noidx"
+    return os.path.join(BENCHMARK_CONFIG["data_dir"], f"insurance_sf{scale:g}_seed{seed}{suffix}.db")
+
+
+def ensure_database(scale: float, seed: int, regenerate: bool = False, indexes: bool = True) -> str:
+    """Generate the database for a scale unless it already exists"""
+    path = database_path(scale, seed, indexes)
+    if os.path.exists(path) and not regenerate:
+        return path
+    from insurance_db import build_database
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    print(f"Generating scale {scale:g} database at {path}...")
+    build_database(path, scale=scale, seed=seed, summary=False, indexes=indexes)
+    return path
+
+
+def table_counts(path: str, rollups: bool = False) -> Dict[str, int]:
+    """Rows per table; the rollup_* summary tables only with ``rollups``"""
+    connection = sqlite3.connect(path)
+    try:
+        names = [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            + ("" if rollups else " AND name NOT LIKE 'rollup_%'")
+        )]
+        return {name: connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in names}
+    finally:
+        connection.close()
+
+
+def run_worker(suites: List[str], iterations: int, warmup: int) -> Dict[str, Any]:
+    """Time every query in the suites against the database named by SQLITE_DATABASE"""
+    from agents.analytics_agent import AnalyticsAgent
+    from agents.db_agent import DatabaseAgent
+    from config import DB_CONFIG
+
+    counts = table_counts(DB_CONFIG["sqlite"]["database"])
+    rss_before = peak_rss_mb()
+    db_agent = DatabaseAgent()
+    # Time the queries themselves, not result cache hits
+    db_agent.result_cache = None
+    if db_agent.engine is not None:
+        # Time queries against a ready copy, not the build
+        db_agent.engine.wait_ready()
+    analytics = AnalyticsAgent(db_agent)
+    use_rollups = analytics.rollups.available()
+    read_counts = table_counts(DB_CONFIG["sqlite"]["database"], rollups=True)
+
+    queries = {}
+    for suite in suites:
+        for query in SUITES[suite]:
+            for _ in range(warmup):
+                query.run(analytics)
+            timings = []
+            rows_returned = 0
+            rss_start = peak_rss_mb()
+            for _ in range(iterations):
+                started = time.perf_counter()
+                rows_returned = query.run(analytics)
+                timings.append(time.perf_counter() - started)
+
+            stats = percentiles(timings)
+            # Rows in the tables the query actually read: a rollup-backed query
+            # reads a few summary rows, not the base tables it stands in for
+            from_rollups = use_rollups and query.rollup_tables is not None
+            tables = query.rollup_tables if from_rollups else query.tables
+            rows_scanned = sum(read_counts.get(table, 0) for table in tables)
+            rss_end = peak_rss_mb()
+            queries[query.name] = {
+                "suite": suite,
+                "iterations": iterations,
+                "p50": round(stats["p50"], 6),
+                "p95": round(stats["p95"], 6),
+                "p99": round(stats["p99"], 6),
+                "mean": round(statistics.fmean(timings), 6),
+                "from_rollups": from_rollups,
+                "rows_scanned": rows_scanned,
+                "rows_returned": rows_returned,
+                "rows_per_sec": round(rows_scanned / stats["p50"]) if stats["p50"] else None,
+                # The process high-water mark after this query, and how far this query raised it
+                "process_peak_rss_mb": rss_end,
+                "peak_rss_growth_mb": round(rss_end - rss_start, 1) if rss_end is not None else None,
+            }
+
+    return {
+        "tables": counts,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "queries": queries,
+        "engine": db_agent.engine.stats() if db_agent.engine is not None else None,
+    }
+
+
+def run_scale(scale: float, seed: int, suites: List[str], iterations: int, warmup: int,
+              regenerate: bool = False, indexes: bool = True, duckdb: bool = False) -> Dict[str, Any]:
+    """Benchmark one scale in a fresh interpreter so memory numbers are isolated"""
+    path = ensure_database(scale, seed, regenerate, indexes)
+    env = dict(os.environ, SQLITE_DATABASE=os.path.abspath(path), DUCKDB_ENGINE="1" if duckdb else "0")
+    # Each scale keeps its own DuckDB copy beside its SQLite file
+    env.setdefault("DUCKDB_DATABASE", os.path.splitext(os.path.abspath(path))[0] + ".duckdb")
+    command = [sys.executable, os.path.abspath(__file__), "--worker",
+               "--suite", *suites, "--iterations", str(iterations), "--warmup", str(warmup)]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise Exception(f"Benchmark worker failed for scale {scale:g}: {completed.stderr.strip()}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["database"] = path
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """p95 changes against the baseline for every scale/query present in both"""
+    rows = []
+    for scale, result in current["results"].items():
+        base_scale = baseline.get("results", {}).get(scale)
+        if not base_scale:
+            continue
+        for name, stats in result["queries"].items():
+            base = base_scale["queries"].get(name)
+            if not base or not base.get("p95"):
+                continue
+            ratio = stats["p95"] / base["p95"]
+            rows.append({
+                "scale": scale,
+                "query": name,
+                "baseline_p95": base["p95"],
+                "p95": stats["p95"],
+                "change": ratio - 1,
+                "regression": ratio > 1 + threshold and stats["p95"] > NOISE_FLOOR,
+            })
+    return rows
+
+
+def print_duckdb_comparison(report: Dict[str, Any]):
+    for scale, result in report["duckdb"].items():
+        sqlite_queries = report["results"][scale]["queries"]
+        engine = result.get("engine") or {}
+        print(f"\nScale {scale}: SQLite vs DuckDB ({engine.get('routed', 0):,} queries routed, "
+              f"copy built in {engine.get('last_build_seconds') or 0:.1f}s, peak RSS {result['peak_rss_mb']} MB)")
+        print(f"  {'query':<24}{'sqlite p50':>12}{'duckdb p50':>12}{'sqlite p95':>12}{'duckdb p95':>12}{'speedup':>9}")
+        for name, stats in result["queries"].items():
+            base = sqlite_queries[name]
+            speedup = f"{base['p50'] / stats['p50']:.1f}x" if stats["p50"] else "-"
+            print(f"  {name:<24}{base['p50'] * 1000:>10.2f}ms{stats['p50'] * 1000:>10.2f}ms"
+                  f"{base['p95'] * 1000:>10.2f}ms{stats['p95'] * 1000:>10.2f}ms{speedup:>9}")
+
+
+def print_report(report: Dict[str, Any]):
+    for scale, result in report["results"].items():
+        total_rows = sum(result["tables"].values())
+        print(f"\nScale {scale} ({total_rows:,} rows, peak RSS {result['peak_rss_mb']} MB)")
+        print(f"  {'query':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rows read/s':>16}  reads")
+        for name, stats in result["queries"].items():
+            rows_per_sec = f"{stats['rows_per_sec']:,}" if stats["rows_per_sec"] else "-"
+            print(f"  {name:<24}{stats['p50'] * 1000:>10.2f}{stats['p95'] * 1000:>10.2f}"
+                  f"{stats['p99'] * 1000:>10.2f}{rows_per_sec:>16}  {'rollups' if stats.get('from_rollups') else 'tables'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard and analytics queries")
+    parser.add_argument("--scales", type=float, nargs="+", default=BENCHMARK_CONFIG["scales"])
+    parser.add_argument("--suite", nargs="+", choices=sorted(SUITES), default=sorted(SUITES))
+    parser.add_argument("--seed", type=int, default=BENCHMARK_CONFIG["seed"])
+    parser.add_argument("--iterations", type=int, default=BENCHMARK_CONFIG["iterations"])
+    parser.add_argument("--warmup", type=int, default=BENCHMARK_CONFIG["warmup"])
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=BENCHMARK_CONFIG["baseline_path"])
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_CONFIG["regression_threshold"])
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the scale databases first")
+    parser.add_argument("--no-indexes", action="store_true", help="Benchmark databases without the default indexes")
+    parser.add_argument("--compare-duckdb", action="store_true",
+                        help="Rerun every scale with the DuckDB engine and compare p50/p95")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.suite, args.iterations, args.warmup)))
+        return
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "suites": args.suite,
+        "indexes": not args.no_indexes,
+        "results": {},
+    }
+    for scale in args.scales:
+        print(f"Benchmarking scale {scale:g}...")
+        report["results"][f"{scale:g}"] = run_scale(
+            scale, args.seed, args.suite, args.iterations, args.warmup, args.regenerate, not args.no_indexes
+        )
+        if args.compare_duckdb:
+            print(f"Benchmarking scale {scale:g} with DuckDB...")
+            report.setdefault("duckdb", {})[f"{scale:g}"] = run_scale(
+                scale, args.seed, args.suite, args.iterations, args.warmup, False, not args.no_indexes, duckdb=True
+            )
+    print_report(report)
+    if "duckdb" in report:
+        print_duckdb_comparison(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        changes = compare(report, baseline, args.threshold)
+        if changes:
+            print(f"\nComparison with {args.baseline} (p95, threshold +{args.threshold:.0%})")
+            for row in changes:
+                flag = "  REGRESSION" if row["regression"] else ""
+                print(f"  sf{row['scale']:<6} {row['query']:<24}{row['baseline_p95'] * 1000:>9.2f} ms"
+                      f" -> {row['p95'] * 1000:>9.2f} ms ({row['change']:+.0%}){flag}")
+        regressions = [row for row in changes if row["regression"]]
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond +{args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,18 @@ load_dotenv()
 DB_CONFIG = {
     "type": "sqlite",  # Options: "sqlite", "databricks", "postgresql", "mysql"
     "sqlite": {
-        "database": "insurance.db"
+        "database": os.getenv("SQLITE_DATABASE", "insurance.db")
+    },
+    # Columnar engine for aggregate-heavy reads (SQLite only, see agents/duckdb_engine.py)
+    "duckdb": {
+        "enabled": os.getenv("DUCKDB_ENGINE", "0") == "1",
+        "mode": os.getenv("DUCKDB_MODE", "copy"),  # "copy" = columnar copy of the SQLite file, "attach" = read it through DuckDB's sqlite extension
+        "database": os.getenv("DUCKDB_DATABASE", ".cache/insurance.duckdb"),  # Where the copy is kept
+        "min_rows": 100000,           # Queries over smaller tables stay on SQLite
+        "min_refresh_interval": 30,   # Seconds between copy rebuilds while writes keep arriving
+        "batch_size": 50000,          # Rows per batch while copying
+        "memory_limit": "1GB",
+        "threads": None               # DuckDB worker threads (None = one per core)
     },
     "databricks": {
         "server_hostname": os.getenv("DATABRICKS_SERVER_HOSTNAME"),
@@ -23,12 +34,222 @@ DB_CONFIG = {
     }
 }
 
+# Connection Pool Configuration
+POOL_CONFIG = {
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "8")),  # Max connections checked out at once
+    "idle_timeout": 300,           # Seconds before an idle connection is closed
+    "health_check_interval": 60,   # Ping connections idle longer than this before reuse
+    "acquire_timeout": 30          # Seconds to wait for a free connection
+}
+
+# In-memory Read Snapshot (SQLite, see agents/memory_snapshot.py)
+SNAPSHOT_CONFIG = {
+    "enabled": os.getenv("SQLITE_SNAPSHOT", "0") == "1",  # Serve read-only queries from a memory copy
+    "max_bytes": 512 * 1024 * 1024,  # Keep reading from disk when the database file is larger
+    "min_refresh_interval": 5        # Seconds between rebuilds while writes keep arriving
+}
+
+# Query Execution Configuration
+QUERY_CONFIG = {
+    "batch_size": 1000,    # Rows per fetchmany() batch when streaming results
+    "max_rows": 100000,    # Row cap for interactive queries (None = unlimited)
+    "timeout": 120         # Seconds before a query is interrupted (None = no deadline)
+}
+
+# Parallel Page Loads (see agents/query_orchestrator.py)
+PARALLEL_CONFIG = {
+    "enabled": True,
+    "max_workers": POOL_CONFIG["max_size"],  # Threads shared by every page; more would wait for connections
+    "default_concurrency": 4,                # Queries in flight at once for a page not listed below
+    "page_concurrency": {
+        "dashboard": 4,
+        "analytics": 3
+    }
+}
+
+# Query Guard Configuration (checks generated SQL before it runs)
+GUARD_CONFIG = {
+    "enabled": True,
+    "row_limit": QUERY_CONFIG["max_rows"],  # LIMIT injected into, or tightened on, every query
+    "cost_budget": 5_000_000,               # Estimated rows visited before a query needs attention
+    "over_budget": "confirm",               # "confirm" asks the user, "reject" refuses outright
+    "max_cost": 500_000_000                 # Always refused above this estimate
+}
+
+# Index Configuration (SQLite)
+INDEX_CONFIG = {
+    "create_defaults": True,     # Create the default covering indexes at startup if missing
+    "advisor": {
+        "enabled": True,         # EXPLAIN QUERY PLAN every distinct query and collect scans
+        "auto_create": False,    # Build recommended indexes automatically (in the background)
+        "min_occurrences": 3,    # Times a recommendation must be seen before auto-creating it
+        "min_table_rows": 5000,  # Ignore scans of tables smaller than this
+        "min_speedup": 1.2,      # Drop an auto-created index that doesn't speed its query up this much
+        "timing_runs": 3,        # Best-of-N runs for before/after timings
+        "timing_timeout": 10,    # Seconds all runs of one timing may take before the query is interrupted
+        "version_check_interval": 5  # Seconds between schema/data version checks for cached plans and row counts
+    }
+}
+
+# Rollup Configuration (SQLite summary tables behind the dashboard charts, see agents/rollups.py)
+ROLLUP_CONFIG = {
+    "enabled": True,             # Read dashboard aggregates from the rollup tables when installed
+    "install_on_startup": True   # Build missing rollups and their triggers when the app starts
+}
+
+# Schema Catalog Configuration
+SCHEMA_CONFIG = {
+    "cache_path": ".cache/schema_catalog.json",  # On-disk copy so restarts skip introspection
+    "check_interval": 5,                         # Seconds between schema fingerprint checks
+    "row_estimate_ttl": 3600,                    # Seconds before row estimates are refreshed
+    "pruning": {
+        "enabled": True,   # Only send the tables relevant to each question
+        "max_tables": 5,   # Best matches kept before adding join-path tables
+        # Question words that should pull in a table whose name they don't contain
+        "aliases": {
+            "customer": "account",
+            "client": "account",
+            "policyholder": "account",
+            "insurance": "policies",
+            "premium": "policies",
+            "coverage": "policies",
+            "broker": "agents",
+            "commission": "agents",
+            "paid": "payments",
+            "billing": "payments"
+        }
+    }
+}
+
+# Few-shot Example Configuration (see agents/example_store.py)
+EXAMPLE_CONFIG = {
+    "enabled": True,
+    "path": os.getenv("SQL_EXAMPLE_PATH", ".cache/sql_examples.db"),
+    "top_k": 3,                      # Examples sent with each question
+    "min_score": 0.2,                # Weaker matches are left out (seed examples when none qualify)
+    "max_examples": 100000,          # Oldest examples are dropped beyond this
+    "max_postings_per_term": 500     # Best-weighted examples read per query term (bounds lookup time)
+}
+
+# Cache Configuration
+CACHE_CONFIG = {
+    "kpi": {
+        "version_check_interval": 2  # Seconds between data-version checks for dashboard KPIs
+    },
+    "results": {
+        "enabled": True,
+        "max_bytes": 64 * 1024 * 1024,       # Memory budget for cached query results (LRU beyond it)
+        "max_entry_bytes": 8 * 1024 * 1024,  # Larger results are never cached
+        "version_check_interval": 2          # Seconds a Databricks table version is trusted (SQLite checks every lookup)
+    },
+    "translation": {
+        "path": os.getenv("SQL_CACHE_PATH", ".cache/sql_translations.db"),
+        "max_entries": 5000,             # LRU eviction beyond this many questions
+        "ttl_seconds": 7 * 24 * 3600     # Regenerate translations older than a week
+    },
+    "templates": {
+        "enabled": True,
+        "path": os.getenv("SQL_TEMPLATE_PATH", ".cache/sql_templates.db"),
+        "max_entries": 5000,
+        "max_distinct_values": 100,      # Text columns with more distinct values aren't treated as entities
+        "value_refresh_interval": 600,   # Seconds before the entity values are read again (in the background)
+        "value_sample_rows": 50000       # Rows per table read when collecting entity values
+    }
+}
+
+# Benchmark Configuration (see benchmark.py)
+BENCHMARK_CONFIG = {
+    "scales": [1, 10, 100],                     # insurance_db.py --scale values to benchmark
+    "seed": 42,
+    "data_dir": ".cache/bench",                 # Generated databases are kept here between runs
+    "iterations": 20,                           # Timed runs per query
+    "warmup": 2,                                # Untimed runs per query (page cache, statements)
+    "baseline_path": "benchmarks/baseline.json",
+    "regression_threshold": 0.25                # Fail when p95 is this much slower than baseline
+}
+
+# Batch Configuration (see batch_query.py)
+BATCH_CONFIG = {
+    "output_dir": "batch_results",
+    "format": "parquet",         # "parquet", "csv" or "xlsx"
+    "compress": False,           # gzip CSV files / gzip-coded Parquet
+    "concurrency": 4,            # Questions in flight (each holds a pooled connection while it runs)
+    "rate_limit": 2.0,           # Model calls per second across all workers (cache hits are free)
+    "burst": 4,                  # Calls allowed back to back before the rate applies
+    "max_rows": None,            # Rows written per question (None = the full result)
+    "query_timeout": 300         # Seconds per query
+}
+
+# Result DataFrame Types (see agents/frame_types.py)
+FRAME_CONFIG = {
+    "enabled": True,
+    "category_columns": ["status", "policy_type", "state", "payment_method", "claim_type", "gender"],
+    "max_categories": 1000,      # Other text columns become categoricals with at most this many distinct values...
+    "max_category_ratio": 0.5,   # ...and no more than this fraction of the rows
+    "float32_decimals": None,    # Opt in: float32 when every value is unchanged at this many decimals (None = keep float64)
+    # Float columns whose name contains one of these always stay float64 (money and aggregates)
+    "float64_columns": ["amount", "premium", "coverage", "price", "cost", "balance", "total", "sum", "avg"],
+    "arrow_strings": True,       # Remaining text as pyarrow-backed strings instead of Python objects
+    "report_memory": True        # Measure each result before and after conversion
+}
+
+# Export Configuration (see agents/export_agent.py)
+EXPORT_CONFIG = {
+    "dir": ".cache/exports",
+    "batch_size": 10000,                       # Rows per fetchmany() while exporting
+    "parquet_row_group_size": 100000,          # Rows buffered per Parquet row group (bounds memory)
+    "parquet_compression": "snappy",           # Codec when gzip isn't asked for
+    "gzip_level": 6,
+    "xlsx_sheet_rows": 1_000_000,              # Rows per worksheet before starting another (Excel stops at 1,048,576)
+    "count_rows": True,                        # COUNT(*) first so the progress bar can show a percentage
+    "progress_interval": 0.5,                  # Seconds between progress updates
+    "timeout": None,                           # Seconds per export (None = no deadline)
+    "download_max_bytes": 200 * 1024 * 1024,   # Larger files stay on the server instead of going through the browser
+    "max_age": 24 * 3600                       # Exports older than this are deleted
+}
+
+# Metrics Configuration (see agents/metrics.py)
+METRICS_CONFIG = {
+    "enabled": True,
+    "prometheus_path": ".cache/metrics.prom",  # Text export for node_exporter's textfile collector (None = off)
+    "log_path": ".cache/metrics.jsonl",        # One JSON line per traced question / page load (None = off)
+    "export_interval": 10,                     # Seconds between rewrites of the text export
+    "http_port": int(os.getenv("METRICS_PORT", "0")) or None,  # Serve /metrics on this port
+    "sidebar_panel": True,                     # Show the last query's stage breakdown in the sidebar
+    "buckets": [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+}
+
+# Token Accounting Configuration (see agents/token_accounting.py)
+TOKEN_CONFIG = {
+    "enabled": True,
+    "path": os.getenv("TOKEN_LEDGER_PATH", ".cache/token_usage.db"),
+    "budgets": {                          # Exceeding one logs an alert (None = no budget)
+        "prompt_tokens_per_call": 4000,
+        "latency_per_call": 10,           # Seconds
+        "tokens_per_session": 100000,
+        "tokens_per_day": 2000000
+    }
+}
+
 # Gemini AI Configuration
 GEMINI_CONFIG = {
     "api_key": os.getenv("GOOGLE_API_KEY"),
     "model": "gemini-2.5-flash"
 }
 
+# LLM Gateway Configuration
+LLM_CONFIG = {
+    "backend": os.getenv("LLM_BACKEND", "gemini"),  # "gemini" or "stub" for load tests
+    "stub_url": os.getenv("LLM_STUB_URL", "http://127.0.0.1:8765/generate"),
+    "max_concurrency": 4,    # Model calls in flight across all sessions
+    "timeout": 60,           # Overall deadline per generation, retries included (seconds)
+    "attempt_timeout": 30,   # Deadline for a single attempt (seconds)
+    "max_retries": 2,        # Extra attempts after a failure or timeout
+    "backoff_base": 0.5,     # Jittered exponential backoff between retries (seconds)
+    "backoff_max": 8,
+    "hedge_after": None      # Seconds before firing a duplicate request (None = no hedging)
+}
+
 # App Configuration
 APP_CONFIG = {
     "title": "🔍 Smart Data Analytics Assistant",
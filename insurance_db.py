@@ -1,368 +1,569 @@
 """
 Insurance Database Creation Script
-Creates a comprehensive insurance database with 5 related tables and sample data
-"""
-
-import sqlite3
-from datetime import datetime, timedelta
-import random
+Generates a synthetic insurance database with 5 related tables at a chosen scale
 
-print("="*70)
-print("Creating Insurance Database...")
-print("="*70)
-
-## Connect to SQLite
-connection = sqlite3.connect("insurance.db")
-cursor = connection.cursor()
-
-## Drop existing tables if they exist
-print("\n[1/6] Dropping existing tables (if any)...")
-cursor.execute('DROP TABLE IF EXISTS claims')
-cursor.execute('DROP TABLE IF EXISTS payments')
-cursor.execute('DROP TABLE IF EXISTS policies')
-cursor.execute('DROP TABLE IF EXISTS account')
-cursor.execute('DROP TABLE IF EXISTS agents')
-print("✓ Existing tables dropped")
-
-## Create Tables
-print("\n[2/6] Creating database schema...")
-
-# 1. ACCOUNTS table
-cursor.execute('''
-CREATE TABLE account (
-    account_id INTEGER PRIMARY KEY,
-    name VARCHAR(100),
-    email VARCHAR(100),
-    phone VARCHAR(15),
-    address VARCHAR(200),
-    city VARCHAR(50),
-    state VARCHAR(50),
-    zip_code VARCHAR(10),
-    date_of_birth DATE,
-    gender VARCHAR(10)
-)
-''')
-print("✓ Created ACCOUNTS table")
-
-# 2. AGENTS table
-cursor.execute('''
-CREATE TABLE agents (
-    agent_id INTEGER PRIMARY KEY,
-    name VARCHAR(100),
-    email VARCHAR(100),
-    phone VARCHAR(15),
-    city VARCHAR(50),
-    commission_rate DECIMAL(5,2),
-    join_date DATE,
-    status VARCHAR(20)
-)
-''')
-print("✓ Created AGENTS table")
-
-# 3. POLICIES table
-cursor.execute('''
-CREATE TABLE policies (
-    policy_id INTEGER PRIMARY KEY,
-    account_id INTEGER,
-    agent_id INTEGER,
-    policy_type VARCHAR(50),
-    policy_number VARCHAR(50),
-    start_date DATE,
-    end_date DATE,
-    premium_amount DECIMAL(10,2),
-    coverage_amount DECIMAL(12,2),
-    status VARCHAR(20),
-    FOREIGN KEY (account_id) REFERENCES account(account_id),
-    FOREIGN KEY (agent_id) REFERENCES agents(agent_id)
-)
-''')
-print("✓ Created POLICIES table")
-
-# 4. CLAIMS table
-cursor.execute('''
-CREATE TABLE claims (
-    claim_id INTEGER PRIMARY KEY,
-    policy_id INTEGER,
-    account_id INTEGER,
-    claim_number VARCHAR(50),
-    claim_date DATE,
-    claim_amount DECIMAL(10,2),
-    approved_amount DECIMAL(10,2),
-    claim_type VARCHAR(50),
-    status VARCHAR(20),
-    settlement_date DATE,
-    FOREIGN KEY (policy_id) REFERENCES policies(policy_id),
-    FOREIGN KEY (account_id) REFERENCES account(account_id)
-)
-''')
-print("✓ Created CLAIMS table")
-
-# 5. PAYMENTS table
-cursor.execute('''
-CREATE TABLE payments (
-    payment_id INTEGER PRIMARY KEY,
-    policy_id INTEGER,
-    account_id INTEGER,
-    payment_date DATE,
-    amount DECIMAL(10,2),
-    payment_method VARCHAR(30),
-    status VARCHAR(20),
-    FOREIGN KEY (policy_id) REFERENCES policies(policy_id),
-    FOREIGN KEY (account_id) REFERENCES account(account_id)
-)
-''')
-print("✓ Created PAYMENTS table")
-
-## Insert Sample Data
-print("\n[3/6] Inserting sample data...")
-
-# Insert Accounts
-accounts_data = [
-    (1, 'John Smith', 'john.smith@email.com', '555-0101', '123 Main St', 'New York', 'NY', '10001', '1985-03-15', 'Male'),
-    (2, 'Sarah Johnson', 'sarah.j@email.com', '555-0102', '456 Oak Ave', 'Los Angeles', 'CA', '90001', '1990-07-22', 'Female'),
-    (3, 'Michael Brown', 'michael.b@email.com', '555-0103', '789 Pine Rd', 'Chicago', 'IL', '60601', '1978-11-30', 'Male'),
-    (4, 'Emily Davis', 'emily.d@email.com', '555-0104', '321 Elm St', 'Houston', 'TX', '77001', '1988-05-18', 'Female'),
-    (5, 'David Wilson', 'david.w@email.com', '555-0105', '654 Maple Dr', 'Phoenix', 'AZ', '85001', '1975-09-25', 'Male'),
-    (6, 'Lisa Anderson', 'lisa.a@email.com', '555-0106', '987 Cedar Ln', 'Philadelphia', 'PA', '19101', '1992-12-08', 'Female'),
-    (7, 'James Taylor', 'james.t@email.com', '555-0107', '147 Birch Way', 'San Antonio', 'TX', '78201', '1983-04-14', 'Male'),
-    (8, 'Jennifer Martinez', 'jennifer.m@email.com', '555-0108', '258 Spruce Ct', 'San Diego', 'CA', '92101', '1995-08-03', 'Female'),
-    (9, 'Robert Garcia', 'robert.g@email.com', '555-0109', '369 Willow St', 'Dallas', 'TX', '75201', '1980-01-20', 'Male'),
-    (10, 'Maria Rodriguez', 'maria.r@email.com', '555-0110', '741 Ash Blvd', 'San Jose', 'CA', '95101', '1987-06-11', 'Female'),
-    (11, 'Christopher Lee', 'chris.lee@email.com', '555-0111', '852 Oak Park', 'Austin', 'TX', '78701', '1991-02-28', 'Male'),
-    (12, 'Amanda White', 'amanda.w@email.com', '555-0112', '963 Pine Valley', 'Jacksonville', 'FL', '32099', '1986-09-17', 'Female'),
-    (13, 'Daniel Harris', 'daniel.h@email.com', '555-0113', '159 Maple Grove', 'San Francisco', 'CA', '94102', '1979-12-05', 'Male'),
-    (14, 'Jessica Clark', 'jessica.c@email.com', '555-0114', '357 Cedar Ridge', 'Columbus', 'OH', '43085', '1993-04-23', 'Female'),
-    (15, 'Matthew Lewis', 'matthew.l@email.com', '555-0115', '753 Birch Lane', 'Indianapolis', 'IN', '46201', '1984-08-30', 'Male')
-]
+Usage:
+    python insurance_db.py                       # scale 1  (~10k rows)
+    python insurance_db.py --scale 100           # ~1M rows
+    python insurance_db.py --scale 1000 --seed 7 --db insurance_sf1000.db   # ~10M rows
 
-cursor.executemany('INSERT INTO account VALUES (?,?,?,?,?,?,?,?,?,?)', accounts_data)
-print(f"✓ Inserted {len(accounts_data)} accounts")
-
-# Insert Agents
-agents_data = [
-    (1, 'Alice Cooper', 'alice.cooper@insurance.com', '555-1001', 'New York', 5.5, '2018-01-15', 'Active'),
-    (2, 'Bob Miller', 'bob.miller@insurance.com', '555-1002', 'Los Angeles', 6.0, '2019-03-20', 'Active'),
-    (3, 'Carol White', 'carol.white@insurance.com', '555-1003', 'Chicago', 5.0, '2020-06-10', 'Active'),
-    (4, 'Daniel Lee', 'daniel.lee@insurance.com', '555-1004', 'Houston', 5.5, '2017-11-05', 'Active'),
-    (5, 'Eva Martinez', 'eva.martinez@insurance.com', '555-1005', 'Phoenix', 6.5, '2021-02-18', 'Active'),
-    (6, 'Frank Thompson', 'frank.t@insurance.com', '555-1006', 'Philadelphia', 5.0, '2019-08-12', 'Active'),
-    (7, 'Grace Kim', 'grace.kim@insurance.com', '555-1007', 'San Diego', 6.0, '2020-01-25', 'Active')
-]
+Every scale unit adds 10 agents, 1,000 accounts, 1,500 policies, 450 claims
+and 7,500 payments. The same seed and scale always produce the same data.
+"""
 
-cursor.executemany('INSERT INTO agents VALUES (?,?,?,?,?,?,?,?)', agents_data)
-print(f"✓ Inserted {len(agents_data)} agents")
-
-# Insert Policies
-policies_data = [
-    (1, 1, 1, 'Life Insurance', 'POL-2023-001', '2023-01-15', '2033-01-15', 1200.00, 500000.00, 'Active'),
-    (2, 2, 2, 'Auto Insurance', 'POL-2023-002', '2023-02-20', '2024-02-20', 800.00, 50000.00, 'Active'),
-    (3, 3, 3, 'Health Insurance', 'POL-2023-003', '2023-03-10', '2024-03-10', 450.00, 100000.00, 'Active'),
-    (4, 4, 4, 'Home Insurance', 'POL-2023-004', '2023-04-05', '2024-04-05', 1500.00, 300000.00, 'Active'),
-    (5, 5, 5, 'Life Insurance', 'POL-2023-005', '2023-05-12', '2033-05-12', 1000.00, 400000.00, 'Active'),
-    (6, 6, 1, 'Auto Insurance', 'POL-2023-006', '2023-06-18', '2024-06-18', 900.00, 60000.00, 'Active'),
-    (7, 7, 2, 'Health Insurance', 'POL-2023-007', '2023-07-22', '2024-07-22', 500.00, 120000.00, 'Active'),
-    (8, 8, 3, 'Home Insurance', 'POL-2023-008', '2023-08-30', '2024-08-30', 1600.00, 350000.00, 'Active'),
-    (9, 9, 4, 'Life Insurance', 'POL-2023-009', '2023-09-15', '2033-09-15', 1100.00, 450000.00, 'Active'),
-    (10, 10, 5, 'Auto Insurance', 'POL-2023-010', '2023-10-20', '2024-10-20', 850.00, 55000.00, 'Active'),
-    (11, 1, 2, 'Health Insurance', 'POL-2023-011', '2023-11-05', '2024-11-05', 400.00, 90000.00, 'Active'),
-    (12, 3, 1, 'Auto Insurance', 'POL-2023-012', '2023-12-10', '2024-12-10', 750.00, 45000.00, 'Expired'),
-    (13, 11, 6, 'Life Insurance', 'POL-2024-013', '2024-01-08', '2034-01-08', 1150.00, 425000.00, 'Active'),
-    (14, 12, 7, 'Auto Insurance', 'POL-2024-014', '2024-01-15', '2025-01-15', 825.00, 52000.00, 'Active'),
-    (15, 13, 1, 'Home Insurance', 'POL-2024-015', '2024-01-22', '2025-01-22', 1550.00, 325000.00, 'Active'),
-    (16, 14, 2, 'Health Insurance', 'POL-2024-016', '2024-02-01', '2025-02-01', 475.00, 110000.00, 'Active'),
-    (17, 15, 3, 'Life Insurance', 'POL-2024-017', '2024-02-10', '2034-02-10', 1075.00, 475000.00, 'Active'),
-    (18, 2, 4, 'Home Insurance', 'POL-2024-018', '2024-02-15', '2025-02-15', 1450.00, 280000.00, 'Active'),
-    (19, 5, 5, 'Auto Insurance', 'POL-2024-019', '2024-03-01', '2025-03-01', 875.00, 58000.00, 'Active'),
-    (20, 8, 6, 'Health Insurance', 'POL-2024-020', '2024-03-12', '2025-03-12', 525.00, 125000.00, 'Active')
+import argparse
+import math
+import random
+import sqlite3
+import time
+from array import array
+from datetime import date, timedelta
+
+from agents.index_advisor import create_default_indexes
+from agents.rollups import drop_rollups, install_rollups
+
+# Rows generated per unit of --scale
+ROWS_PER_SCALE = {
+    "agents": 10,
+    "account": 1000,
+    "policies": 1500,
+    "claims": 450,
+    "payments": 7500,
+}
+
+BATCH_SIZE = 50000
+
+# Reference "today" so generated statuses don't depend on when the script runs
+REFERENCE_DATE = date(2025, 6, 30)
+HISTORY_START = date(2016, 1, 1)
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Christopher", "Lisa", "Daniel", "Nancy", "Matthew", "Betty", "Anthony", "Margaret", "Mark", "Sandra",
+    "Donald", "Ashley", "Steven", "Emily", "Andrew", "Donna", "Paul", "Michelle", "Joshua", "Carol",
+    "Kenneth", "Amanda", "Kevin", "Melissa", "Brian", "Deborah", "George", "Stephanie", "Timothy", "Maria",
 ]
-
-cursor.executemany('INSERT INTO policies VALUES (?,?,?,?,?,?,?,?,?,?)', policies_data)
-print(f"✓ Inserted {len(policies_data)} policies")
-
-# Insert Claims
-claims_data = [
-    (1, 2, 2, 'CLM-2023-001', '2023-07-15', 5000.00, 4500.00, 'Auto Accident', 'Approved', '2023-08-01'),
-    (2, 3, 3, 'CLM-2023-002', '2023-08-20', 2500.00, 2500.00, 'Medical', 'Approved', '2023-09-05'),
-    (3, 4, 4, 'CLM-2023-003', '2023-09-10', 15000.00, 12000.00, 'Fire Damage', 'Approved', '2023-10-15'),
-    (4, 6, 6, 'CLM-2023-004', '2023-10-25', 3000.00, 3000.00, 'Auto Theft', 'Approved', '2023-11-10'),
-    (5, 7, 7, 'CLM-2023-005', '2023-11-15', 1800.00, 1800.00, 'Medical', 'Approved', '2023-12-01'),
-    (6, 8, 8, 'CLM-2024-006', '2024-01-20', 8000.00, 6500.00, 'Water Damage', 'Approved', '2024-02-10'),
-    (7, 10, 10, 'CLM-2024-007', '2024-02-14', 4200.00, 0.00, 'Auto Accident', 'Rejected', None),
-    (8, 11, 1, 'CLM-2024-008', '2024-03-05', 3500.00, None, 'Medical', 'Pending', None),
-    (9, 14, 12, 'CLM-2024-009', '2024-03-18', 2800.00, 2800.00, 'Auto Collision', 'Approved', '2024-04-02'),
-    (10, 16, 14, 'CLM-2024-010', '2024-04-10', 1500.00, None, 'Medical', 'Pending', None),
-    (11, 18, 2, 'CLM-2024-011', '2024-04-25', 9500.00, 8000.00, 'Storm Damage', 'Approved', '2024-05-15'),
-    (12, 20, 8, 'CLM-2024-012', '2024-05-08', 2200.00, 2200.00, 'Medical', 'Approved', '2024-05-22')
+FEMALE_NAMES = set(FIRST_NAMES[1::2])
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts",
 ]
-
-cursor.executemany('INSERT INTO claims VALUES (?,?,?,?,?,?,?,?,?,?)', claims_data)
-print(f"✓ Inserted {len(claims_data)} claims")
-
-# Insert Payments
-payments_data = [
-    (1, 1, 1, '2023-01-15', 1200.00, 'Credit Card', 'Completed'),
-    (2, 2, 2, '2023-02-20', 800.00, 'Bank Transfer', 'Completed'),
-    (3, 3, 3, '2023-03-10', 450.00, 'Debit Card', 'Completed'),
-    (4, 4, 4, '2023-04-05', 1500.00, 'Check', 'Completed'),
-    (5, 5, 5, '2023-05-12', 1000.00, 'Credit Card', 'Completed'),
-    (6, 6, 6, '2023-06-18', 900.00, 'Bank Transfer', 'Completed'),
-    (7, 7, 7, '2023-07-22', 500.00, 'Credit Card', 'Completed'),
-    (8, 8, 8, '2023-08-30', 1600.00, 'Debit Card', 'Completed'),
-    (9, 9, 9, '2023-09-15', 1100.00, 'Bank Transfer', 'Completed'),
-    (10, 10, 10, '2023-10-20', 850.00, 'Credit Card', 'Completed'),
-    (11, 1, 1, '2024-01-15', 1200.00, 'Credit Card', 'Completed'),
-    (12, 2, 2, '2024-02-20', 800.00, 'Bank Transfer', 'Failed'),
-    (13, 3, 3, '2024-03-10', 450.00, 'Debit Card', 'Pending'),
-    (14, 13, 11, '2024-01-08', 1150.00, 'Credit Card', 'Completed'),
-    (15, 14, 12, '2024-01-15', 825.00, 'Bank Transfer', 'Completed'),
-    (16, 15, 13, '2024-01-22', 1550.00, 'Credit Card', 'Completed'),
-    (17, 16, 14, '2024-02-01', 475.00, 'Debit Card', 'Completed'),
-    (18, 17, 15, '2024-02-10', 1075.00, 'Bank Transfer', 'Completed'),
-    (19, 18, 2, '2024-02-15', 1450.00, 'Credit Card', 'Completed'),
-    (20, 19, 5, '2024-03-01', 875.00, 'Check', 'Completed'),
-    (21, 20, 8, '2024-03-12', 525.00, 'Credit Card', 'Completed'),
-    (22, 11, 1, '2024-04-05', 400.00, 'Credit Card', 'Failed'),
-    (23, 13, 11, '2024-05-08', 1150.00, 'Bank Transfer', 'Pending')
+STREET_NAMES = ["Main St", "Oak Ave", "Pine Rd", "Elm St", "Maple Dr", "Cedar Ln", "Birch Way", "Spruce Ct",
+                "Willow St", "Ash Blvd", "Park Ave", "Lake Rd", "Hill St", "River Rd", "Sunset Blvd"]
+
+# (state, weight ~ population share, cities, zip prefix)
+STATES = [
+    ("CA", 39, ["Los Angeles", "San Diego", "San Jose", "San Francisco", "Sacramento"], "9"),
+    ("TX", 30, ["Houston", "San Antonio", "Dallas", "Austin", "Fort Worth"], "7"),
+    ("FL", 22, ["Jacksonville", "Miami", "Tampa", "Orlando"], "3"),
+    ("NY", 20, ["New York", "Buffalo", "Rochester", "Albany"], "1"),
+    ("PA", 13, ["Philadelphia", "Pittsburgh", "Allentown"], "1"),
+    ("IL", 13, ["Chicago", "Aurora", "Naperville"], "6"),
+    ("OH", 12, ["Columbus", "Cleveland", "Cincinnati"], "4"),
+    ("GA", 11, ["Atlanta", "Augusta", "Savannah"], "3"),
+    ("NC", 11, ["Charlotte", "Raleigh", "Greensboro"], "2"),
+    ("MI", 10, ["Detroit", "Grand Rapids", "Lansing"], "4"),
+    ("NJ", 9, ["Newark", "Jersey City", "Paterson"], "0"),
+    ("VA", 9, ["Virginia Beach", "Richmond", "Norfolk"], "2"),
+    ("WA", 8, ["Seattle", "Spokane", "Tacoma"], "9"),
+    ("AZ", 7, ["Phoenix", "Tucson", "Mesa"], "8"),
+    ("MA", 7, ["Boston", "Worcester", "Springfield"], "0"),
+    ("TN", 7, ["Nashville", "Memphis", "Knoxville"], "3"),
+    ("IN", 7, ["Indianapolis", "Fort Wayne", "Evansville"], "4"),
+    ("CO", 6, ["Denver", "Colorado Springs", "Aurora"], "8"),
+    ("MN", 6, ["Minneapolis", "Saint Paul", "Rochester"], "5"),
+    ("OR", 4, ["Portland", "Salem", "Eugene"], "9"),
 ]
 
-cursor.executemany('INSERT INTO payments VALUES (?,?,?,?,?,?,?)', payments_data)
-print(f"✓ Inserted {len(payments_data)} payments")
-
-## Commit changes
-connection.commit()
-print("\n[4/6] Committed all data to database")
-
-## Generate and display statistics
-print("\n[5/6] Generating database statistics...")
-print("\n" + "="*70)
-print("DATABASE SUMMARY")
-print("="*70)
-
-# Table counts
-cursor.execute("SELECT COUNT(*) FROM account")
-accounts_count = cursor.fetchone()[0]
-print(f"📊 Total Accounts:       {accounts_count:>4}")
-
-cursor.execute("SELECT COUNT(*) FROM agents")
-agents_count = cursor.fetchone()[0]
-print(f"👥 Total Agents:          {agents_count:>4}")
-
-cursor.execute("SELECT COUNT(*) FROM policies")
-policies_count = cursor.fetchone()[0]
-print(f"📋 Total Policies:        {policies_count:>4}")
-
-cursor.execute("SELECT COUNT(*) FROM claims")
-claims_count = cursor.fetchone()[0]
-print(f"📝 Total Claims:          {claims_count:>4}")
-
-cursor.execute("SELECT COUNT(*) FROM payments")
-payments_count = cursor.fetchone()[0]
-print(f"💰 Total Payments:        {payments_count:>4}")
-
-print("\n" + "="*70)
-print("SAMPLE DATA PREVIEW")
-print("="*70)
-
-# Accounts by state
-print("\n📍 Accounts by State:")
-cursor.execute("""
-    SELECT state, COUNT(*) as count 
-    FROM account 
-    GROUP BY state 
-    ORDER BY count DESC 
-    LIMIT 5
-""")
-for row in cursor.fetchall():
-    print(f"   {row[0]}: {row[1]} accounts")
-
-# Policy types distribution
-print("\n📊 Policy Distribution:")
-cursor.execute("""
-    SELECT policy_type, COUNT(*) as count, SUM(premium_amount) as total_premium 
-    FROM policies 
-    WHERE status = 'Active'
-    GROUP BY policy_type 
-    ORDER BY count DESC
-""")
-for row in cursor.fetchall():
-    print(f"   {row[0]:<20} {row[1]:>2} policies  ${row[2]:>8,.2f}")
-
-# Claims by status
-print("\n📋 Claims Summary:")
-cursor.execute("""
-    SELECT status, COUNT(*) as count, SUM(claim_amount) as total_amount 
-    FROM claims 
-    GROUP BY status
-""")
-for row in cursor.fetchall():
-    amount = row[2] if row[2] else 0
-    print(f"   {row[0]:<12} {row[1]:>2} claims   ${amount:>9,.2f}")
-
-# Top agents
-print("\n🏆 Top 3 Agents by Policy Count:")
-cursor.execute("""
-    SELECT a.name, COUNT(p.policy_id) as policy_count, SUM(p.premium_amount) as total_premium
-    FROM agents a
-    JOIN policies p ON a.agent_id = p.agent_id
-    GROUP BY a.name
-    ORDER BY policy_count DESC
-    LIMIT 3
-""")
-for idx, row in enumerate(cursor.fetchall(), 1):
-    print(f"   {idx}. {row[0]:<20} {row[1]:>2} policies  ${row[2]:>8,.2f}")
-
-# Financial summary
-print("\n💵 Financial Overview:")
-cursor.execute("SELECT SUM(premium_amount) FROM policies WHERE status='Active'")
-total_premium = cursor.fetchone()[0]
-print(f"   Total Active Premium Revenue:  ${total_premium:>10,.2f}")
-
-cursor.execute("SELECT SUM(approved_amount) FROM claims WHERE status='Approved'")
-result = cursor.fetchone()
-total_approved = result[0] if result and result[0] is not None else 0
-if total_approved:
-    print(f"   Total Approved Claims:         ${total_approved:>10,.2f}")
-    print(f"   Claims Ratio:                  {(total_approved/total_premium*100):>10.2f}%")
-
-cursor.execute("SELECT SUM(amount) FROM payments WHERE status='Completed'")
-total_payments = cursor.fetchone()[0]
-print(f"   Total Payments Collected:      ${total_payments:>10,.2f}")
-
-print("\n" + "="*70)
-print("[6/6] Verification Queries")
-print("="*70)
-
-# Sample complex query
-print("\n🔍 Sample Query - Accounts with Active Policies and Claims:")
-cursor.execute("""
-    SELECT 
-        c.name, 
-        p.policy_type, 
-        p.premium_amount,
-        COUNT(cl.claim_id) as claim_count
-    FROM account c
-    JOIN policies p ON c.account_id = p.account_id
-    LEFT JOIN claims cl ON p.policy_id = cl.policy_id
-    WHERE p.status = 'Active'
-    GROUP BY c.name, p.policy_type, p.premium_amount
-    HAVING claim_count > 0
-    LIMIT 5
-""")
-results = cursor.fetchall()
-if results:
-    print(f"\n{'Account Name':<20} {'Policy Type':<20} {'Premium':<12} {'Claims'}")
-    print("-" * 70)
-    for row in results:
-        print(f"{row[0]:<20} {row[1]:<20} ${row[2]:<11,.2f} {row[3]}")
-
-connection.close()
-
-print("\n" + "="*70)
-print("✅ DATABASE CREATED SUCCESSFULLY!")
-print("="*70)
-print("\n📁 Database file: insurance.db")
-print("🚀 Ready to use with the Streamlit application!")
-print("\nNext steps:")
-print("  1. Run: streamlit run app.py")
-print("  2. Start querying your data!")
-print("\n" + "="*70)
\ No newline at end of file
+# policy_type: (weight, median premium, premium sigma, median coverage, term years, claim rate, claim types, median claim)
+POLICY_TYPES = {
+    "Auto Insurance": (35, 850, 0.30, 55000, 1, 1.4, ["Auto Accident", "Auto Theft", "Auto Collision"], 1800),
+    "Health Insurance": (25, 480, 0.35, 110000, 1, 1.6, ["Medical", "Hospitalization", "Prescription"], 900),
+    "Home Insurance": (20, 1500, 0.30, 320000, 1, 0.7, ["Fire Damage", "Water Damage", "Storm Damage", "Theft"], 4500),
+    "Life Insurance": (20, 1100, 0.25, 450000, 10, 0.05, ["Death Benefit", "Terminal Illness"], 40000),
+}
+PAYMENT_METHODS = (["Credit Card", "Bank Transfer", "Debit Card", "Check"], [45, 30, 15, 10])
+PAYMENT_STATUSES = (["Completed", "Pending", "Failed"], [92, 4, 4])
+CLAIM_STATUSES = (["Approved", "Pending", "Rejected"], [70, 15, 15])
+
+
+def cumulative(weights):
+    """Cumulative weights for random.choices(cum_weights=...)"""
+    total, out = 0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+class DateStrings:
+    """ISO strings for every day in the generated range, looked up by ordinal"""
+
+    def __init__(self, start: date, end: date):
+        self.base = start.toordinal()
+        self.strings = [date.fromordinal(o).isoformat() for o in range(self.base, end.toordinal() + 1)]
+
+    def __getitem__(self, ordinal: int) -> str:
+        return self.strings[ordinal - self.base]
+
+
+def create_schema(cursor):
+    """Drop and recreate the five insurance tables"""
+    print("\n[1/6] Dropping existing tables (if any)...")
+    cursor.execute('DROP TABLE IF EXISTS claims')
+    cursor.execute('DROP TABLE IF EXISTS payments')
+    cursor.execute('DROP TABLE IF EXISTS policies')
+    cursor.execute('DROP TABLE IF EXISTS account')
+    cursor.execute('DROP TABLE IF EXISTS agents')
+    print("✓ Existing tables dropped")
+
+    print("\n[2/6] Creating database schema...")
+
+    # 1. ACCOUNTS table
+    cursor.execute('''
+    CREATE TABLE account (
+        account_id INTEGER PRIMARY KEY,
+        name VARCHAR(100),
+        email VARCHAR(100),
+        phone VARCHAR(15),
+        address VARCHAR(200),
+        city VARCHAR(50),
+        state VARCHAR(50),
+        zip_code VARCHAR(10),
+        date_of_birth DATE,
+        gender VARCHAR(10)
+    )
+    ''')
+    print("✓ Created ACCOUNTS table")
+
+    # 2. AGENTS table
+    cursor.execute('''
+    CREATE TABLE agents (
+        agent_id INTEGER PRIMARY KEY,
+        name VARCHAR(100),
+        email VARCHAR(100),
+        phone VARCHAR(15),
+        city VARCHAR(50),
+        commission_rate DECIMAL(5,2),
+        join_date DATE,
+        status VARCHAR(20)
+    )
+    ''')
+    print("✓ Created AGENTS table")
+
+    # 3. POLICIES table
+    cursor.execute('''
+    CREATE TABLE policies (
+        policy_id INTEGER PRIMARY KEY,
+        account_id INTEGER,
+        agent_id INTEGER,
+        policy_type VARCHAR(50),
+        policy_number VARCHAR(50),
+        start_date DATE,
+        end_date DATE,
+        premium_amount DECIMAL(10,2),
+        coverage_amount DECIMAL(12,2),
+        status VARCHAR(20),
+        FOREIGN KEY (account_id) REFERENCES account(account_id),
+        FOREIGN KEY (agent_id) REFERENCES agents(agent_id)
+    )
+    ''')
+    print("✓ Created POLICIES table")
+
+    # 4. CLAIMS table
+    cursor.execute('''
+    CREATE TABLE claims (
+        claim_id INTEGER PRIMARY KEY,
+        policy_id INTEGER,
+        account_id INTEGER,
+        claim_number VARCHAR(50),
+        claim_date DATE,
+        claim_amount DECIMAL(10,2),
+        approved_amount DECIMAL(10,2),
+        claim_type VARCHAR(50),
+        status VARCHAR(20),
+        settlement_date DATE,
+        FOREIGN KEY (policy_id) REFERENCES policies(policy_id),
+        FOREIGN KEY (account_id) REFERENCES account(account_id)
+    )
+    ''')
+    print("✓ Created CLAIMS table")
+
+    # 5. PAYMENTS table
+    cursor.execute('''
+    CREATE TABLE payments (
+        payment_id INTEGER PRIMARY KEY,
+        policy_id INTEGER,
+        account_id INTEGER,
+        payment_date DATE,
+        amount DECIMAL(10,2),
+        payment_method VARCHAR(30),
+        status VARCHAR(20),
+        FOREIGN KEY (policy_id) REFERENCES policies(policy_id),
+        FOREIGN KEY (account_id) REFERENCES account(account_id)
+    )
+    ''')
+    print("✓ Created PAYMENTS table")
+
+
+class InsuranceDataGenerator:
+    """Deterministic, referentially consistent synthetic insurance data.
+
+    Rows are produced in batches so memory stays flat regardless of scale;
+    only a few compact per-policy arrays are kept so claims and payments can
+    reference real policies, accounts and dates.
+    """
+
+    def __init__(self, scale: float = 1, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.counts = {table: max(1, int(round(n * scale))) for table, n in ROWS_PER_SCALE.items()}
+        self.dates = DateStrings(HISTORY_START - timedelta(days=365 * 90), REFERENCE_DATE + timedelta(days=365 * 11))
+        self.reference = REFERENCE_DATE.toordinal()
+
+        # Per-account and per-policy facts needed by dependent tables
+        self.policy_account = array("i")
+        self.policy_type = array("b")
+        self.policy_start = array("i")
+        self.policy_end = array("i")
+        self.policy_premium = array("d")
+
+    def batches(self, rows, size: int = BATCH_SIZE):
+        """Group a row iterator into lists of ``size`` rows for executemany()"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def agents(self):
+        rng = self.rng
+        for agent_id in range(1, self.counts["agents"] + 1):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            state = rng.choices(STATES, cum_weights=self._state_weights)[0]
+            join = HISTORY_START.toordinal() - rng.randint(0, 3650)
+            yield (
+                agent_id,
+                f"{first} {last}",
+                f"{first.lower()}.{last.lower()}{agent_id}@insurance.com",
+                f"555-{1000 + agent_id % 9000:04d}",
+                rng.choice(state[2]),
+                rng.choice([4.5, 5.0, 5.5, 6.0, 6.5, 7.0]),
+                self.dates[join],
+                "Active" if rng.random() < 0.93 else "Inactive",
+            )
+
+    def accounts(self):
+        rng = self.rng
+        states = rng.choices(STATES, cum_weights=self._state_weights, k=self.counts["account"])
+        for account_id, state in enumerate(states, 1):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            age_days = int(rng.triangular(18, 85, 42) * 365.25)
+            yield (
+                account_id,
+                f"{first} {last}",
+                f"{first.lower()}.{last.lower()}{account_id}@email.com",
+                f"555-{account_id % 10000:04d}",
+                f"{rng.randint(1, 9999)} {rng.choice(STREET_NAMES)}",
+                rng.choice(state[2]),
+                state[0],
+                f"{state[3]}{rng.randint(0, 9999):04d}",
+                self.dates[self.reference - age_days],
+                "Female" if first in FEMALE_NAMES else "Male",
+            )
+
+    def policies(self):
+        rng = self.rng
+        n = self.counts["policies"]
+        type_names = list(POLICY_TYPES)
+        type_weights = cumulative(spec[0] for spec in POLICY_TYPES.values())
+        # A few agents sell most policies (Zipf-like)
+        agent_weights = cumulative(1 / (rank ** 0.8) for rank in range(1, self.counts["agents"] + 1))
+        agent_ids = list(range(1, self.counts["agents"] + 1))
+        rng.shuffle(agent_ids)
+
+        span = self.reference - HISTORY_START.toordinal()
+        for policy_id in range(1, n + 1):
+            type_index = rng.choices(range(len(type_names)), cum_weights=type_weights)[0]
+            _, premium_median, sigma, coverage_median, term, _, _, _ = POLICY_TYPES[type_names[type_index]]
+            account_id = rng.randint(1, self.counts["account"])
+            # The book grows over time, so recent start dates are more common
+            start = self.reference - int(span * rng.random() ** 2)
+            end = start + 365 * term
+            premium = round(premium_median * math.exp(rng.gauss(0, sigma)), 2)
+            coverage = round(coverage_median * math.exp(rng.gauss(0, 0.3)), -3)
+
+            if rng.random() < 0.04:
+                status = "Cancelled"
+            elif end < self.reference:
+                status = "Expired"
+            else:
+                status = "Active"
+
+            self.policy_account.append(account_id)
+            self.policy_type.append(type_index)
+            self.policy_start.append(start)
+            self.policy_end.append(min(end, self.reference))
+            self.policy_premium.append(premium)
+
+            yield (
+                policy_id,
+                account_id,
+                agent_ids[rng.choices(range(len(agent_ids)), cum_weights=agent_weights)[0]],
+                type_names[type_index],
+                f"POL-{self.dates[start][:4]}-{policy_id:07d}",
+                self.dates[start],
+                self.dates[end],
+                premium,
+                coverage,
+                status,
+            )
+
+    def claims(self):
+        rng = self.rng
+        type_names = list(POLICY_TYPES)
+        # Claim-prone policy types get proportionally more claims
+        policy_weights = cumulative(POLICY_TYPES[type_names[t]][5] for t in self.policy_type)
+        statuses, status_weights = CLAIM_STATUSES[0], cumulative(CLAIM_STATUSES[1])
+
+        n = self.counts["claims"]
+        policy_indexes = rng.choices(range(len(self.policy_type)), cum_weights=policy_weights, k=n)
+        for claim_id, index in enumerate(policy_indexes, 1):
+            spec = POLICY_TYPES[type_names[self.policy_type[index]]]
+            claim_day = rng.randint(self.policy_start[index], max(self.policy_start[index], self.policy_end[index]))
+            amount = round(spec[7] * math.exp(rng.gauss(0, 0.6)), 2)
+            status = rng.choices(statuses, cum_weights=status_weights)[0]
+            if status == "Approved":
+                approved = round(amount * rng.uniform(0.6, 1.0), 2)
+                settlement = self.dates[claim_day + rng.randint(7, 60)]
+            elif status == "Rejected":
+                approved, settlement = 0.0, None
+            else:
+                approved, settlement = None, None
+            yield (
+                claim_id,
+                index + 1,
+                self.policy_account[index],
+                f"CLM-{self.dates[claim_day][:4]}-{claim_id:07d}",
+                self.dates[claim_day],
+                amount,
+                approved,
+                rng.choice(spec[6]),
+                status,
+                settlement,
+            )
+
+    def payments(self):
+        rng = self.rng
+        methods, method_weights = PAYMENT_METHODS[0], cumulative(PAYMENT_METHODS[1])
+        statuses, status_weights = PAYMENT_STATUSES[0], cumulative(PAYMENT_STATUSES[1])
+        n_policies = len(self.policy_type)
+        for payment_id in range(1, self.counts["payments"] + 1):
+            index = rng.randrange(n_policies)
+            start, end = self.policy_start[index], self.policy_end[index]
+            yield (
+                payment_id,
+                index + 1,
+                self.policy_account[index],
+                self.dates[rng.randint(start, max(start, end))],
+                self.policy_premium[index],
+                rng.choices(methods, cum_weights=method_weights)[0],
+                rng.choices(statuses, cum_weights=status_weights)[0],
+            )
+
+    @property
+    def _state_weights(self):
+        return cumulative(state[1] for state in STATES)
+
+
+def load_data(connection, generator: InsuranceDataGenerator):
+    """Insert every table in large batched transactions"""
+    print("\n[3/6] Generating and inserting synthetic data...")
+    cursor = connection.cursor()
+    tables = [
+        ("agents", "INSERT INTO agents VALUES (?,?,?,?,?,?,?,?)", generator.agents),
+        ("account", "INSERT INTO account VALUES (?,?,?,?,?,?,?,?,?,?)", generator.accounts),
+        ("policies", "INSERT INTO policies VALUES (?,?,?,?,?,?,?,?,?,?)", generator.policies),
+        ("claims", "INSERT INTO claims VALUES (?,?,?,?,?,?,?,?,?,?)", generator.claims),
+        ("payments", "INSERT INTO payments VALUES (?,?,?,?,?,?,?)", generator.payments),
+    ]
+    total_rows = 0
+    for table, insert_sql, rows in tables:
+        started = time.perf_counter()
+        inserted = 0
+        cursor.execute("BEGIN")
+        for batch in generator.batches(rows()):
+            cursor.executemany(insert_sql, batch)
+            inserted += len(batch)
+        cursor.execute("COMMIT")
+        elapsed = time.perf_counter() - started
+        total_rows += inserted
+        print(f"✓ Inserted {inserted:,} {table} in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} rows/s)")
+    return total_rows
+
+
+def print_summary(cursor):
+    """Print table counts and a few sample aggregates"""
+    print("\n[5/6] Generating database statistics...")
+    print("\n" + "="*70)
+    print("DATABASE SUMMARY")
+    print("="*70)
+
+    # Table counts
+    for label, table in [("📊 Total Accounts:", "account"), ("👥 Total Agents:", "agents"),
+                         ("📋 Total Policies:", "policies"), ("📝 Total Claims:", "claims"),
+                         ("💰 Total Payments:", "payments")]:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        print(f"{label:<24}{cursor.fetchone()[0]:>12,}")
+
+    print("\n" + "="*70)
+    print("SAMPLE DATA PREVIEW")
+    print("="*70)
+
+    # Accounts by state
+    print("\n📍 Accounts by State:")
+    cursor.execute("""
+        SELECT state, COUNT(*) as count
+        FROM account
+        GROUP BY state
+        ORDER BY count DESC
+        LIMIT 5
+    """)
+    for row in cursor.fetchall():
+        print(f"   {row[0]}: {row[1]:,} accounts")
+
+    # Policy types distribution
+    print("\n📊 Policy Distribution:")
+    cursor.execute("""
+        SELECT policy_type, COUNT(*) as count, SUM(premium_amount) as total_premium
+        FROM policies
+        WHERE status = 'Active'
+        GROUP BY policy_type
+        ORDER BY count DESC
+    """)
+    for row in cursor.fetchall():
+        print(f"   {row[0]:<20} {row[1]:>10,} policies  ${row[2]:>16,.2f}")
+
+    # Claims by status
+    print("\n📋 Claims Summary:")
+    cursor.execute("""
+        SELECT status, COUNT(*) as count, SUM(claim_amount) as total_amount
+        FROM claims
+        GROUP BY status
+    """)
+    for row in cursor.fetchall():
+        amount = row[2] if row[2] else 0
+        print(f"   {row[0]:<12} {row[1]:>10,} claims   ${amount:>16,.2f}")
+
+    # Top agents
+    print("\n🏆 Top 3 Agents by Policy Count:")
+    cursor.execute("""
+        SELECT a.name, COUNT(p.policy_id) as policy_count, SUM(p.premium_amount) as total_premium
+        FROM agents a
+        JOIN policies p ON a.agent_id = p.agent_id
+        GROUP BY a.name
+        ORDER BY policy_count DESC
+        LIMIT 3
+    """)
+    for idx, row in enumerate(cursor.fetchall(), 1):
+        print(f"   {idx}. {row[0]:<20} {row[1]:>10,} policies  ${row[2]:>16,.2f}")
+
+    # Financial summary
+    print("\n💵 Financial Overview:")
+    cursor.execute("SELECT SUM(premium_amount) FROM policies WHERE status='Active'")
+    total_premium = cursor.fetchone()[0] or 0
+    print(f"   Total Active Premium Revenue:  ${total_premium:>18,.2f}")
+
+    cursor.execute("SELECT SUM(approved_amount) FROM claims WHERE status='Approved'")
+    result = cursor.fetchone()
+    total_approved = result[0] if result and result[0] is not None else 0
+    if total_approved and total_premium:
+        print(f"   Total Approved Claims:         ${total_approved:>18,.2f}")
+        print(f"   Claims Ratio:                  {(total_approved/total_premium*100):>18.2f}%")
+
+    cursor.execute("SELECT SUM(amount) FROM payments WHERE status='Completed'")
+    total_payments = cursor.fetchone()[0] or 0
+    print(f"   Total Payments Collected:      ${total_payments:>18,.2f}")
+
+
+def build_database(path: str, scale: float = 1, seed: int = 42, summary: bool = True,
+                   indexes: bool = True, rollups: bool = True) -> int:
+    """Create (or replace) the database at ``path``; returns the number of rows inserted"""
+    ## Connect to SQLite
+    connection = sqlite3.connect(path, isolation_level=None)
+    # WAL lets the app keep reading while a reload runs; durability is not
+    # needed during the bulk load, so skip fsyncs until it is done.
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.execute("PRAGMA cache_size=-200000")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    cursor = connection.cursor()
+
+    # Rollups summarize the tables being replaced; drop them with the data
+    drop_rollups(connection)
+    create_schema(cursor)
+
+    generator = InsuranceDataGenerator(scale=scale, seed=seed)
+    total_rows = load_data(connection, generator)
+
+    ## Finalize
+    if indexes:
+        # Built after the load: one sorted pass per index beats maintaining them row by row
+        started = time.perf_counter()
+        created = create_default_indexes(connection)
+        print(f"✓ Created {len(created)} indexes in {time.perf_counter() - started:.1f}s")
+    if rollups:
+        # Also after the load, so the bulk inserts don't fire a trigger per row
+        started = time.perf_counter()
+        install_rollups(connection)
+        print(f"✓ Built rollup tables in {time.perf_counter() - started:.1f}s")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("ANALYZE")
+    print("\n[4/6] Committed all data to database")
+
+    if summary:
+        print_summary(cursor)
+
+    connection.close()
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic insurance database")
+    parser.add_argument("--scale", type=float, default=1,
+                        help="Scale factor (1 = ~10k rows, 1000 = ~10M rows)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data")
+    parser.add_argument("--db", default="insurance.db", help="SQLite database file to (re)create")
+    parser.add_argument("--quiet", action="store_true", help="Skip the summary report")
+    parser.add_argument("--no-indexes", action="store_true", help="Skip the default secondary indexes")
+    parser.add_argument("--no-rollups", action="store_true", help="Skip the dashboard rollup tables")
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"Creating Insurance Database (scale {args.scale:g}, seed {args.seed})...")
+    print("="*70)
+    started = time.perf_counter()
+
+    total_rows = build_database(args.db, scale=args.scale, seed=args.seed, summary=not args.quiet,
+                                indexes=not args.no_indexes, rollups=not args.no_rollups)
+    elapsed = time.perf_counter() - started
+
+    print("\n" + "="*70)
+    print("✅ DATABASE CREATED SUCCESSFULLY!")
+    print("="*70)
+    print(f"\n📁 Database file: {args.db}")
+    print(f"⏱️  {total_rows:,} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    print("🚀 Ready to use with the Streamlit application!")
+    print("\nNext steps:")
+    print("  1. Run: streamlit run app.py")
+    print("  2. Start querying your data!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Shared test setup - every test runs against a small generated database in a temporary directory
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads these at import time, so they are set before any agent is imported.
+# The relative .cache/ paths in config.py land in the temporary directory too.
+WORK_DIR = tempfile.mkdtemp(prefix="insurance-tests-")
+DATABASE = os.path.join(WORK_DIR, "insurance.db")
+os.environ.update({
+    "SQLITE_DATABASE": DATABASE,
+    "SQLITE_SNAPSHOT": "0",
+    "DUCKDB_ENGINE": "0",
+    "DUCKDB_DATABASE": os.path.join(WORK_DIR, "insurance.duckdb"),
+    "SQL_CACHE_PATH": os.path.join(WORK_DIR, "sql_translations.db"),
+    "SQL_TEMPLATE_PATH": os.path.join(WORK_DIR, "sql_templates.db"),
+    "SQL_EXAMPLE_PATH": os.path.join(WORK_DIR, "sql_examples.db"),
+    "TOKEN_LEDGER_PATH": os.path.join(WORK_DIR, "token_usage.db"),
+    "LLM_BACKEND": "stub",
+    "METRICS_PORT": "0",
+})
+os.chdir(WORK_DIR)
+
+
+@pytest.fixture(scope="session")
+def database() -> str:
+    """Path of the generated database (scale 1, fixed seed), built once per run"""
+    from insurance_db import build_database
+
+    if not os.path.exists(DATABASE):
+        build_database(DATABASE, scale=1, seed=42, summary=False)
+    return DATABASE
+
+
+@pytest.fixture
+def db_agent(database):
+    """A DatabaseAgent on the test database with the result cache off"""
+    from agents.db_agent import DatabaseAgent
+
+    agent = DatabaseAgent()
+    agent.result_cache = None
+    yield agent
+    agent.pool.close_all()
@@ -0,0 +1,112 @@
+import csv
+import json
+
+import pytest
+
+from batch_query import BatchRunner, load_manifest, read_questions
+
+SQL = {
+    "How many agents are there?": "SELECT COUNT(*) AS agents FROM agents",
+    "List the states": "SELECT DISTINCT state FROM account ORDER BY state",
+    "Broken question": "SELECT * FROM no_such_table",
+    "Delete the agents": "DELETE FROM agents",
+}
+QUESTIONS = [("count", "How many agents are there?"), ("states", "List the states"),
+             ("broken", "Broken question"), ("delete", "Delete the agents")]
+
+
+@pytest.fixture
+def make_runner(database, tmp_path, monkeypatch):
+    from agents.translation_cache import TranslationCache
+
+    calls = []
+    runners = []
+
+    def make():
+        runner = BatchRunner(str(tmp_path / "out"), "csv", concurrency=2)
+        # A cache of its own, and SQL from the table above instead of the model
+        runner.sql_agent.cache = TranslationCache(str(tmp_path / "translations.db"))
+
+        def generate_sql(question, session_id=None):
+            calls.append(question)
+            return SQL[question]
+
+        monkeypatch.setattr(runner.sql_agent, "generate_sql", generate_sql)
+        runners.append(runner)
+        return runner
+
+    yield make, calls
+    for runner in runners:
+        runner.db_agent.pool.close_all()
+
+
+def _statuses(runner):
+    return {entry_id: entry["status"] for entry_id, entry in load_manifest(runner.manifest_path).items()}
+
+
+def test_read_questions_from_each_format(tmp_path):
+    (tmp_path / "q.txt").write_text("How many agents are there?\n# skipped\n\nList the states\n")
+    assert read_questions(str(tmp_path / "q.txt")) == [("q000001", "How many agents are there?"),
+                                                       ("q000004", "List the states")]
+
+    with open(tmp_path / "q.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerows([["id", "question"], ["a b", "How many agents are there?"]])
+    assert read_questions(str(tmp_path / "q.csv")) == [("a_b", "How many agents are there?")]
+
+    (tmp_path / "q.jsonl").write_text(json.dumps({"id": "x/1", "question": "List the states"}) + "\n")
+    assert read_questions(str(tmp_path / "q.jsonl")) == [("x_1", "List the states")]
+
+
+def test_ids_that_collide_once_sanitized_are_rejected(tmp_path):
+    lines = [{"id": "a/b", "question": "How many agents are there?"}, {"id": "a_b", "question": "List the states"}]
+    (tmp_path / "q.jsonl").write_text("".join(json.dumps(line) + "\n" for line in lines))
+    with pytest.raises(ValueError, match="a_b"):
+        read_questions(str(tmp_path / "q.jsonl"))
+
+
+def test_run_writes_results_and_resumes_from_the_manifest(make_runner, db_agent):
+    make, calls = make_runner
+    runner = make()
+    counts = runner.run(QUESTIONS)
+    assert counts == {"skipped": 0, "ok": 2, "error": 1, "rejected": 1}
+    assert _statuses(runner) == {"count": "ok", "states": "ok", "broken": "error", "delete": "rejected"}
+
+    entry = load_manifest(runner.manifest_path)["count"]
+    with open(runner.output_dir + "/" + entry["file"], newline="") as f:
+        assert list(csv.reader(f)) == [["agents"], [str(db_agent.execute_query("SELECT COUNT(*) FROM agents")[0][0][0])]]
+
+    # Everything already in the manifest is skipped, failures included
+    calls.clear()
+    assert make().run(QUESTIONS) == {"skipped": 4}
+    assert calls == []
+
+
+def test_retry_failed_reruns_only_errors(make_runner, monkeypatch):
+    make, calls = make_runner
+    make().run(QUESTIONS)
+    monkeypatch.setitem(SQL, "Broken question", "SELECT COUNT(*) AS accounts FROM account")
+
+    calls.clear()
+    runner = make()
+    assert runner.run(QUESTIONS, retry_failed=True) == {"skipped": 3, "ok": 1}
+    assert calls == ["Broken question"]
+    assert _statuses(runner)["broken"] == "ok"
+
+
+def test_changed_question_under_the_same_id_runs_again(make_runner):
+    make, calls = make_runner
+    make().run(QUESTIONS[:1])
+    calls.clear()
+    assert make().run([("count", "List the states")]) == {"skipped": 0, "ok": 1}
+    assert calls == ["List the states"]
+
+
+def test_write_statements_are_rejected_without_running(make_runner, db_agent):
+    make, _ = make_runner
+    before = db_agent.execute_query("SELECT COUNT(*) FROM agents")[0]
+    runner = make()
+    assert runner.run([("delete", "Delete the agents")]) == {"skipped": 0, "rejected": 1}
+    entry = load_manifest(runner.manifest_path)["delete"]
+    assert entry["file"] is None and entry["rows"] == 0
+    assert db_agent.execute_query("SELECT COUNT(*) FROM agents")[0] == before
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from agents.cancellation import CancellationToken, QueryCancelled, QueryTimeout
+
+# Counts forever; only an interrupt ends it
+ENDLESS = "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r) SELECT COUNT(*) FROM r"
+
+
+def _still_usable(db_agent):
+    assert db_agent.execute_query("SELECT COUNT(*) FROM agents")[0][0][0] > 0
+    assert db_agent.pool.stats()["in_use"] == 0
+
+
+def test_cancel_interrupts_a_running_query(db_agent):
+    token = CancellationToken()
+    timer = threading.Timer(0.2, token.cancel)
+    timer.start()
+    started = time.perf_counter()
+    with pytest.raises(QueryCancelled) as raised:
+        db_agent.execute_query(ENDLESS, token=token)
+    assert not isinstance(raised.value, QueryTimeout)
+    assert time.perf_counter() - started < 5
+    _still_usable(db_agent)
+
+
+def test_deadline_interrupts_a_running_query(db_agent):
+    started = time.perf_counter()
+    with pytest.raises(QueryTimeout):
+        db_agent.execute_query(ENDLESS, timeout=0.2)
+    assert time.perf_counter() - started < 5
+    _still_usable(db_agent)
+
+
+def test_deadline_stops_columnar_fetches(db_agent):
+    with pytest.raises(QueryTimeout):
+        db_agent.execute_columnar(ENDLESS, timeout=0.2)
+    _still_usable(db_agent)
+
+
+def test_token_cancelled_before_the_query_starts(db_agent):
+    token = CancellationToken()
+    token.cancel()
+    with pytest.raises(QueryCancelled):
+        db_agent.execute_query(ENDLESS, token=token)
+    _still_usable(db_agent)
+
+
+def test_callbacks_run_once_and_can_be_removed():
+    token = CancellationToken()
+    calls = []
+    kept = token.on_cancel(lambda: calls.append("kept"))
+    removed = token.on_cancel(lambda: calls.append("removed"))
+    token.remove_callback(removed)
+    token.cancel()
+    token.cancel()
+    assert calls == ["kept"]
+    assert kept != removed
+    # Registered after the fact: runs straight away
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["kept", "late"]
+
+
+def test_timer_cancels_without_polling():
+    token = CancellationToken(0.05)
+    fired = threading.Event()
+    token.on_cancel(fired.set)
+    token.start_timer()
+    assert fired.wait(5)
+    assert token.timed_out
+    assert isinstance(token.error(), QueryTimeout)
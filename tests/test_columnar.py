@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from agents.columnar import FLOAT, INT, OBJECT, ColumnarResult
+
+CLAIMS = "SELECT claim_id, approved_amount, status, settlement_date FROM claims ORDER BY claim_id"
+
+
+def test_null_masks_survive_typed_columns():
+    result = ColumnarResult.from_batches(["n", "x", "s"], [
+        [(1, 1.5, "a"), (None, None, None)],
+        [(3, 2.5, "c")],
+    ])
+    n, x, s = result.columns
+    assert (n.kind, x.kind, s.kind) == (INT, FLOAT, OBJECT)
+    assert n.mask.tolist() == x.mask.tolist() == s.mask.tolist() == [False, True, False]
+    assert result.to_rows() == [(1, 1.5, "a"), (None, None, None), (3, 2.5, "c")]
+
+
+def test_all_null_batch_takes_the_other_batches_type():
+    result = ColumnarResult.from_batches(["n"], [[(None,), (None,)], [(7,)]])
+    column = result.columns[0]
+    assert column.kind == INT
+    assert column.to_list() == [None, None, 7]
+
+
+def test_all_null_column_stays_null():
+    column = ColumnarResult.from_batches(["n"], [[(None,)], [(None,)]]).columns[0]
+    assert column.to_list() == [None, None]
+
+
+def test_mixed_int_and_float_batches_widen_to_float():
+    column = ColumnarResult.from_batches(["x"], [[(1,), (2,)], [(2.5,)]]).columns[0]
+    assert column.kind == FLOAT
+    assert column.values.dtype == np.float64
+    assert column.to_list() == [1.0, 2.0, 2.5]
+
+
+def test_mixed_number_and_text_batches_fall_back_to_objects():
+    column = ColumnarResult.from_batches(["x"], [[(1,)], [("one",)]]).columns[0]
+    assert column.kind == OBJECT
+    assert column.to_list() == [1, "one"]
+
+
+def test_rows_match_execute_query(db_agent):
+    expected = db_agent.execute_query(CLAIMS)[0]
+    result = db_agent.execute_columnar(CLAIMS)
+    assert any(row[1] is None for row in expected)   # Pending claims have no approved amount
+    assert result.row_count == len(expected)
+    assert result.to_rows() == expected
+
+
+def test_to_pandas_keeps_nulls_missing(db_agent):
+    expected = db_agent.execute_query(CLAIMS)[0]
+    df = db_agent.execute_columnar(CLAIMS).to_pandas()
+    assert list(df.columns) == ["claim_id", "approved_amount", "status", "settlement_date"]
+    assert df["claim_id"].dtype == np.int64
+    assert df["approved_amount"].dtype == np.float64
+    for row, approved, settled in zip(expected, df["approved_amount"], df["settlement_date"]):
+        assert math.isnan(approved) if row[1] is None else approved == row[1]
+        assert pd.isna(settled) if row[3] is None else settled == row[3]
+
+
+def test_duplicate_column_names_are_kept(db_agent):
+    df = db_agent.execute_columnar("SELECT policy_id, policy_id FROM policies LIMIT 3").to_pandas()
+    assert list(df.columns) == ["policy_id", "policy_id"]
+    assert df.shape == (3, 2)
+
+
+def test_compact_shares_repeated_strings():
+    # Built at run time so each row holds its own string object, as fetched rows do
+    rows = [("".join(["Act", "ive"]),) for _ in range(3)] + [("Lapsed",)]
+    result = ColumnarResult.from_batches(["status"], [rows])
+    assert rows[0][0] is not rows[1][0]
+    before = result.nbytes
+    values = result.compact().columns[0].values
+    assert values[0] is values[1] is values[2]
+    assert result.nbytes < before
+    assert result.columns[0].to_list() == ["Active", "Active", "Active", "Lapsed"]
+
+
+def test_from_arrow_keeps_nulls():
+    table = pa.table({"n": pa.array([1, None, 3]), "s": pa.array(["a", None, "c"])})
+    result = ColumnarResult.from_arrow(table)
+    assert result.columns[0].mask.tolist() == [False, True, False]
+    assert result.to_rows() == [(1, "a"), (None, None), (3, "c")]
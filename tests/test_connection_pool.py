@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from agents.connection_pool import ConnectionPool
+
+
+@pytest.fixture
+def pool(database):
+    pool = ConnectionPool(max_size=2, acquire_timeout=0.2)
+    yield pool
+    pool.close_all()
+
+
+def test_thread_reuses_its_connection(pool):
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    pool.release(second)
+    assert first is second
+
+
+def test_nested_checkout_shares_the_outer_slot(pool):
+    outer = pool.acquire()
+    inner = pool.acquire()
+    assert inner is outer
+    pool.release(inner)
+    pool.release(outer)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_max_size_bounds_checkouts(pool):
+    held = [pool.acquire(detached=True), pool.acquire(detached=True)]
+    with pytest.raises(TimeoutError):
+        pool.acquire(detached=True)
+    pool.release(held.pop())
+    held.append(pool.acquire(detached=True))
+    for conn in held:
+        pool.release(conn)
+
+
+def test_detached_checkout_can_be_released_by_another_thread(pool):
+    conn = pool.acquire(detached=True)
+    assert conn.execute("SELECT COUNT(*) FROM policies").fetchone()[0] > 0
+    releaser = threading.Thread(target=pool.release, args=(conn,))
+    releaser.start()
+    releaser.join()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_discarded_connection_is_not_handed_out_again(pool):
+    conn = pool.acquire(detached=True)
+    pool.release(conn, discard=True)
+    replacement = pool.acquire(detached=True)
+    assert replacement is not conn
+    assert replacement.execute("SELECT 1").fetchone() == (1,)
+    pool.release(replacement)
+
+
+def test_closed_pool_refuses_checkouts(pool):
+    pool.close_all()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_handle_being_reused_is_not_evicted(database):
+    pool = ConnectionPool(max_size=2, idle_timeout=0, health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    is_healthy = pool._is_healthy
+
+    def evict_during_health_check(candidate):
+        # Another thread's eviction pass lands between the checks of a reuse
+        evictor = threading.Thread(target=pool.evict_idle)
+        evictor.start()
+        evictor.join()
+        return is_healthy(candidate)
+
+    pool._is_healthy = evict_during_health_check
+    try:
+        reused = pool.acquire()
+        assert reused is conn
+        assert reused.execute("SELECT 1").fetchone() == (1,)
+        pool.release(reused)
+    finally:
+        pool.close_all()
+
+
+def test_release_from_another_thread_is_refused(pool):
+    conn = pool.acquire()
+    errors = []
+
+    def release():
+        try:
+            pool.release(conn)
+        except RuntimeError as e:
+            errors.append(e)
+
+    releaser = threading.Thread(target=release)
+    releaser.start()
+    releaser.join()
+    assert errors
+    assert pool.stats()["in_use"] == 1
+    pool.release(conn)
+    assert pool.stats()["in_use"] == 0
+    assert conn.execute("SELECT 1").fetchone() == (1,)
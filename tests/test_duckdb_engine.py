@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from agents.duckdb_engine import DuckDBEngine
+from config import DB_CONFIG
+
+# Aggregate queries the engine routes; each must give SQLite's answer
+ROUTED = [
+    "SELECT status, COUNT(*) / 7 AS per_week FROM policies GROUP BY status ORDER BY status",
+    "SELECT policy_type, SUM(premium_amount) AS premium, COUNT(*) AS policies "
+    "FROM policies GROUP BY policy_type ORDER BY policy_type",
+    "SELECT a.state, COUNT(p.policy_id) AS policies FROM account a "
+    "JOIN policies p ON a.account_id = p.account_id GROUP BY a.state ORDER BY policies DESC, a.state",
+    "SELECT claim_type, MAX(settlement_date) AS latest FROM claims GROUP BY claim_type ORDER BY latest",
+]
+
+
+def _rounded(rows):
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+
+@pytest.fixture
+def engine_agent(db_agent, monkeypatch, tmp_path):
+    monkeypatch.setitem(DB_CONFIG["duckdb"], "database", str(tmp_path / "copy.duckdb"))
+    monkeypatch.setitem(DB_CONFIG["duckdb"], "min_rows", 0)
+    engine = DuckDBEngine(db_agent.pool)
+    assert engine.wait_ready(60), engine.stats()["skipped"]
+    db_agent.engine = engine
+    yield db_agent
+    engine.close()
+
+
+@pytest.mark.parametrize("query", ROUTED)
+def test_routed_results_match_sqlite(engine_agent, database, query):
+    expected = _rounded(sqlite3.connect(database).execute(query).fetchall())
+    assert engine_agent.engine.routes(query)
+
+    rows, _ = engine_agent.execute_query(query)
+    assert _rounded(rows) == expected
+    assert _rounded(engine_agent.execute_columnar(query).to_rows()) == expected
+    with engine_agent.stream_query(query) as stream:
+        assert _rounded([row for batch in stream for row in batch]) == expected
+
+
+def test_integer_division_matches_sqlite(engine_agent):
+    rows, _ = engine_agent.execute_query(ROUTED[0])
+    assert all(isinstance(per_week, int) for _, per_week in rows)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM policies WHERE policy_id = 5",
+    "SELECT COUNT(*) AS n FROM policies WHERE status LIKE 'active'",
+    "SELECT status, COUNT(*) FROM policies GROUP BY status",
+    "DELETE FROM policies WHERE policy_id = 5",
+])
+def test_other_queries_stay_on_sqlite(engine_agent, query):
+    assert not engine_agent.engine.routes(query)
+
+
+def test_stale_copy_falls_back_to_sqlite(engine_agent, database):
+    query = ROUTED[1]
+    connection = sqlite3.connect(database)
+    try:
+        connection.execute("UPDATE policies SET premium_amount = premium_amount + 1 WHERE policy_id = 1")
+        connection.commit()
+        expected = _rounded(connection.execute(query).fetchall())
+        assert _rounded(engine_agent.execute_query(query)[0]) == expected
+        assert engine_agent.engine.stats()["stale"] >= 1
+    finally:
+        connection.execute("UPDATE policies SET premium_amount = premium_amount - 1 WHERE policy_id = 1")
+        connection.commit()
+        connection.close()
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT COUNT(*) AS n FROM account WHERE name <> '--'; DELETE FROM account",
+    "SELECT COUNT(*) AS n FROM account; DELETE FROM account",
+])
+def test_stacked_statements_are_never_routed(engine_agent, query):
+    assert not engine_agent.engine.routes(query)
+    with pytest.raises(Exception):
+        engine_agent.execute_query(query)
+    reader = engine_agent.engine.acquire()
+    try:
+        assert reader.cursor().execute("SELECT COUNT(*) FROM account").fetchone()[0] > 0
+    finally:
+        engine_agent.engine.release(reader)
+
+
+def test_copy_is_read_only(engine_agent):
+    reader = engine_agent.engine.acquire()
+    try:
+        with pytest.raises(Exception):
+            reader.cursor().execute("DELETE FROM account")
+    finally:
+        engine_agent.engine.release(reader)
+
+
+def test_close_waits_for_a_copy_being_built(engine_agent, database):
+    engine = engine_agent.engine
+    engine.min_refresh_interval = 0
+    connection = sqlite3.connect(database)
+    try:
+        connection.execute("UPDATE policies SET premium_amount = premium_amount + 1 WHERE policy_id = 1")
+        connection.commit()
+        assert engine.acquire() is None   # Stale: starts a rebuild
+        engine.close()
+        assert not engine._refresh_thread.is_alive()
+        assert engine.stats()["ready"] is False
+    finally:
+        connection.execute("UPDATE policies SET premium_amount = premium_amount - 1 WHERE policy_id = 1")
+        connection.commit()
+        connection.close()
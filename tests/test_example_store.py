@@ -0,0 +1,13 @@
+from agents.example_store import SEED_EXAMPLES, ExampleStore
+
+
+def test_unmatched_question_gets_every_seed_example(tmp_path):
+    store = ExampleStore(str(tmp_path / "examples.db"))
+    assert store.nearest("zzz qqq") == SEED_EXAMPLES
+
+
+def test_similar_examples_are_preferred(tmp_path):
+    store = ExampleStore(str(tmp_path / "examples.db"))
+    store.add("total premium by policy type", "SELECT policy_type, SUM(premium_amount) FROM policies GROUP BY policy_type")
+    store.add("claims per state", "SELECT a.state, COUNT(*) FROM claims c JOIN account a USING (account_id) GROUP BY a.state")
+    assert store.nearest("premium by policy type")[0][0] == "total premium by policy type"
@@ -0,0 +1,58 @@
+import csv
+import gzip
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from agents.export_agent import ExportAgent, ResultWriter
+from config import EXPORT_CONFIG
+
+
+@pytest.fixture
+def small_row_groups(monkeypatch):
+    monkeypatch.setitem(EXPORT_CONFIG, "parquet_row_group_size", 2)
+
+
+def _write_parquet(path, columns, rows):
+    writer = ResultWriter(str(path), "parquet", columns)
+    writer.write(rows)
+    writer.close()
+    return pq.read_table(str(path))
+
+
+def test_later_fraction_widens_integer_column(small_row_groups, tmp_path):
+    table = _write_parquet(tmp_path / "out.parquet", ["id", "amount"],
+                           [(1, 10), (2, 20), (3, 30), (4, 1.5), (5, None)])
+    assert str(table.schema.field("amount").type) == "double"
+    assert str(table.schema.field("id").type) == "int64"
+    assert table.column("amount").to_pylist() == [10.0, 20.0, 30.0, 1.5, None]
+
+
+def test_column_null_in_first_group_gets_its_real_type(small_row_groups, tmp_path):
+    table = _write_parquet(tmp_path / "out.parquet", ["settled"], [(None,), (None,), (7,), (8,)])
+    assert str(table.schema.field("settled").type) == "int64"
+    assert table.column("settled").to_pylist() == [None, None, 7, 8]
+
+
+def test_mixed_types_fall_back_to_text(small_row_groups, tmp_path):
+    table = _write_parquet(tmp_path / "out.parquet", ["code"], [(1,), (2,), ("A3",), (4,)])
+    assert table.column("code").to_pylist() == ["1", "2", "A3", "4"]
+
+
+@pytest.mark.parametrize("output_format, compress", [("csv", True), ("parquet", False)])
+def test_export_writes_every_row(db_agent, tmp_path, output_format, compress):
+    query = "SELECT policy_id, premium_amount, status FROM policies ORDER BY policy_id"
+    expected = db_agent.execute_query(query)[0]
+    agent = ExportAgent(db_agent, export_dir=str(tmp_path))
+    result = agent.export(query, output_format, compress=compress)
+    assert result.rows == len(expected)
+
+    if output_format == "csv":
+        with gzip.open(result.path, "rt", newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["policy_id", "premium_amount", "status"]
+        assert len(rows) == len(expected) + 1
+    else:
+        table = pq.read_table(result.path)
+        assert [tuple(row.values()) for row in table.to_pylist()] == expected
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from agents.frame_types import FrameTyper
+from config import FRAME_CONFIG
+
+ROWS = [(1, 1234567.25, 0.25), (2, 0.1, 0.5), (3, 2.5, None)]
+COLUMNS = ["policy_id", "premium_amount", "discount"]
+
+
+def test_floats_stay_float64_by_default():
+    df, _ = FrameTyper().from_rows(ROWS, COLUMNS)
+    assert df["premium_amount"].dtype == np.float64
+    assert df["discount"].dtype == np.float64
+    assert df["premium_amount"].sum() == sum(row[1] for row in ROWS)
+
+
+def test_money_and_aggregate_columns_are_never_narrowed(monkeypatch):
+    monkeypatch.setitem(FRAME_CONFIG, "float32_decimals", 2)
+    rows = [row + (row[1],) for row in ROWS]
+    df, _ = FrameTyper().from_rows(rows, COLUMNS + ["SUM(x)"])
+    assert df["premium_amount"].dtype == np.float64
+    assert df["SUM(x)"].dtype == np.float64
+    assert df["premium_amount"].sum() == pytest.approx(1234569.85, abs=1e-6)
+    # Other floats are narrowed once opted in, NULLs included
+    assert df["discount"].dtype == np.float32
+    assert np.isnan(df["discount"].iloc[2])
+
+
+def test_floats_that_change_at_display_precision_stay_float64(monkeypatch):
+    monkeypatch.setitem(FRAME_CONFIG, "float32_decimals", 2)
+    df, _ = FrameTyper().from_rows([(0.125,), (16777217.5,)], ["ratio"])
+    assert df["ratio"].dtype == np.float64
+
+
+def test_integers_and_text_are_compacted():
+    rows = [(i, "Active" if i % 2 else "Lapsed", "2024-01-0%d" % (i % 9 + 1), None if i == 3 else i) for i in range(10)]
+    df, report = FrameTyper().from_rows(rows, ["policy_id", "status", "start_date", "agent_id"])
+    assert df["policy_id"].dtype == np.int32
+    assert df["status"].dtype == "category"
+    assert df["start_date"].dtype.kind == "M"
+    assert str(df["agent_id"].dtype) == "Int32" and df["agent_id"].isna().sum() == 1
+    assert report["after_bytes"] < report["before_bytes"]
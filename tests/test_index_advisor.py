@@ -0,0 +1,79 @@
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from config import DB_CONFIG
+
+QUERY = "SELECT * FROM events WHERE kind = 'click'"
+
+
+@pytest.fixture
+def advisor(database, tmp_path, monkeypatch):
+    from agents.connection_pool import ConnectionPool
+    from agents.db_agent import DatabaseAgent
+
+    # A copy of its own: the test adds tables and indexes
+    path = str(tmp_path / "advisor.db")
+    shutil.copy(database, path)
+    monkeypatch.setitem(DB_CONFIG["sqlite"], "database", path)
+    pool = ConnectionPool()
+    agent = DatabaseAgent(pool)
+    agent.advisor.version_check_interval = 0
+    yield agent.advisor, path
+    pool.close_all()
+
+
+def _occurrences(advisor) -> int:
+    return sum(rec["occurrences"] for rec in advisor.recommendations() if rec["table"] == "events")
+
+
+def test_caches_follow_schema_and_data_changes(advisor):
+    advisor, path = advisor
+    advisor.observe("SELECT * FROM policies WHERE end_date > '2024-01-01'")   # Fills the column cache
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT)")
+    conn.executemany("INSERT INTO events (kind) VALUES (?)", [("view",)] * 100)
+    conn.commit()
+    advisor.observe(QUERY)
+    assert _occurrences(advisor) == 0   # Too small to be worth an index
+
+    # A bulk load takes the table past min_table_rows
+    conn.executemany("INSERT INTO events (kind) VALUES (?)", [("click",)] * advisor.min_table_rows)
+    conn.commit()
+    advisor.observe(QUERY)
+    assert _occurrences(advisor) == 1
+
+    # Once the column is indexed the scan is gone from the plan
+    conn.execute("CREATE INDEX idx_events_kind ON events (kind)")
+    conn.commit()
+    conn.close()
+    advisor.observe(QUERY)
+    assert _occurrences(advisor) == 1
+
+
+def test_timing_stops_at_its_deadline(advisor):
+    advisor, _ = advisor
+    advisor.timing_timeout = 0.2
+    endless = "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r) SELECT COUNT(*) FROM r"
+    started = time.perf_counter()
+    assert advisor._time_query(endless) == (0.2, False)
+    assert time.perf_counter() - started < 5
+    assert advisor._run("SELECT COUNT(*) FROM agents")[0][0] > 0
+
+
+def test_created_index_is_timed(advisor):
+    advisor, path = advisor
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT)")
+    conn.executemany("INSERT INTO events (kind) VALUES (?)", [("view",), ("click",)] * advisor.min_table_rows)
+    conn.commit()
+    conn.close()
+    advisor.observe(QUERY)
+
+    rec = advisor.create_index("events", ["kind"])
+    assert rec["status"] == "created"
+    assert not rec["timed_out"]
+    assert rec["before"] > 0 and rec["after"] > 0
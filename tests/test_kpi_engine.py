@@ -0,0 +1,94 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from agents.kpi_engine import KPIEngine
+from agents.rollups import RollupManager
+from config import DB_CONFIG
+
+# Each KPI as its own plain query over the base table
+PLAIN = {
+    "total_accounts": "SELECT COUNT(*) FROM account",
+    "active_policies": "SELECT COUNT(*) FROM policies WHERE status = 'Active'",
+    "total_premium": "SELECT TOTAL(premium_amount) FROM policies WHERE status = 'Active'",
+    "total_claims": "SELECT COUNT(*) FROM claims",
+    "total_approved_claims": "SELECT TOTAL(approved_amount) FROM claims WHERE status = 'Approved'",
+    "pending_claims": "SELECT COUNT(*) FROM claims WHERE status = 'Pending'",
+}
+
+
+@pytest.fixture
+def kpi_agent(database, tmp_path, monkeypatch):
+    from agents.connection_pool import ConnectionPool
+    from agents.db_agent import DatabaseAgent
+
+    # A copy of its own: the tests write to it
+    path = str(tmp_path / "kpi.db")
+    shutil.copy(database, path)
+    monkeypatch.setitem(DB_CONFIG["sqlite"], "database", path)
+    pool = ConnectionPool()
+    agent = DatabaseAgent(pool)
+    agent.result_cache = None
+    yield agent, path
+    pool.close_all()
+
+
+def _expected(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {name: conn.execute(query).fetchone()[0] for name, query in PLAIN.items()}
+    finally:
+        conn.close()
+
+
+def _assert_matches(stats, expected):
+    assert set(stats) == set(expected)
+    for name, value in expected.items():
+        assert stats[name] == pytest.approx(value), name
+
+
+@pytest.mark.parametrize("use_rollups", [False, True])
+def test_kpis_match_plain_sql(kpi_agent, use_rollups):
+    agent, path = kpi_agent
+    rollups = RollupManager(agent) if use_rollups else None
+    if use_rollups:
+        assert rollups.available()
+    _assert_matches(KPIEngine(agent, rollups).get_stats(), _expected(path))
+
+
+@pytest.mark.parametrize("use_rollups", [False, True])
+def test_kpis_follow_writes(kpi_agent, use_rollups):
+    agent, path = kpi_agent
+    engine = KPIEngine(agent, RollupManager(agent) if use_rollups else None)
+    engine.version_check_interval = 0
+    engine.get_stats()
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE policies SET status = 'Active' WHERE policy_id % 3 = 0")
+    conn.execute("UPDATE claims SET status = 'Pending' WHERE claim_id % 4 = 0")
+    conn.execute("DELETE FROM account WHERE account_id % 5 = 0")
+    conn.commit()
+    conn.close()
+
+    _assert_matches(engine.get_stats(), _expected(path))
+
+
+def test_snapshot_is_reused_until_the_data_changes(kpi_agent, monkeypatch):
+    agent, path = kpi_agent
+    engine = KPIEngine(agent)
+    engine.version_check_interval = 0
+    scans = []
+    scan_table = engine._scan_table
+    monkeypatch.setattr(engine, "_scan_table", lambda table: scans.append(table) or scan_table(table))
+
+    engine.get_stats()
+    engine.get_stats()
+    assert sorted(scans) == ["account", "claims", "policies"]
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE claims SET status = 'Pending' WHERE claim_id = 1")
+    conn.commit()
+    conn.close()
+    engine.get_stats()
+    assert len(scans) == 6
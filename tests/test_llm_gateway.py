@@ -0,0 +1,124 @@
+import asyncio
+import io
+import json
+import urllib.error
+
+import pytest
+
+from agents.llm_gateway import HTTPStubBackend, LLMBackend, LLMGateway, LLMResponse
+
+
+class FakeBackend(LLMBackend):
+    """Answers after ``delays[n]`` seconds on call n, or raises ``errors[n]``"""
+
+    name = "fake"
+
+    def __init__(self, delays=(), errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, prompt: str) -> LLMResponse:
+        call = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[call] if call < len(self.delays) else 0)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if call < len(self.errors) and self.errors[call] is not None:
+            raise self.errors[call]
+        return LLMResponse(f"answer {call}", {"total_token_count": 10})
+
+
+def _http_error(status: int) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError("http://stub", status, "error", None, io.BytesIO())
+
+
+@pytest.fixture
+def make_gateway(monkeypatch):
+    monkeypatch.setattr("agents.llm_gateway.random.uniform", lambda low, high: 0)   # No backoff waits
+    gateways = []
+
+    def make(backend, **options):
+        options.setdefault("max_concurrency", 2)
+        gateway = LLMGateway(backend, **options)
+        gateways.append(gateway)
+        return gateway
+
+    yield make
+    for gateway in gateways:
+        gateway.close()
+
+
+def test_identical_prompts_share_one_call(make_gateway):
+    backend = FakeBackend(delays=[0.2])
+    gateway = make_gateway(backend)
+
+    async def both():
+        return await asyncio.gather(gateway.agenerate("same"), gateway.agenerate("same"))
+
+    gateway._ensure_loop()
+    first, second = asyncio.run_coroutine_threadsafe(both(), gateway._loop).result()
+    assert backend.calls == 1
+    assert first.text == second.text
+    assert [first.coalesced, second.coalesced] == [False, True]
+
+
+@pytest.mark.parametrize("error", [_http_error(503), _http_error(429), ConnectionResetError()])
+def test_transient_errors_are_retried(make_gateway, error):
+    backend = FakeBackend(errors=[error])
+    response = make_gateway(backend, max_retries=2).generate("q")
+    assert response.text == "answer 1"
+    assert response.attempts == 2
+
+
+@pytest.mark.parametrize("error", [_http_error(400), _http_error(403), ValueError("bad prompt")])
+def test_client_errors_are_not_retried(make_gateway, error):
+    backend = FakeBackend(errors=[error])
+    with pytest.raises(type(error)):
+        make_gateway(backend, max_retries=2).generate("q")
+    assert backend.calls == 1
+
+
+def test_slow_attempt_times_out_and_is_retried(make_gateway):
+    backend = FakeBackend(delays=[5])
+    response = make_gateway(backend, attempt_timeout=0.1, max_retries=1).generate("q")
+    assert response.attempts == 2
+    assert backend.cancelled == 1
+
+
+def test_hedge_answers_when_the_primary_is_slow(make_gateway):
+    backend = FakeBackend(delays=[5, 0])
+    gateway = make_gateway(backend, hedge_after=0.05)
+    response = gateway.generate("q")
+    assert response.hedged
+    assert gateway.stats["hedges"] == 1
+
+
+def test_deadline_during_hedge_wait_cancels_the_primary(make_gateway):
+    backend = FakeBackend(delays=[5])
+    gateway = make_gateway(backend, hedge_after=1, attempt_timeout=0.1, timeout=0.1, max_retries=0)
+    with pytest.raises(TimeoutError):
+        gateway.generate("q")
+    assert backend.cancelled == 1
+
+    async def free_slots():
+        await asyncio.sleep(0)   # Let the cancelled call leave its semaphore block
+        return gateway._semaphore._value
+
+    assert asyncio.run_coroutine_threadsafe(free_slots(), gateway._loop).result() == gateway.max_concurrency
+
+
+def test_stub_request_has_a_timeout(monkeypatch):
+    seen = {}
+
+    def fake_urlopen(request, timeout=None):
+        seen["timeout"] = timeout
+        return io.BytesIO(json.dumps({"text": "SELECT 1"}).encode("utf-8"))
+
+    monkeypatch.setattr("agents.llm_gateway.urllib.request.urlopen", fake_urlopen)
+    backend = HTTPStubBackend("http://stub", timeout=3)
+    assert asyncio.run(backend.generate("q")).text == "SELECT 1"
+    assert seen["timeout"] == 3
@@ -0,0 +1,163 @@
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from agents.memory_snapshot import MemorySnapshot
+from config import DB_CONFIG, SNAPSHOT_CONFIG
+
+COUNT = "SELECT COUNT(*) FROM agents"
+
+
+@pytest.fixture
+def snapshot_agent(database, tmp_path, monkeypatch):
+    from agents.connection_pool import ConnectionPool
+    from agents.db_agent import DatabaseAgent
+
+    # A copy of its own: the tests write to it
+    path = str(tmp_path / "snapshot.db")
+    shutil.copy(database, path)
+    monkeypatch.setitem(DB_CONFIG["sqlite"], "database", path)
+    # Rebuilds only when a test asks for one
+    monkeypatch.setitem(SNAPSHOT_CONFIG, "min_refresh_interval", 3600)
+    pool = ConnectionPool()
+    agent = DatabaseAgent(pool)
+    agent.result_cache = None
+    agent.snapshot = MemorySnapshot(pool)
+    assert agent.snapshot.wait_ready(30)
+    yield agent, path
+    agent.snapshot.close()
+    pool.close_all()
+
+
+def _write(path: str, statement: str):
+    conn = sqlite3.connect(path)
+    conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+
+def _is_closed(conn) -> bool:
+    try:
+        conn.execute("SELECT 1")
+        return False
+    except sqlite3.ProgrammingError:
+        return True
+
+
+def test_reads_are_served_from_memory(snapshot_agent):
+    agent, _ = snapshot_agent
+    snapshot = agent.snapshot
+    reader = snapshot.acquire()
+    try:
+        assert reader.execute(COUNT).fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM agents")
+    finally:
+        snapshot.release(reader)
+    agent.execute_query(COUNT)
+    assert snapshot.stats()["served"] == 2
+
+
+def test_released_readers_are_reused(snapshot_agent):
+    agent, _ = snapshot_agent
+    first = agent.snapshot.acquire()
+    agent.snapshot.release(first)
+    second = agent.snapshot.acquire()
+    agent.snapshot.release(second)
+    assert first is second
+
+
+def test_write_falls_back_to_disk_until_the_next_copy(snapshot_agent):
+    agent, path = snapshot_agent
+    before = agent.execute_query(COUNT)[0][0][0]
+    _write(path, "INSERT INTO agents (agent_id, name) VALUES (100000, 'New Agent')")
+
+    assert agent.snapshot.acquire() is None
+    assert agent.execute_query(COUNT)[0][0][0] == before + 1   # Read from the file
+    assert agent.snapshot.stats()["fallbacks"] >= 2
+
+    agent.snapshot.refresh()
+    reader = agent.snapshot.acquire()
+    try:
+        assert reader.execute(COUNT).fetchone()[0] == before + 1
+    finally:
+        agent.snapshot.release(reader)
+
+
+def test_retired_copy_lives_until_its_last_reader_is_released(snapshot_agent):
+    agent, path = snapshot_agent
+    snapshot = agent.snapshot
+    old_generation = snapshot._current
+    held = snapshot.acquire()
+    idle = snapshot.acquire()
+    snapshot.release(idle)   # Back on the old copy's idle list
+
+    _write(path, "UPDATE agents SET name = name || '!' WHERE agent_id = 1")
+    snapshot.refresh()
+    assert snapshot._current is not old_generation
+    assert old_generation.retired
+
+    # The held reader still sees the old copy
+    assert not _is_closed(old_generation.keeper)
+    assert not held.execute("SELECT name FROM agents WHERE agent_id = 1").fetchone()[0].endswith("!")
+
+    snapshot.release(held)
+    assert old_generation.in_use == 0
+    assert _is_closed(old_generation.keeper)
+    assert _is_closed(held) and _is_closed(idle)
+
+    reader = snapshot.acquire()
+    try:
+        assert reader.execute("SELECT name FROM agents WHERE agent_id = 1").fetchone()[0].endswith("!")
+    finally:
+        snapshot.release(reader)
+
+
+def test_copy_over_the_size_limit_is_skipped(database, monkeypatch):
+    from agents.connection_pool import ConnectionPool
+
+    monkeypatch.setitem(SNAPSHOT_CONFIG, "max_bytes", 1)
+    pool = ConnectionPool()
+    snapshot = MemorySnapshot(pool)
+    try:
+        assert not snapshot.wait_ready(30)
+        assert snapshot.acquire() is None
+        assert "limit" in snapshot.stats()["skipped"]
+    finally:
+        snapshot.close()
+        pool.close_all()
+
+
+def test_concurrent_readers_across_refreshes_release_every_copy(snapshot_agent):
+    agent, path = snapshot_agent
+    snapshot = agent.snapshot
+    generations = {snapshot._current}
+    errors = []
+
+    def read():
+        try:
+            for _ in range(50):
+                reader = snapshot.acquire()
+                if reader is not None:
+                    generations.add(snapshot._owners.get(id(reader)))
+                    reader.execute(COUNT).fetchone()
+                    snapshot.release(reader)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(3):
+        _write(path, f"UPDATE agents SET name = 'Agent {i}' WHERE agent_id = 1")
+        snapshot.refresh()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    generations.discard(None)
+    assert all(generation.in_use == 0 for generation in generations)
+    for generation in generations - {snapshot._current}:
+        assert generation.retired and _is_closed(generation.keeper)
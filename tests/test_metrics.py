@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from agents import metrics
+from agents.metrics import REQUEST_METRIC, STAGE_METRIC, Histogram, MetricsRegistry
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A fresh process registry exporting into tmp_path"""
+    fresh = MetricsRegistry()
+    fresh.enabled = True
+    fresh.buckets = [0.1, 1]
+    fresh.prometheus_path = str(tmp_path / "metrics.prom")
+    fresh.log_path = str(tmp_path / "metrics.jsonl")
+    fresh.export_interval = 0
+    monkeypatch.setattr(metrics, "_registry", fresh)
+    return fresh
+
+
+def test_histogram_buckets_are_cumulative_and_upper_inclusive():
+    histogram = Histogram([1, 0.1, 0.5])
+    for value in (0.05, 0.1, 0.3, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.cumulative() == [("0.1", 2), ("0.5", 4), ("1", 4), ("+Inf", 5)]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(2.95)
+
+
+def test_prometheus_text_export(registry):
+    registry.observe(STAGE_METRIC, 0.05, page="query", stage="llm")
+    registry.observe(STAGE_METRIC, 0.5, page="query", stage="llm")
+    registry.observe(REQUEST_METRIC, 3)
+    assert registry.prometheus_text() == "\n".join([
+        "# HELP query_pipeline_request_seconds Seconds per traced request (question or page load)",
+        "# TYPE query_pipeline_request_seconds histogram",
+        'query_pipeline_request_seconds_bucket{le="0.1"} 0',
+        'query_pipeline_request_seconds_bucket{le="1"} 0',
+        'query_pipeline_request_seconds_bucket{le="+Inf"} 1',
+        "query_pipeline_request_seconds_sum{} 3.000000",
+        "query_pipeline_request_seconds_count{} 1",
+        "# HELP query_pipeline_stage_seconds Seconds spent in each stage of the query pipeline",
+        "# TYPE query_pipeline_stage_seconds histogram",
+        'query_pipeline_stage_seconds_bucket{page="query",stage="llm",le="0.1"} 1',
+        'query_pipeline_stage_seconds_bucket{page="query",stage="llm",le="1"} 2',
+        'query_pipeline_stage_seconds_bucket{page="query",stage="llm",le="+Inf"} 2',
+        'query_pipeline_stage_seconds_sum{page="query",stage="llm"} 0.550000',
+        'query_pipeline_stage_seconds_count{page="query",stage="llm"} 2',
+    ]) + "\n"
+
+
+def test_trace_collects_spans_and_is_exported(registry):
+    with metrics.trace("query", question="q") as active:
+        metrics.record("llm", 0.2)
+        metrics.record("db_execute", 0.01)
+        metrics.record("db_execute", 0.02)
+        active.set(rows=3)
+    assert metrics.current_trace() is None
+    assert active.breakdown() == pytest.approx({"llm": 0.2, "db_execute": 0.03})
+
+    text = open(registry.prometheus_path).read()
+    assert 'query_pipeline_stage_seconds_count{page="query",stage="db_execute"} 2' in text
+    assert 'query_pipeline_request_seconds_count{page="query"} 1' in text
+
+    with open(registry.log_path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1
+    assert records[0]["trace_id"] == active.id
+    assert records[0]["stages_ms"] == pytest.approx({"llm": 200.0, "db_execute": 30.0})
+    assert records[0]["attributes"] == {"question": "q", "rows": 3}
+
+    # Finishing twice neither re-logs nor re-counts
+    metrics.finish_trace(active)
+    assert 'query_pipeline_request_seconds_count{page="query"} 1' in registry.prometheus_text()
+
+
+def test_spans_outside_a_trace_count_as_background(registry):
+    with metrics.span("schema_prompt"):
+        pass
+    assert 'stage_seconds_count{page="background",stage="schema_prompt"} 1' in registry.prometheus_text()
+
+
+def test_disabled_registry_records_nothing(registry):
+    registry.enabled = False
+    with metrics.trace("query"):
+        metrics.record("llm", 0.2)
+    assert registry.prometheus_text() == "\n"
@@ -0,0 +1,55 @@
+import pytest
+
+from agents.cancellation import CancellationToken, QueryCancelled
+
+QUERY = "SELECT policy_id, status FROM policies ORDER BY policy_id"
+
+
+def test_row_cap_truncates_in_batches(db_agent):
+    expected = db_agent.execute_query(QUERY)[0]
+    with db_agent.stream_query(QUERY, batch_size=300, max_rows=1000) as stream:
+        batches = list(stream)
+    assert [len(batch) for batch in batches] == [300, 300, 300, 100]
+    assert [row for batch in batches for row in batch] == expected[:1000]
+    assert stream.row_count == 1000
+    assert stream.truncated
+    assert stream.total_rows() == len(expected)
+
+
+def test_result_that_fits_the_cap_is_not_truncated(db_agent):
+    with db_agent.stream_query("SELECT * FROM agents", batch_size=4, max_rows=100) as stream:
+        rows = [row for batch in stream for row in batch]
+    assert not stream.truncated
+    assert stream.exhausted
+    assert stream.total_rows() == len(rows) == stream.row_count
+
+
+def test_result_exactly_at_the_cap_is_not_truncated(db_agent):
+    count = db_agent.execute_query("SELECT COUNT(*) FROM agents")[0][0][0]
+    with db_agent.stream_query("SELECT * FROM agents", max_rows=count) as stream:
+        assert sum(len(batch) for batch in stream) == count
+    assert not stream.truncated
+
+
+def test_zero_max_rows_reads_everything(db_agent):
+    expected = len(db_agent.execute_query(QUERY)[0])
+    with db_agent.stream_query(QUERY, batch_size=500, max_rows=0) as stream:
+        assert sum(len(batch) for batch in stream) == expected
+    assert not stream.truncated
+
+
+def test_connection_goes_back_to_the_pool(db_agent):
+    with db_agent.stream_query(QUERY, batch_size=10) as stream:
+        batches = iter(stream)
+        next(batches)
+        assert db_agent.pool.stats()["in_use"] == 1
+    assert db_agent.pool.stats()["in_use"] == 0
+
+
+def test_cancelled_stream_stops(db_agent):
+    token = CancellationToken()
+    with pytest.raises(QueryCancelled):
+        with db_agent.stream_query(QUERY, batch_size=10, max_rows=0, token=token) as stream:
+            for _ in stream:
+                token.cancel("stopped by test")
+    assert db_agent.pool.stats()["in_use"] == 0
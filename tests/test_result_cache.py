@@ -0,0 +1,117 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from agents.result_cache import ResultCache
+from config import DB_CONFIG
+
+QUERY = "SELECT status, COUNT(*) FROM policies GROUP BY status ORDER BY status"
+
+
+@pytest.fixture
+def cached_agent(database, tmp_path, monkeypatch):
+    from agents.connection_pool import ConnectionPool
+    from agents.db_agent import DatabaseAgent
+
+    # A copy of its own: the test writes to it
+    path = str(tmp_path / "cache.db")
+    shutil.copy(database, path)
+    monkeypatch.setitem(DB_CONFIG["sqlite"], "database", path)
+    pool = ConnectionPool()
+    agent = DatabaseAgent(pool)
+    agent.result_cache = ResultCache(agent)
+    yield agent, path
+    pool.close_all()
+
+
+def test_repeated_query_is_served_from_the_cache(cached_agent):
+    agent, _ = cached_agent
+    first = agent.execute_query(QUERY)
+    assert agent.execute_query(QUERY) == first
+    assert agent.execute_columnar(QUERY).to_rows() == first[0]
+    stats = agent.result_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+
+def test_formatting_does_not_change_the_key(cached_agent):
+    agent, _ = cached_agent
+    agent.execute_query(QUERY)
+    agent.execute_query("SELECT status, COUNT(*)\n  FROM policies  -- by status\n GROUP BY status ORDER BY status;")
+    assert agent.result_cache.stats()["hits"] == 1
+
+
+def test_parameters_are_part_of_the_key(cached_agent):
+    agent, _ = cached_agent
+    query = "SELECT COUNT(*) FROM policies WHERE status = ?"
+    active = agent.execute_query(query, params=["Active"])[0]
+    other = agent.execute_query(query, params=["Cancelled"])[0]
+    assert agent.result_cache.stats()["hits"] == 0
+    assert agent.execute_query(query, params=["Active"])[0] == active != other
+
+
+def test_write_invalidates_cached_results(cached_agent):
+    agent, path = cached_agent
+    before = agent.execute_query(QUERY)[0]
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE policies SET status = 'Suspended' WHERE policy_id <= 10")
+    conn.commit()
+    conn.close()
+
+    after = agent.execute_query(QUERY)[0]
+    assert after != before
+    assert ("Suspended", 10) in after
+    stats = agent.result_cache.stats()
+    assert stats["hits"] == 0
+    assert stats["invalidations"] == 1
+    assert agent.execute_query(QUERY)[0] == after
+
+
+@pytest.mark.parametrize("query", [
+    "DELETE FROM policies WHERE policy_id = 0",
+    "WITH gone AS (SELECT 0) DELETE FROM policies WHERE policy_id IN (SELECT * FROM gone)",
+    "SELECT policy_id FROM policies ORDER BY RANDOM() LIMIT 1",
+    "SELECT COUNT(*) FROM policies WHERE end_date > date('now')",
+    "SELECT 1",
+])
+def test_uncacheable_queries_get_no_ticket(cached_agent, query):
+    agent, _ = cached_agent
+    assert agent.result_cache.get(query) == (None, None)
+
+
+def test_function_name_inside_a_literal_is_still_cacheable(cached_agent):
+    agent, _ = cached_agent
+    query = "SELECT COUNT(*) FROM policies WHERE policy_number = 'RANDOM'"
+    agent.execute_query(query)
+    agent.execute_query(query)
+    assert agent.result_cache.stats()["hits"] == 1
+
+
+def test_oversized_results_are_not_kept(cached_agent):
+    agent, _ = cached_agent
+    agent.result_cache.max_entry_bytes = 1
+    agent.execute_query(QUERY)
+    assert agent.result_cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cached_agent):
+    agent, _ = cached_agent
+    cache = agent.result_cache
+    agent.execute_query(QUERY)
+    cache.max_bytes = cache.stats()["bytes"] * 3 // 2   # Room for one result of this size
+    agent.execute_query(QUERY.replace("ORDER BY status", "ORDER BY status DESC"))
+    agent.execute_query(QUERY)
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["evictions"] == 2
+    assert stats["hits"] == 0
+
+
+def test_dashes_inside_a_literal_are_part_of_the_key(cached_agent):
+    agent, _ = cached_agent
+    narrow = "SELECT COUNT(*) FROM account WHERE name LIKE '%--%' OR email = 'x'"
+    wide = "SELECT COUNT(*) FROM account WHERE name LIKE '%--%' OR 1=1"
+    assert agent.execute_query(narrow)[0] == [(0,)]
+    assert agent.execute_query(wide)[0] == agent.execute_query("SELECT COUNT(*) FROM account")[0]
+    assert agent.result_cache.stats()["hits"] == 0
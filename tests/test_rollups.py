@@ -0,0 +1,107 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from agents.rollups import ROLLUPS, install_rollups, rebuild_rollups, verify_rollups
+
+# Each rollup read back the way the analytics queries read it, next to the
+# GROUP BY over the base table it replaces
+EQUIVALENT = {
+    "rollup_policies_by_type_status": (
+        "SELECT NULLIF(policy_type, ''), NULLIF(status, ''), policy_count, total_premium, total_coverage "
+        "FROM rollup_policies_by_type_status",
+        "SELECT policy_type, status, COUNT(*), TOTAL(premium_amount), TOTAL(coverage_amount) "
+        "FROM policies GROUP BY policy_type, status",
+    ),
+    "rollup_policies_by_agent": (
+        "SELECT CAST(NULLIF(agent_id, '') AS INTEGER), policy_count, total_premium FROM rollup_policies_by_agent",
+        "SELECT agent_id, COUNT(*), TOTAL(premium_amount) FROM policies GROUP BY agent_id",
+    ),
+    "rollup_claims_by_status": (
+        "SELECT NULLIF(status, ''), claim_count, total_requested, "
+        "CASE WHEN approved_count > 0 THEN total_approved END FROM rollup_claims_by_status",
+        "SELECT status, COUNT(*), TOTAL(claim_amount), SUM(approved_amount) FROM claims GROUP BY status",
+    ),
+    "rollup_account_totals": (
+        "SELECT account_count FROM rollup_account_totals",
+        "SELECT COUNT(*) FROM account HAVING COUNT(*) > 0",
+    ),
+}
+
+
+@pytest.fixture
+def conn(database, tmp_path):
+    path = str(tmp_path / "rollups.db")
+    shutil.copy(database, path)
+    connection = sqlite3.connect(path, isolation_level=None)
+    install_rollups(connection)
+    yield connection
+    connection.close()
+
+
+def _rows(conn, query):
+    rows = [tuple(round(value, 4) if isinstance(value, float) else value for value in row)
+            for row in conn.execute(query)]
+    return sorted(rows, key=repr)
+
+
+def _assert_in_sync(conn):
+    assert set(EQUIVALENT) == set(ROLLUPS)
+    for name, (rollup, base) in EQUIVALENT.items():
+        assert _rows(conn, rollup) == _rows(conn, base), name
+    assert verify_rollups(conn) == []
+
+
+def test_installed_rollups_match_the_base_tables(conn):
+    _assert_in_sync(conn)
+
+
+def test_inserts_including_null_keys(conn):
+    conn.execute("INSERT INTO policies (policy_id, account_id, agent_id, policy_type, status, premium_amount, coverage_amount) "
+                 "VALUES (900001, 1, NULL, NULL, 'Active', 100.5, 1000), "
+                 "(900002, 1, 1, 'Auto', NULL, NULL, 2000), "
+                 "(900003, 2, NULL, NULL, NULL, 10, NULL)")
+    conn.execute("INSERT INTO claims (claim_id, policy_id, account_id, claim_amount, approved_amount, status) "
+                 "VALUES (900001, 1, 1, 50, NULL, NULL), (900002, 1, 1, NULL, 20, 'Brand New')")
+    conn.execute("INSERT INTO account (account_id, name) VALUES (900001, 'New Account')")
+    _assert_in_sync(conn)
+
+
+def test_updates_of_keys_and_measures(conn):
+    conn.execute("UPDATE policies SET status = 'Lapsed' WHERE policy_id % 7 = 0")
+    conn.execute("UPDATE policies SET premium_amount = premium_amount * 2 WHERE policy_id % 5 = 0")
+    conn.execute("UPDATE policies SET policy_type = NULL, agent_id = NULL WHERE policy_id % 11 = 0")
+    conn.execute("UPDATE policies SET policy_type = 'Auto' WHERE policy_id % 22 = 0")   # NULL back to a value
+    conn.execute("UPDATE claims SET approved_amount = NULL WHERE status = 'Approved' AND claim_id % 3 = 0")
+    conn.execute("UPDATE claims SET status = NULL WHERE claim_id % 13 = 0")
+    # Columns no rollup reads leave the rollups alone
+    conn.execute("UPDATE policies SET end_date = '2030-01-01' WHERE policy_id % 3 = 0")
+    _assert_in_sync(conn)
+
+
+def test_deletes_drop_empty_groups(conn):
+    conn.execute("UPDATE claims SET status = 'Disputed' WHERE claim_id IN (1, 2)")
+    conn.execute("DELETE FROM claims WHERE claim_id IN (1, 2)")
+    assert conn.execute("SELECT COUNT(*) FROM rollup_claims_by_status WHERE status = 'Disputed'").fetchone()[0] == 0
+    conn.execute("DELETE FROM policies WHERE policy_id % 4 = 0")
+    conn.execute("DELETE FROM claims WHERE status = 'Pending'")
+    _assert_in_sync(conn)
+    conn.execute("DELETE FROM account")
+    assert conn.execute("SELECT COUNT(*) FROM rollup_account_totals").fetchone()[0] == 0
+    _assert_in_sync(conn)
+
+
+def test_writes_inside_a_rolled_back_transaction_leave_no_trace(conn):
+    before = _rows(conn, EQUIVALENT["rollup_claims_by_status"][0])
+    conn.execute("BEGIN")
+    conn.execute("DELETE FROM claims")
+    conn.execute("ROLLBACK")
+    assert _rows(conn, EQUIVALENT["rollup_claims_by_status"][0]) == before
+
+
+def test_rebuild_repairs_a_drifted_rollup(conn):
+    conn.execute("UPDATE rollup_claims_by_status SET claim_count = claim_count + 1")
+    assert verify_rollups(conn)
+    rebuild_rollups(conn)
+    _assert_in_sync(conn)
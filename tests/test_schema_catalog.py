@@ -0,0 +1,98 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from agents.schema_catalog import SchemaCatalog, round_estimate
+from config import DB_CONFIG
+
+
+@pytest.fixture
+def catalog_agent(database, tmp_path, monkeypatch):
+    from agents.connection_pool import ConnectionPool
+    from agents.db_agent import DatabaseAgent
+
+    # A copy of its own: the tests change its schema
+    path = str(tmp_path / "catalog.db")
+    shutil.copy(database, path)
+    monkeypatch.setitem(DB_CONFIG["sqlite"], "database", path)
+    pool = ConnectionPool()
+    agent = DatabaseAgent(pool)
+    agent.result_cache = None
+    yield agent, path
+    pool.close_all()
+
+
+def _make(agent, tmp_path, spy=None):
+    catalog = SchemaCatalog(agent, cache_path=str(tmp_path / "schema.json"))
+    catalog.check_interval = 0
+    if spy is not None:
+        introspect = catalog._introspect
+        catalog._introspect = lambda names: spy.append(sorted(names)) or introspect(names)
+    return catalog
+
+
+def _execute(path, *statements):
+    conn = sqlite3.connect(path)
+    for statement in statements:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+
+def test_round_estimate_keeps_two_significant_figures():
+    assert [round_estimate(n) for n in (None, 0, 7, 42, 1234, 98765)] == [None, 0, 7, 42, 1200, 99000]
+
+
+def test_catalog_matches_the_database(catalog_agent, tmp_path):
+    agent, path = catalog_agent
+    tables = _make(agent, tmp_path).get_tables()
+    assert list(tables) == [name for name in agent.get_tables() if not name.startswith("sqlite_")]
+
+    conn = sqlite3.connect(path)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(claims)")]
+        rows = conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+    finally:
+        conn.close()
+    assert [column["name"] for column in tables["claims"]["columns"]] == columns
+    assert {"column": "policy_id", "ref_table": "policies", "ref_column": "policy_id"} in tables["claims"]["foreign_keys"]
+    assert tables["claims"]["row_estimate"] == round_estimate(rows)
+
+
+def test_schema_change_reintrospects_only_the_changed_tables(catalog_agent, tmp_path):
+    agent, path = catalog_agent
+    introspected = []
+    catalog = _make(agent, tmp_path, introspected)
+    catalog.refresh()
+    introspected.clear()
+    assert not catalog.refresh()
+    assert introspected == []
+
+    _execute(path, "ALTER TABLE agents ADD COLUMN region TEXT",
+             "CREATE TABLE audit_log (entry_id INTEGER PRIMARY KEY, agent_id INTEGER REFERENCES agents(agent_id))")
+    assert catalog.refresh()
+    assert introspected == [["agents", "audit_log"]]
+    assert catalog.get_table("agents")["columns"][-1]["name"] == "region"
+    assert catalog.get_table("audit_log")["foreign_keys"] == [
+        {"column": "agent_id", "ref_table": "agents", "ref_column": "agent_id"}]
+
+    _execute(path, "DROP TABLE audit_log")
+    assert catalog.refresh()
+    assert catalog.get_table("audit_log") is None
+
+
+def test_cached_catalog_is_reused_by_the_next_instance(catalog_agent, tmp_path):
+    agent, path = catalog_agent
+    first = _make(agent, tmp_path).get_tables()
+
+    introspected = []
+    second = _make(agent, tmp_path, introspected)
+    assert second.get_tables() == first
+    assert introspected == []
+
+    # A change made while no catalog was running is still picked up
+    _execute(path, "ALTER TABLE account ADD COLUMN segment TEXT")
+    third = _make(agent, tmp_path, introspected)
+    assert third.get_table("account")["columns"][-1]["name"] == "segment"
+    assert introspected == [["account"]]
@@ -0,0 +1,56 @@
+import pytest
+
+from agents.schema_index import SchemaIndex, tokenize
+from config import SCHEMA_CONFIG
+
+
+@pytest.fixture
+def index(db_agent):
+    from agents.schema_catalog import SchemaCatalog
+
+    tables = SchemaCatalog(db_agent, cache_path="").get_tables()
+    return SchemaIndex(tables, SCHEMA_CONFIG["pruning"]["aliases"])
+
+
+def test_tokenize_splits_names_and_stems_plurals():
+    assert tokenize("How many Policies per claim_type?") == ["policy", "per", "claim", "type"]
+    assert tokenize("total premium_amount in 2024") == ["premium", "amount"]
+
+
+@pytest.mark.parametrize("question, tables", [
+    ("agents with the highest commission rate", ["agents"]),
+    ("claims with approved amount over 1000", ["claims"]),
+    # Tables that are only a join hop away come along
+    ("How many claims per agent?", ["claims", "agents", "policies"]),
+    ("payments made by each agent", ["payments", "agents", "policies"]),
+    # An alias pulls in a table its name doesn't share a word with
+    ("Total payments by customer state", ["account", "payments"]),
+])
+def test_select_picks_tables_and_join_paths(index, question, tables):
+    assert index.select(question) == tables
+
+
+def test_unrelated_question_selects_nothing(index):
+    assert index.select("What is the weather today?") == []
+
+
+def test_weak_matches_are_dropped(index):
+    scores = index.score("claims with approved amount over 1000")
+    assert set(scores) > {"claims"}   # "amount" also matches other tables, weakly
+    assert index.select("claims with approved amount over 1000", min_relative_score=0.5) == ["claims"]
+    assert set(index.select("claims with approved amount over 1000", min_relative_score=0)) >= set(scores)
+
+
+def test_join_path_is_the_shortest_one(index):
+    assert index._path("claims", "agents") == ["claims", "policies", "agents"]
+    assert index._path("payments", "account") == ["payments", "account"]
+
+
+def test_pruned_prompt_only_describes_the_selected_tables(db_agent):
+    from agents.schema_agent import SchemaAgent
+
+    agent = SchemaAgent(db_agent)
+    prompt, report = agent.get_schema_prompt_for("How many claims per agent?")
+    assert report["pruned"] and report["tables"] == ["claims", "agents", "policies"]
+    assert "Table: CLAIMS" in prompt and "Table: PAYMENTS" not in prompt
+    assert report["tokens_saved"] > 0
@@ -0,0 +1,78 @@
+import pytest
+
+from agents.sql_templates import SQLTemplateCache, TemplateMatch
+
+SCHEMA_HASH = "test-schema"
+
+
+@pytest.fixture
+def templates(db_agent, tmp_path):
+    from agents.schema_agent import SchemaAgent
+
+    cache = SQLTemplateCache(db_agent, SchemaAgent(db_agent).catalog, path=str(tmp_path / "templates.db"))
+    assert cache.detector.wait_ready(30)
+    return cache
+
+
+def test_database_values_are_template_slots(templates, db_agent):
+    sql = "SELECT COUNT(*) AS accounts FROM account WHERE state = 'CA'"
+    assert templates.learn("how many accounts are in California", sql, SCHEMA_HASH)
+
+    match = templates.match("how many accounts are in Florida", SCHEMA_HASH)
+    assert match is not None and match.params == ["FL"]
+    run_sql, params = match.prepared()
+    rows, _ = db_agent.execute_query(run_sql, params=params)
+    assert rows == db_agent.execute_query("SELECT COUNT(*) FROM account WHERE state = 'FL'")[0]
+
+
+def test_entity_values_load_in_the_background(db_agent):
+    from agents.schema_agent import SchemaAgent
+    from agents.sql_templates import EntityDetector
+
+    detector = EntityDetector(db_agent, SchemaAgent(db_agent).catalog, sample_rows=1000)
+    # Numbers are found straight away; values once the background load is done
+    assert [entity.kind for entity in detector.detect("top 5 policies in California")] in (["number"], ["number", "state"])
+    assert detector.wait_ready(30)
+    assert [entity.kind for entity in detector.detect("top 5 policies in California")] == ["number", "state"]
+
+
+def test_learned_top_n_runs_with_guard_limit(templates, db_agent):
+    sql = "SELECT policy_number, premium_amount FROM policies ORDER BY premium_amount DESC, policy_id LIMIT 10"
+    assert templates.learn("top 10 policies by premium", sql, SCHEMA_HASH)
+
+    match = templates.match("top 25 policies by premium", SCHEMA_HASH)
+    assert match is not None and match.params == [25]
+    run_sql, params = match.prepared(1000)
+    assert run_sql.upper().count("LIMIT") == 1
+    rows, _ = db_agent.execute_query(run_sql, params=params)
+    assert len(rows) == 25
+
+    # The guard's limit still caps a larger N
+    run_sql, params = match.prepared(5)
+    assert params == [5]
+    assert len(db_agent.execute_query(run_sql, params=params)[0]) == 5
+
+
+@pytest.mark.parametrize("sql, params, expected", [
+    ("SELECT * FROM agents WHERE status = ? LIMIT ?", ["Active", 50], ["Active", 20]),
+    ("SELECT * FROM agents LIMIT ? OFFSET 5", [3], [3]),
+    ("SELECT * FROM agents LIMIT 5, ?", [500], [20]),
+])
+def test_parameterized_limit_is_clamped(sql, params, expected):
+    run_sql, bound = TemplateMatch("key", sql, params, "q").prepared(20)
+    assert run_sql == sql
+    assert bound == expected
+
+
+def test_template_without_limit_gets_one():
+    run_sql, params = TemplateMatch("key", "SELECT * FROM agents WHERE status = ?", ["Active"], "q").prepared(20)
+    assert run_sql.endswith("LIMIT 20")
+    assert params == ["Active"]
+
+
+def test_dashes_inside_a_literal_survive_the_limit():
+    sql = "SELECT * FROM account WHERE address LIKE '%--%' AND state = ? LIMIT ?"
+    assert TemplateMatch("key", sql, ["CA", 50], "q").prepared(20) == (sql, ["CA", 20])
+    sql = "SELECT * FROM account WHERE address LIKE '%--%' AND state = ?"
+    run_sql, _ = TemplateMatch("key", sql, ["CA"], "q").prepared(20)
+    assert run_sql == sql + "\nLIMIT 20"
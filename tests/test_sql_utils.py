@@ -0,0 +1,62 @@
+import pytest
+
+from agents.sql_utils import apply_limit, is_read_only, normalize_sql, strip_comments
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM policies",
+    "select 1;",
+    "-- comment\nSELECT 'DELETE FROM policies'",
+    "WITH x AS (SELECT 1) SELECT * FROM x",
+    "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r WHERE n < 5) SELECT n FROM r",
+    "WITH a AS (SELECT 'update'), b AS (SELECT 2) SELECT * FROM a, b",
+])
+def test_read_only_statements(query):
+    assert is_read_only(query)
+
+
+@pytest.mark.parametrize("query", [
+    "DELETE FROM policies",
+    "SELECT 1; DELETE FROM policies",
+    "WITH x AS (SELECT 1) DELETE FROM policies",
+    "WITH x AS (SELECT policy_id FROM policies) UPDATE policies SET status = 'x' WHERE policy_id IN x",
+    "with x as (select 1) insert into agents (agent_id) select * from x",
+    "WITH x AS (SELECT 1) REPLACE INTO agents (agent_id) VALUES (1)",
+    "PRAGMA writable_schema = 1",
+])
+def test_writes_are_not_read_only(query):
+    assert not is_read_only(query)
+
+
+def test_guard_rejects_cte_prefixed_delete(db_agent):
+    from agents.query_guard import REJECT, QueryGuard
+
+    result = QueryGuard(db_agent).check("WITH x AS (SELECT 1) DELETE FROM policies")
+    assert result.decision == REJECT
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT '--'; DELETE FROM account",
+    "SELECT '/*'; DELETE FROM account; SELECT '*/'",
+    "SELECT \"--\"; DELETE FROM account",
+])
+def test_comment_markers_in_quotes_hide_nothing(query):
+    assert not is_read_only(query)
+
+
+def test_strip_comments_keeps_quoted_text():
+    query = "SELECT '--x', \"a--b\", '/* y */' -- note\nFROM t /* block */"
+    assert strip_comments(query) == "SELECT '--x', \"a--b\", '/* y */'  \nFROM t  "
+
+
+def test_apply_limit_after_a_literal_with_dashes():
+    query = "SELECT * FROM account WHERE address LIKE '%--%'"
+    assert apply_limit(query, 100) == (query + "\nLIMIT 100", None)
+    assert apply_limit(query + " LIMIT 500 -- most", 100) == (query + " LIMIT 100", 500)
+
+
+def test_normalize_sql_keeps_text_after_dashes_in_literals():
+    first = normalize_sql("SELECT COUNT(*) FROM account WHERE name LIKE '%--%' OR email = 'x'")
+    second = normalize_sql("SELECT COUNT(*) FROM account WHERE name LIKE '%--%' OR 1=1")
+    assert first != second
+    assert first.endswith("OR email = 'x'")
@@ -0,0 +1,47 @@
+import sqlite3
+
+from agents.llm_gateway import LLMResponse
+from agents.token_accounting import TokenLedger
+
+USAGE = {"prompt_token_count": 1000, "candidates_token_count": 50, "total_token_count": 1050}
+
+
+def _response(coalesced: bool = False) -> LLMResponse:
+    response = LLMResponse("SELECT 1", USAGE)
+    response.latency, response.attempts, response.coalesced = 0.5, 0 if coalesced else 1, coalesced
+    return response
+
+
+def test_coalesced_calls_are_not_billed_twice(tmp_path):
+    ledger = TokenLedger(str(tmp_path / "ledger.db"))
+    sections = {"schema": 900, "question": 100}
+    ledger.record("s1", "how many policies", sections, _response())
+    for _ in range(3):
+        entry = ledger.record("s1", "how many policies", sections, _response(coalesced=True))
+        assert entry["total_tokens"] == 0
+        assert ledger.check_budgets(entry) == []
+
+    summary = ledger.session_summary("s1")
+    assert summary["calls"] == 1
+    assert summary["coalesced"] == 3
+    assert summary["total_tokens"] == 1050
+    assert ledger.day_summary()["total_tokens"] == 1050
+    assert ledger.section_breakdown()["schema"]["avg_tokens"] == 900
+
+
+def test_ledger_written_before_coalescing_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL, day TEXT, session_id TEXT,
+            question TEXT, sections TEXT, estimated_tokens INTEGER, prompt_tokens INTEGER,
+            response_tokens INTEGER, total_tokens INTEGER, latency REAL, attempts INTEGER
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+    ledger = TokenLedger(path)
+    ledger.record("s1", "q", {"question": 10}, _response(coalesced=True))
+    assert ledger.session_summary("s1")["coalesced"] == 1
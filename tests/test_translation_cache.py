@@ -0,0 +1,56 @@
+import pytest
+
+from agents.translation_cache import TranslationCache, schema_fingerprint
+
+SCHEMA = schema_fingerprint("CREATE TABLE agents (agent_id INTEGER, name TEXT)")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A wall clock the test moves by hand"""
+    now = [1_000_000.0]
+    monkeypatch.setattr("agents.translation_cache.time.time", lambda: now[0])
+    return now
+
+
+def test_equivalent_phrasings_share_an_entry(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    cache.put("How many agents are there?", SCHEMA, "SELECT COUNT(*) FROM agents")
+    assert cache.get("  how many   agents are there ", SCHEMA) == "SELECT COUNT(*) FROM agents"
+    assert cache.get("How many agents are there?", schema_fingerprint("other schema")) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5, "entries": 1}
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = TranslationCache(str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.put("q", SCHEMA, "SELECT 1")
+    clock[0] += 60
+    assert cache.get("q", SCHEMA) == "SELECT 1"
+    # A hit does not extend the entry's life
+    clock[0] += 1
+    assert cache.get("q", SCHEMA) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = TranslationCache(str(tmp_path / "cache.db"), max_entries=2)
+    for question in ("first", "second"):
+        cache.put(question, SCHEMA, f"SELECT '{question}'")
+        clock[0] += 1
+    assert cache.get("first", SCHEMA) is not None   # "second" is now the oldest use
+    clock[0] += 1
+
+    cache.put("third", SCHEMA, "SELECT 'third'")
+    assert cache.stats()["entries"] == 2
+    assert cache.get("second", SCHEMA) is None
+    assert cache.get("first", SCHEMA) == "SELECT 'first'"
+    assert cache.get("third", SCHEMA) == "SELECT 'third'"
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    TranslationCache(path).put("q", SCHEMA, "SELECT 1")
+    cache = TranslationCache(path)
+    assert cache.get("q", SCHEMA) == "SELECT 1"
+    assert cache.purge_other_schemas(schema_fingerprint("new schema")) == 1
+    assert cache.get("q", SCHEMA) is None